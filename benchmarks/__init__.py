@@ -0,0 +1 @@
+"""The package contains the benchmarks of the framework."""
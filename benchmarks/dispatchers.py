@@ -0,0 +1,104 @@
+"""The script compares the cost of routing a callback query to the handler
+of a button when each handler is registered as a separate
+CallbackQueryHandler matched by its pattern, and when the handlers are
+looked up by the checksum in CallbackQueryDispatcher.
+
+Run it from the root of the repository:
+    env PYTHONPATH=$(pwd) python3 benchmarks/dispatchers.py
+"""
+
+# ruff: noqa: T201
+
+import timeit
+from typing import TYPE_CHECKING, cast
+
+from telegram import CallbackQuery, Update, User
+from telegram.ext import CallbackQueryHandler
+
+from hammett.core.callback_data import build_callback_data, parse_callback_data
+from hammett.core.dispatchers import CallbackQueryDispatcher
+from hammett.core.handlers import calc_checksum
+
+if TYPE_CHECKING:
+    from typing import Any
+
+    from telegram.ext import BaseHandler
+
+_HANDLERS_NUMBER = 1000
+
+_REPEAT = 5
+
+_ROUNDS = 2000
+
+
+async def _handler(_update: 'Any', _context: 'Any') -> None:
+    """Stub the handler of a button."""
+
+
+def _make_update(data: str) -> Update:
+    """Return the update of the pressed button with the specified callback data."""
+    return Update(1, callback_query=CallbackQuery(
+        '1',
+        User(1, 'User', is_bot=False),
+        'chat_instance',
+        data=data,
+    ))
+
+
+def _route(handlers: 'list[BaseHandler[Any, Any]]', update: Update) -> object:
+    """Return the result of checking the update by the first handler it
+    matches, the way ConversationHandler does.
+    """
+    for handler in handlers:
+        check_result = handler.check_update(update)
+        if check_result is not None and check_result is not False:
+            return check_result
+
+    return None
+
+
+def _measure(handlers: 'list[BaseHandler[Any, Any]]', update: Update) -> float:
+    """Return the time in microseconds it takes to route the update.
+    The parsed callback data is not cached between the rounds, since
+    every update carries new callback data in the real world.
+    """
+    def route() -> object:
+        parse_callback_data.cache_clear()
+        return _route(handlers, update)
+
+    return min(timeit.repeat(route, number=_ROUNDS, repeat=_REPEAT)) / _ROUNDS * 1e6
+
+
+def main() -> None:
+    """Run the benchmark."""
+    checksums = [calc_checksum(f'Screen{i}.handler') for i in range(_HANDLERS_NUMBER)]
+
+    pattern_handlers: list[BaseHandler[Any, Any]] = [
+        CallbackQueryHandler(_handler, pattern=checksum) for checksum in checksums
+    ]
+    dispatcher = CallbackQueryDispatcher()
+    for checksum in checksums:
+        dispatcher.add_handler(checksum, _handler)
+
+    user_id = 123456789
+    button_checksum = calc_checksum('Button')
+    cases = {
+        'first handler': checksums[0],
+        'middle handler': checksums[_HANDLERS_NUMBER // 2],
+        'last handler': checksums[-1],
+    }
+    print(f'Routing to one of {_HANDLERS_NUMBER} handlers')
+    print(f'{"Case":<20}{"Patterns, µs":>14}{"Dispatcher, µs":>16}')
+    for case, checksum in cases.items():
+        # The patterns were matched against the callback data of the legacy format.
+        legacy_data = f'{checksum},button={button_checksum},user_id={user_id}'
+        data = cast('str', build_callback_data(checksum, button_checksum, user_id))
+        print(
+            f'{case:<20}'
+            f'{_measure(pattern_handlers, _make_update(legacy_data)):>14.1f}'
+            f'{_measure([dispatcher], _make_update(data)):>16.1f}',
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""The script compares the throughput of the persistences, measuring
+the number of the user data updates per second written one by one and
+concurrently. The Redis persistence is measured only if the Redis instance
+specified by the REDIS_PERSISTENCE setting is available.
+
+Run it from the root of the repository:
+    env PYTHONPATH=$(pwd) python3 benchmarks/persistences.py
+"""
+
+# ruff: noqa: T201
+
+import asyncio
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from benchmarks.serializers import make_user_data
+from hammett.conf import settings
+from hammett.core.persistences import RedisPersistence, SQLitePersistence
+from hammett.test.utils import override_settings
+
+if TYPE_CHECKING:
+    from typing import Any
+
+_CONCURRENCY = 100
+
+_UPDATES_NUMBER = 2000
+
+
+async def _measure(persistence: 'Any') -> tuple[float, float]:
+    """Return the number of the updates per second the specified persistence
+    writes one by one and concurrently.
+    """
+    user_data = make_user_data()
+    await persistence.get_user_data()
+
+    start = time.perf_counter()
+    for i in range(_UPDATES_NUMBER):
+        await persistence.update_user_data(i % _CONCURRENCY, {**user_data, 'counter': i})
+
+    sequential = _UPDATES_NUMBER / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(0, _UPDATES_NUMBER, _CONCURRENCY):
+        await asyncio.gather(*[
+            persistence.update_user_data(user_id, {**user_data, 'counter': i})
+            for user_id in range(_CONCURRENCY)
+        ])
+
+    concurrent = _UPDATES_NUMBER / (time.perf_counter() - start)
+
+    await persistence.flush()
+    return sequential, concurrent
+
+
+async def main() -> None:
+    """Run the benchmark."""
+    print(f'{"Persistence":<20}{"Sequential, 1/s":>17}{"Concurrent, 1/s":>17}')
+    with tempfile.TemporaryDirectory() as tmp_dir, override_settings(SQLITE_PERSISTENCE={
+        **settings.SQLITE_PERSISTENCE,
+        'DATABASE': str(Path(tmp_dir) / 'hammett.sqlite3'),
+    }):
+        sequential, concurrent = await _measure(SQLitePersistence())
+        print(f'{"SQLitePersistence":<20}{sequential:>17.0f}{concurrent:>17.0f}')
+
+    persistence: RedisPersistence[Any, Any, Any] = RedisPersistence()
+    try:
+        await persistence.redis_cli.ping()
+    except RedisConnectionError:
+        print('Redis is not available, so RedisPersistence is skipped.')
+        return
+
+    sequential, concurrent = await _measure(persistence)
+    await persistence.redis_cli.delete(*[
+        persistence._get_user_data_key(user_id)  # noqa: SLF001
+        for user_id in range(_CONCURRENCY)
+    ])
+    print(f'{"RedisPersistence":<20}{sequential:>17.0f}{concurrent:>17.0f}')
+
+
+if __name__ == '__main__':
+    os.environ.setdefault('HAMMETT_SETTINGS_MODULE', 'tests.settings')
+    asyncio.run(main())
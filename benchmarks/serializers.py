@@ -0,0 +1,108 @@
+"""The script compares the serializers available for the persistence,
+measuring the encoding and decoding time and the payload size on
+the data shaped like the user_data of the bots based on Hammett.
+
+Run it from the root of the repository:
+    env PYTHONPATH=$(pwd) python3 benchmarks/serializers.py
+"""
+
+# ruff: noqa: T201
+
+import importlib.util
+import timeit
+from typing import TYPE_CHECKING
+
+from hammett.core.constants import LATEST_SENT_MSG_KEY
+from hammett.core.serializers import JSONSerializer, MsgpackSerializer, PickleSerializer
+
+if TYPE_CHECKING:
+    from typing import Any
+
+    from hammett.core.serializers import BaseSerializer
+
+_CHOICES_NUMBER = 20
+
+_IMAGES_NUMBER = 30
+
+_REPEAT = 5
+
+_ROUNDS = 200
+
+_WIDGETS_NUMBER = 10
+
+
+def make_user_data() -> dict[str, 'Any']:
+    """Return the user data similar to the one of a user who has
+    interacted with several widgets.
+    """
+    user_data: dict[str, Any] = {
+        'current_state': '0',
+        LATEST_SENT_MSG_KEY: {
+            'chat_id': 123456789,
+            'message_id': 1000,
+            'as_new_message': False,
+            'cache_covers': False,
+            'cover': 'media/cover.jpg',
+            'description': 'The description of the latest message. ' * 5,
+            'attachments': None,
+            'document': None,
+            'keyboard': [],
+            'hide_keyboard': True,
+        },
+    }
+    for i in range(_WIDGETS_NUMBER):
+        user_data[f'MultiChoiceWidget_123456789_{i}'] = {
+            'choices': tuple(
+                (j % 2 == 0, f'code{j}', f'Choice name {j}') for j in range(_CHOICES_NUMBER)
+            ),
+        }
+        user_data[f'CarouselWidget_123456789_{i}'] = {
+            'images': [
+                [f'https://example.com/images/{j}.jpg', f'Image description {j}']
+                for j in range(_IMAGES_NUMBER)
+            ],
+            'position': i,
+        }
+
+    return user_data
+
+
+def _measure(serializer: 'BaseSerializer', data: 'Any') -> tuple[float, float, int]:
+    """Return the time in microseconds it takes to encode and decode
+    the specified data, and the size of the encoded data in bytes.
+    """
+    encoded = serializer.dumps(data)
+    encode_time = min(timeit.repeat(
+        lambda: serializer.dumps(data),
+        number=_ROUNDS,
+        repeat=_REPEAT,
+    )) / _ROUNDS
+    decode_time = min(timeit.repeat(
+        lambda: serializer.loads(encoded),
+        number=_ROUNDS,
+        repeat=_REPEAT,
+    )) / _ROUNDS
+
+    return encode_time * 1e6, decode_time * 1e6, len(encoded)
+
+
+def main() -> None:
+    """Run the benchmark."""
+    serializers: list[BaseSerializer] = [PickleSerializer(), JSONSerializer()]
+    if importlib.util.find_spec('msgpack'):
+        serializers.append(MsgpackSerializer())
+    else:
+        print('msgpack is not installed, so MsgpackSerializer is skipped.')
+
+    data = make_user_data()
+    print(f'{"Serializer":<20}{"Encode, µs":>12}{"Decode, µs":>12}{"Size, bytes":>13}')
+    for serializer in serializers:
+        encode_time, decode_time, size = _measure(serializer, data)
+        print(
+            f'{type(serializer).__name__:<20}'
+            f'{encode_time:>12.1f}{decode_time:>12.1f}{size:>13}',
+        )
+
+
+if __name__ == '__main__':
+    main()
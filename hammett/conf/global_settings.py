@@ -7,10 +7,37 @@ from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from typing import Any
 
+COVERS_CACHE = {
+    # The cache of the IDs of the uploaded covers. Use either
+    # hammett.core.covers.RedisCoversCache or hammett.core.covers.SQLiteCoversCache
+    # to share the IDs between the processes and keep them between the restarts.
+    'BACKEND': 'hammett.core.covers.MemoryCoversCache',
+    # The number of the IDs each process keeps in memory.
+    'MAX_SIZE': 1000,
+    # The database of SQLiteCoversCache. The database specified by
+    # the SQLITE_PERSISTENCE setting is used if it's None.
+    'DATABASE': None,
+}
+
 DOMAIN = 'hammett'
 
 HIDERS_CHECKER = ''
 
+HIDERS_CHECKS_CACHE = {
+    # The number of seconds the results of the hiders checks are cached for
+    # between the updates. The results are not cached if it's None.
+    'TTL': None,
+    'MAX_SIZE': 10000,
+    # The Redis channel the invalidations of the cache are published to, so
+    # they reach all the processes of the bot. The connection is configured
+    # by the top-level keys of the REDIS_PERSISTENCE setting, or by its first
+    # node if the top-level keys are not specified.
+    'INVALIDATION_CHANNEL': None,
+}
+
+# The maximum number of the buttons of a keyboard whose hiders are checked concurrently.
+HIDERS_CHECKS_CONCURRENCY = 10
+
 HTML_PARSE_MODE = True
 
 LANGUAGE_CODE = 'en'
@@ -21,6 +48,12 @@ LOGGING: dict[str, 'Any'] = {}
 
 PAYLOAD_NAMESPACE = 'hammett'
 
+PAYLOAD_STORAGE_MAX_MESSAGES = 100
+
+PAYLOAD_STORAGE_MAX_SIZE = 10000
+
+PAYLOAD_STORAGE_TTL = 7 * 24 * 60 * 60
+
 PERMISSIONS: list[str] = []
 
 REDIS_PERSISTENCE = {
@@ -29,10 +62,29 @@ REDIS_PERSISTENCE = {
     'DB': 0,
     'PASSWORD': None,
     'UNIX_SOCKET_PATH': None,
+    'SERIALIZER': 'hammett.core.serializers.PickleSerializer',
+    'COMPRESSOR': None,
+    'COMPRESSION_THRESHOLD': 1024,
+    'USER_DATA_TTL': None,
+    'CHAT_DATA_TTL': None,
+    'CONVERSATIONS_SWEEP_INTERVAL': None,
+    'METRICS_SINK': None,
+    # The list of the dicts with the same HOST, PORT, DB, PASSWORD and
+    # UNIX_SOCKET_PATH keys (and optional NAME) to distribute the data of
+    # the users, chats and conversations across.
+    'NODES': [],
 }
 
+# Save the config of the latest message sent to the user. Besides hiding
+# the keyboards, it's required to skip the edits that don't change the message
+# and to edit only the keyboard of the message when nothing else changes.
 SAVE_LATEST_MESSAGE = False
 
+SQLITE_PERSISTENCE = {
+    'DATABASE': 'hammett.sqlite3',
+    'SERIALIZER': 'hammett.core.serializers.PickleSerializer',
+}
+
 TOKEN = ''
 
 USE_WEBHOOK = False
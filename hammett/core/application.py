@@ -4,16 +4,22 @@ from typing import TYPE_CHECKING, Any
 
 from telegram import Update
 from telegram.ext import Application as NativeApplication
-from telegram.ext import (
-    CallbackQueryHandler,
-    CommandHandler,
-    MessageHandler,
-    filters,
-)
+from telegram.ext import CommandHandler, MessageHandler, filters
 
 from hammett.core.conversation_handler import ConversationHandler
+from hammett.core.covers import close_covers_cache
+from hammett.core.dispatchers import CallbackQueryDispatcher
 from hammett.core.exceptions import TokenIsNotSpecified, UnknownHandlerType
-from hammett.core.handlers import calc_checksum, log_unregistered_handler
+from hammett.core.handlers import (
+    calc_legacy_checksum,
+    log_unregistered_handler,
+    register_checksum,
+)
+from hammett.core.hiders import (
+    get_hiders_checker,
+    start_invalidations_listener,
+    stop_invalidations_listener,
+)
 from hammett.core.permissions import apply_permission_to
 from hammett.types import HandlerAlias, HandlerType
 from hammett.utils.log import configure_logging
@@ -41,7 +47,7 @@ class Application:
     - configuring logging.
     """
 
-    def __init__(  # noqa: PLR0913
+    def __init__(
         self: 'Self',
         name: str,
         *,
@@ -62,6 +68,7 @@ class Application:
 
         self._route_handlers = ('sgoto', 'sjump')
         self._builtin_handlers = ('goto', 'jump', 'start', *self._route_handlers)
+        self._dispatchers: dict[State, CallbackQueryDispatcher] = {}
         self._entry_point = entry_point()
         self._name = name
         self._native_states = native_states or {}
@@ -72,6 +79,7 @@ class Application:
             builder.persistence(persistence)
 
         self._native_application = builder.build()
+        self._setup_lifecycle_hooks()
 
         if self._states:
             for state in self._states.items():
@@ -89,22 +97,27 @@ class Application:
             persistent=bool(persistence),
         ))
 
+    def _get_dispatcher(self: 'Self', state: 'State') -> CallbackQueryDispatcher:
+        """Return the dispatcher routing the callback queries of the specified
+        state, creating it if the state doesn't have one yet.
+        """
+        try:
+            return self._dispatchers[state]
+        except KeyError:
+            dispatcher = self._dispatchers[state] = CallbackQueryDispatcher()
+            self._set_default_value_to_native_states(state)
+            self._native_states[state].append(dispatcher)
+            return dispatcher
+
     @staticmethod
     def _get_handler_object(
         handler: 'HandlerAlias',
         handler_type: 'Any | str | None',
         possible_handler: 'Handler',
-    ) -> CallbackQueryHandler[Any] | MessageHandler[Any]:
+    ) -> MessageHandler[Any]:
         """Return the handler object depending on its type."""
-        handler_object: CallbackQueryHandler[Any] | MessageHandler[Any]
-        if handler_type in (HandlerType.BUTTON_HANDLER, ''):
-            handler_object = CallbackQueryHandler(
-                apply_permission_to(handler),
-                # Specify a pattern. The pattern is used to determine which handler
-                # should be triggered when a specific button is pressed.
-                pattern=calc_checksum(handler),
-            )
-        elif handler_type == HandlerType.COMMAND_HANDLER:
+        handler_object: MessageHandler[Any]
+        if handler_type == HandlerType.COMMAND_HANDLER:
             handler_object = MessageHandler(
                 filters.COMMAND & filters.Regex(f'^/{possible_handler.command_name}'),
                 handler,
@@ -177,20 +190,38 @@ class Application:
                     log_unregistered_handler(possible_handler)
                     continue
 
-                handler_object = self._get_handler_object(handler, handler_type, possible_handler)
-
+                target_states = [state]
                 if (
                     hasattr(instance, 'routes')
                     and name in self._route_handlers
                     and instance.routes
                 ):
-                    for route in instance.routes:
-                        route_states, _ = route
-                        for route_state in route_states:
-                            self._set_default_value_to_native_states(route_state)
-                            self._native_states[route_state].append(handler_object)
+                    target_states = [
+                        route_state
+                        for route_states, _ in instance.routes
+                        for route_state in route_states
+                    ]
+
+                if handler_type in (HandlerType.BUTTON_HANDLER, ''):
+                    # The handlers of the buttons are routed by the checksums
+                    # the callback data of the buttons starts with.
+                    checksum = register_checksum(handler)
+                    legacy_checksum = calc_legacy_checksum(handler)
+                    button_handler = apply_permission_to(handler)
+                    for target_state in target_states:
+                        dispatcher = self._get_dispatcher(target_state)
+                        dispatcher.add_handler(checksum, button_handler)
+                        # Route the buttons sent by the previous versions of Hammett.
+                        dispatcher.add_handler(legacy_checksum, button_handler)
                 else:
-                    self._native_states[state].append(handler_object)
+                    handler_object = self._get_handler_object(
+                        handler,
+                        handler_type,
+                        possible_handler,
+                    )
+                    for target_state in target_states:
+                        self._set_default_value_to_native_states(target_state)
+                        self._native_states[target_state].append(handler_object)
 
     def _set_default_value_to_native_states(self: 'Self', state: 'State') -> None:
         """Set default value to native states."""
@@ -200,10 +231,36 @@ class Application:
             self._native_states[state] = []
 
     def _setup(self: 'Self') -> None:
-        """Configure logging."""
+        """Configure logging and create the hiders checker shared by the buttons."""
         from hammett.conf import settings
         configure_logging(settings.LOGGING)
 
+        if settings.HIDERS_CHECKER:
+            get_hiders_checker()
+
+    def _setup_lifecycle_hooks(self: 'Self') -> None:
+        """Start the background tasks of Hammett once the native application
+        is initialized and stop them on shutdown, keeping the hooks specified
+        via the application builder.
+        """
+        post_init = self._native_application.post_init
+        post_shutdown = self._native_application.post_shutdown
+
+        async def start(application: 'NativeApplication[Any, Any, Any, Any, Any, Any]') -> None:
+            start_invalidations_listener()
+            if post_init:
+                await post_init(application)
+
+        async def stop(application: 'NativeApplication[Any, Any, Any, Any, Any, Any]') -> None:
+            if post_shutdown:
+                await post_shutdown(application)
+
+            await stop_invalidations_listener()
+            await close_covers_cache()
+
+        self._native_application.post_init = start
+        self._native_application.post_shutdown = stop
+
     def provide_application_builder(self: 'Self') -> 'ApplicationBuilder':  # type: ignore[type-arg]
         """Return a native application builder."""
         from hammett.conf import settings
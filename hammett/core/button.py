@@ -5,9 +5,10 @@ from typing import TYPE_CHECKING, cast
 from telegram import InlineKeyboardButton
 
 from hammett.core import handlers
+from hammett.core.callback_data import build_callback_data_prefix, complete_callback_data
 from hammett.core.constants import SourcesTypes
-from hammett.core.exceptions import ImproperlyConfigured, UnknownSourceType
-from hammett.utils.module_loading import import_string
+from hammett.core.exceptions import UnknownSourceType
+from hammett.core.hiders import get_hiders_checker, is_legacy_hiders_checker
 
 if TYPE_CHECKING:
     from telegram import Update
@@ -56,6 +57,9 @@ class Button:
         self.source_type = source_type
         self.hiders = hiders
 
+        self._callback_data_prefix: str | None = None
+        self._url_button: InlineKeyboardButton | None = None
+
         self._check_source()
         self._init_hider_checker()
 
@@ -108,32 +112,40 @@ class Button:
 
         return update.effective_user.id  # type: ignore[union-attr]
 
-    def _init_hider_checker(self: 'Self') -> None:
-        if self.hiders and not self.hiders_checker:
-            from hammett.conf import settings
+    def _get_callback_data_prefix(self: 'Self') -> str:
+        """Return the part of the callback data of the button that doesn't
+        depend on the user. The part is built once, since neither the source
+        nor the caption of the button changes.
+        """
+        if self._callback_data_prefix is None:
+            if self.source_type in _SHORTCUT_SOURCES_TYPES and self.source_shortcut:
+                source = self.source_shortcut
+            else:
+                source = cast('Handler', self.source)
+
+            self._callback_data_prefix = build_callback_data_prefix(
+                handlers.calc_checksum(source),
+                handlers.calc_checksum(self.caption),
+            )
 
-            if not settings.HIDERS_CHECKER:
-                msg = "The 'HIDERS_CHECKER' setting is not set"
-                raise ImproperlyConfigured(msg)
+        return self._callback_data_prefix
 
-            if self.hiders:
-                hiders_checker: type[HidersChecker] = import_string(settings.HIDERS_CHECKER)
-                self.hiders_checker = hiders_checker(self.hiders.hiders_set)
+    def _init_hider_checker(self: 'Self') -> None:
+        if self.hiders and not self.hiders_checker:
+            self.hiders_checker = get_hiders_checker(self.hiders.hiders_set)
 
     async def _specify_visibility(
         self: 'Self',
         update: 'Update | None',
         context: 'CallbackContext[BT, UD, CD, BD]',
     ) -> bool:
-        visibility = True
-        if (
-            self.hiders and
-            self.hiders_checker and
-            not await self.hiders_checker.run(update, context)
-        ):
-            visibility = False
+        if not self.hiders or not self.hiders_checker:
+            return True
 
-        return visibility
+        if is_legacy_hiders_checker(type(self.hiders_checker)):
+            return await self.hiders_checker.run(update, context)
+
+        return await self.hiders_checker.check_mask(self.hiders.mask, update, context)
 
     #
     # Public methods
@@ -148,24 +160,25 @@ class Button:
         visibility = await self._specify_visibility(update, context)
 
         if self.source_type in _HANDLER_SOURCES_TYPES:
-            if self.source_type in _SHORTCUT_SOURCES_TYPES and self.source_shortcut:
-                source = self.source_shortcut
-            else:
-                source = cast('Handler', self.source)
-
-            data = (
-                f'{handlers.calc_checksum(source)},'
-                f'button={handlers.calc_checksum(self.caption)},'
-                f'user_id={self._get_user_id(update, context)}'
-            )
-
+            prefix = self._get_callback_data_prefix()
+            user_id = self._get_user_id(update, context)
+            data = cast('str', complete_callback_data(prefix, user_id))
             if self.payload is not None:
-                payload_storage = handlers.get_payload_storage(context)
-                payload_storage[data] = self.payload
+                # Pass the short payloads right in the callback data
+                # to avoid changing the payload storage.
+                packed_data = complete_callback_data(prefix, user_id, self.payload)
+                if packed_data is None:
+                    payload_storage = handlers.get_payload_storage(context)
+                    payload_storage[data] = self.payload
+                else:
+                    data = packed_data
 
             return InlineKeyboardButton(self.caption, callback_data=data), visibility
 
         if self.source_type == SourcesTypes.URL_SOURCE_TYPE and isinstance(self.source, str):
-            return InlineKeyboardButton(self.caption, url=self.source), visibility
+            if self._url_button is None:
+                self._url_button = InlineKeyboardButton(self.caption, url=self.source)
+
+            return self._url_button, visibility
 
         raise UnknownSourceType
@@ -0,0 +1,158 @@
+"""The module contains the routines to build and parse the callback data
+of the buttons.
+
+The callback data consists of the following fields:
+- the version of the format (1 character);
+- the checksum of the handler of the button (8 characters);
+- the checksum of the caption of the button (8 characters);
+- the ID of the user the button is created for, packed with the URL-safe
+  base64 alphabet (empty if there is no user);
+- the payload of the button preceded by the separator, if the payload
+  is passed right in the callback data.
+The checksums and the ID never contain the separator, so everything
+following it is the payload.
+"""
+
+import base64
+import binascii
+from functools import lru_cache
+from typing import NamedTuple
+
+# Telegram limits the size of the callback data of a button to 64 bytes.
+CALLBACK_DATA_MAX_SIZE = 64
+
+_CHECKSUM_LENGTH = 8
+
+_PARSED_CALLBACK_DATA_CACHE_SIZE = 1024
+
+_PAYLOAD_SEPARATOR = ':'
+
+_VERSION = '1'
+
+_BUTTON_CHECKSUM_END = len(_VERSION) + _CHECKSUM_LENGTH * 2
+
+# The format used by the previous versions of Hammett is
+# '<handler checksum>,button=<caption checksum>,user_id=<user id>[,p=<payload>]'.
+_LEGACY_BUTTON_FIELD = ',button='
+
+_LEGACY_PAYLOAD_FIELD = ',p='
+
+_LEGACY_USER_ID_FIELD = ',user_id='
+
+
+class CallbackData(NamedTuple):
+    """The class represents the parsed callback data of a button."""
+
+    handler_checksum: str
+    button_checksum: str
+    user_id: int | None
+    payload: str | None
+
+
+def _pack_int(value: int) -> str:
+    """Pack the specified non-negative integer with the URL-safe base64
+    alphabet without padding.
+    """
+    packed = value.to_bytes(max(1, (value.bit_length() + 7) // 8), 'big')
+    return base64.urlsafe_b64encode(packed).decode('ascii').rstrip('=')
+
+
+def _parse_legacy_callback_data(data: str) -> CallbackData | None:
+    """Parse the callback data of the format used by the previous versions
+    of Hammett, or return None if the data is malformed.
+    """
+    data, separator, payload = data.partition(_LEGACY_PAYLOAD_FIELD)
+    handler_checksum, _, rest = data.partition(_LEGACY_BUTTON_FIELD)
+    button_checksum, _, user_id = rest.partition(_LEGACY_USER_ID_FIELD)
+    try:
+        return CallbackData(
+            handler_checksum,
+            button_checksum,
+            None if user_id == 'None' else int(user_id),
+            payload if separator else None,
+        )
+    except ValueError:
+        return None
+
+
+def _unpack_int(value: str) -> int:
+    """Unpack the integer packed by `_pack_int`.
+    Raise `ValueError` if the value is malformed.
+    """
+    try:
+        packed = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+    except binascii.Error as exc:
+        raise ValueError(value) from exc
+
+    return int.from_bytes(packed, 'big')
+
+
+def build_callback_data(
+    handler_checksum: str,
+    button_checksum: str,
+    user_id: int | None,
+    payload: str | None = None,
+) -> str | None:
+    """Return the callback data consisting of the specified fields,
+    or None if the data exceeds the limit of Telegram.
+    """
+    return complete_callback_data(
+        build_callback_data_prefix(handler_checksum, button_checksum),
+        user_id,
+        payload,
+    )
+
+
+def build_callback_data_prefix(handler_checksum: str, button_checksum: str) -> str:
+    """Return the part of the callback data that doesn't depend on the user,
+    so it can be built once for each button.
+    """
+    return f'{_VERSION}{handler_checksum}{button_checksum}'
+
+
+def complete_callback_data(
+    prefix: str,
+    user_id: int | None,
+    payload: str | None = None,
+) -> str | None:
+    """Return the callback data consisting of the specified prefix built by
+    `build_callback_data_prefix` and the rest of the fields, or None if
+    the data exceeds the limit of Telegram.
+    """
+    data = prefix if user_id is None else f'{prefix}{_pack_int(user_id)}'
+    if payload is not None:
+        data = f'{data}{_PAYLOAD_SEPARATOR}{payload}'
+
+    if len(data.encode('utf8')) > CALLBACK_DATA_MAX_SIZE:
+        return None
+
+    return data
+
+
+@lru_cache(maxsize=_PARSED_CALLBACK_DATA_CACHE_SIZE)
+def parse_callback_data(data: str) -> CallbackData | None:
+    """Parse the specified callback data, or return None if it's not
+    created by a button. The results are cached, so the data is parsed
+    once while the update is routed and handled.
+    """
+    # The checksums never contain commas, while the legacy data contains
+    # one right after the checksum of the handler.
+    header = data[:_BUTTON_CHECKSUM_END]
+    if ',' in header:
+        return _parse_legacy_callback_data(data) if _LEGACY_BUTTON_FIELD in data else None
+
+    if not header.startswith(_VERSION) or len(header) < _BUTTON_CHECKSUM_END:
+        return None
+
+    rest, separator, payload = data[_BUTTON_CHECKSUM_END:].partition(_PAYLOAD_SEPARATOR)
+    try:
+        user_id = _unpack_int(rest) if rest else None
+    except ValueError:
+        return None
+
+    return CallbackData(
+        data[len(_VERSION):len(_VERSION) + _CHECKSUM_LENGTH],
+        data[len(_VERSION) + _CHECKSUM_LENGTH:_BUTTON_CHECKSUM_END],
+        user_id,
+        payload if separator else None,
+    )
@@ -0,0 +1,115 @@
+"""The module contains the compressors used by the persistence to reduce
+the size of the large values.
+"""
+
+import zlib
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from hammett.core.exceptions import DeserializationFailed, ImproperlyConfigured
+
+try:
+    import zstandard  # type: ignore[import-not-found,unused-ignore]
+except ImportError:
+    zstandard = None
+
+if TYPE_CHECKING:
+    from typing_extensions import Self
+
+
+@dataclass
+class CompressionStats:
+    """The class represents the statistics of the compression
+    collected by the persistence.
+    """
+
+    compressed_values: int = 0
+    uncompressed_values: int = 0
+    bytes_before: int = 0
+    bytes_after: int = 0
+    compression_time: float = 0
+    decompressed_values: int = 0
+    decompression_time: float = 0
+
+    @property
+    def ratio(self: 'Self') -> float:
+        """Return the ratio of the size of the compressed values before
+        the compression to their size after it.
+        """
+        return self.bytes_before / self.bytes_after if self.bytes_after else 0
+
+
+class BaseCompressor:
+    """The base class for the implementations of compressors."""
+
+    # The byte identifying the compressor in the header of the compressed values.
+    codec_id: bytes = b''
+
+    def compress(self: 'Self', data: bytes) -> bytes:
+        """Compress the specified data."""
+        raise NotImplementedError
+
+    def decompress(self: 'Self', data: bytes) -> bytes:
+        """Decompress the specified data.
+        Raise `DeserializationFailed` if the data is malformed.
+        """
+        raise NotImplementedError
+
+
+class ZlibCompressor(BaseCompressor):
+    """The class implements the compressor based on zlib."""
+
+    codec_id = b'z'
+
+    def __init__(self: 'Self', level: int = 6) -> None:
+        """Initialize a zlib compressor object."""
+        self.level = level
+
+    def compress(self: 'Self', data: bytes) -> bytes:
+        """Compress the specified data."""
+        return zlib.compress(data, self.level)
+
+    def decompress(self: 'Self', data: bytes) -> bytes:
+        """Decompress the specified data."""
+        try:
+            return zlib.decompress(data)
+        except zlib.error as exc:
+            raise DeserializationFailed from exc
+
+
+class ZstdCompressor(BaseCompressor):
+    """The class implements the compressor based on Zstandard.
+    The compressor requires the zstandard package to be installed.
+    """
+
+    codec_id = b's'
+
+    def __init__(self: 'Self', level: int = 3) -> None:
+        """Initialize a Zstandard compressor object."""
+        if zstandard is None:
+            msg = 'ZstdCompressor requires the zstandard package to be installed.'
+            raise ImproperlyConfigured(msg)
+
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._decompressor = zstandard.ZstdDecompressor()
+        self._error = zstandard.ZstdError
+
+    def compress(self: 'Self', data: bytes) -> bytes:
+        """Compress the specified data."""
+        compressed: bytes = self._compressor.compress(data)
+        return compressed
+
+    def decompress(self: 'Self', data: bytes) -> bytes:
+        """Decompress the specified data."""
+        try:
+            decompressed: bytes = self._decompressor.decompress(data)
+        except self._error as exc:
+            raise DeserializationFailed from exc
+
+        return decompressed
+
+
+COMPRESSORS: dict[bytes, type[BaseCompressor]] = {
+    ZlibCompressor.codec_id: ZlibCompressor,
+    ZstdCompressor.codec_id: ZstdCompressor,
+}
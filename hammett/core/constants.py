@@ -7,6 +7,8 @@ from typing import TYPE_CHECKING, TypedDict, cast
 if TYPE_CHECKING:
     from os import PathLike
 
+    from typing_extensions import NotRequired
+
     from hammett.types import Attachments, Document, Keyboard, State
 
 # Use 'cast' instead of 'State(0)' to avoid a circular import
@@ -51,6 +53,9 @@ class FinalRenderConfig(RenderConfig):
     """
 
     keyboard: 'Keyboard' = field(default_factory=list)
+    # The fingerprint of the message rendered with the config, which is used
+    # to skip the edits that don't change the message.
+    fingerprint: str | None = None
 
 
 class SerializedFinalRenderConfig(TypedDict):
@@ -65,3 +70,4 @@ class SerializedFinalRenderConfig(TypedDict):
     document: 'Document | None'
     keyboard: 'Keyboard'
     hide_keyboard: bool
+    fingerprint: 'NotRequired[str | None]'
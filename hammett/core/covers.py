@@ -0,0 +1,349 @@
+"""The module contains the caches of the IDs of the covers uploaded
+to Telegram, so each cover is uploaded once and then sent by its ID.
+The IDs are keyed by the hashes of the contents of the covers, so
+the caches shared by several processes stay valid when the covers are
+moved or changed.
+"""
+
+import asyncio
+import hashlib
+import logging
+import sqlite3
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+import aiofiles
+import aiofiles.os
+
+from hammett.core.exceptions import ImproperlyConfigured
+from hammett.utils.module_loading import import_string
+
+try:
+    from redis.exceptions import RedisError
+
+    from hammett.core import persistences
+except ImportError:
+    persistences = None  # type: ignore[assignment]
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from os import PathLike
+    from typing import Any
+
+    from typing_extensions import Self
+
+LOGGER = logging.getLogger(__name__)
+
+_COVER_KEY_SIZE = 16
+
+# Map the paths to the covers to their sizes, the times of their latest
+# modification and the hashes of their contents, so the covers are read
+# again only when they change.
+_cover_keys: dict[str, tuple[tuple[int, int], str]] = {}
+
+_covers_cache: 'tuple[Any, BaseCoversCache] | None' = None
+
+
+class BaseCoversCache:
+    """The base class for the implementations of the caches of the IDs of
+    the covers. Since the IDs never change for the same contents, the most
+    recently used IDs are also kept in the memory of the process, so
+    the storage is accessed once for each cover.
+    """
+
+    def __init__(self: 'Self', max_size: int = 1000) -> None:
+        """Initialize a covers cache object."""
+        from hammett.conf import settings
+
+        self.max_size = max_size
+
+        # The IDs of the files are unique for each bot.
+        self._bot_id = settings.TOKEN.partition(':')[0]
+        self._file_ids: OrderedDict[str, str] = OrderedDict()
+
+    #
+    # Private methods
+    #
+
+    def _remember(self: 'Self', key: str, file_id: str) -> None:
+        """Keep the specified ID in the memory of the process, evicting
+        the least recently used ones beyond the limit.
+        """
+        self._file_ids[key] = file_id
+        self._file_ids.move_to_end(key)
+        while len(self._file_ids) > self.max_size:
+            self._file_ids.popitem(last=False)
+
+    async def _fetch(self: 'Self', _key: str) -> str | None:
+        """Return the ID of the cover by the specified key from the storage."""
+        return None
+
+    async def _store(self: 'Self', key: str, file_id: str) -> None:
+        """Save the ID of the cover by the specified key to the storage."""
+
+    #
+    # Public methods
+    #
+
+    async def close(self: 'Self') -> None:
+        """Release the resources the cache holds to access the storage."""
+
+    async def get(self: 'Self', key: str) -> str | None:
+        """Return the ID of the cover by the specified key, or None if
+        the cover has not been uploaded yet.
+        """
+        file_id = self._file_ids.get(key)
+        if file_id is None:
+            file_id = await self._fetch(key)
+            if file_id is None:
+                return None
+
+            self._remember(key, file_id)
+        else:
+            self._file_ids.move_to_end(key)
+
+        return file_id
+
+    async def set(self: 'Self', key: str, file_id: str) -> None:
+        """Save the ID of the cover by the specified key."""
+        if self._file_ids.get(key) == file_id:
+            return
+
+        self._remember(key, file_id)
+        await self._store(key, file_id)
+
+
+class MemoryCoversCache(BaseCoversCache):
+    """The class implements the cache keeping the IDs of the covers in
+    the memory of the process only, so the cache is neither persistent nor
+    shared by the processes.
+    """
+
+
+class RedisCoversCache(BaseCoversCache):
+    """The class implements the cache storing the IDs of the covers in Redis,
+    so the covers uploaded by one process are sent by their IDs by all
+    the processes. The connection is configured by the REDIS_PERSISTENCE
+    setting (see `persistences.create_redis_client`). The cache requires
+    the redis package to be installed.
+    """
+
+    _COVERS_KEY = 'covers'
+
+    def __init__(self: 'Self', max_size: int = 1000) -> None:
+        """Initialize a Redis covers cache object."""
+        super().__init__(max_size)
+
+        if persistences is None:
+            msg = 'RedisCoversCache requires the redis package to be installed.'
+            raise ImproperlyConfigured(msg)
+
+        self.redis_cli = persistences.create_redis_client()
+
+    #
+    # Private methods
+    #
+
+    async def _fetch(self: 'Self', key: str) -> str | None:
+        """Return the ID of the cover by the specified key from Redis."""
+        try:
+            file_id = await self.redis_cli.get(self._get_redis_key(key))
+        except RedisError:
+            LOGGER.exception('Failed to get the ID of the cover %s from Redis', key)
+            return None
+
+        return file_id.decode('utf8') if file_id else None
+
+    def _get_redis_key(self: 'Self', key: str) -> str:
+        """Return the key of Redis the ID of the cover is stored by."""
+        return f'{self._COVERS_KEY}:{self._bot_id}:{key}'
+
+    async def _store(self: 'Self', key: str, file_id: str) -> None:
+        """Save the ID of the cover by the specified key to Redis."""
+        try:
+            await self.redis_cli.set(self._get_redis_key(key), file_id)
+        except RedisError:
+            LOGGER.exception('Failed to save the ID of the cover %s to Redis', key)
+
+    #
+    # Public methods
+    #
+
+    async def close(self: 'Self') -> None:
+        """Close the connection to Redis."""
+        await self.redis_cli.aclose()  # type: ignore[attr-defined]
+
+
+class SQLiteCoversCache(BaseCoversCache):
+    """The class implements the cache storing the IDs of the covers in SQLite,
+    so the cache survives the restarts of the bot. The database is specified
+    by the DATABASE key of the COVERS_CACHE setting, or by the DATABASE key
+    of the SQLITE_PERSISTENCE setting if the former is not set. All queries
+    are executed in a dedicated thread, so they don't block the event loop.
+    """
+
+    def __init__(self: 'Self', max_size: int = 1000, database: str | None = None) -> None:
+        """Initialize an SQLite covers cache object."""
+        super().__init__(max_size)
+
+        from hammett.conf import settings
+        try:
+            self.database: str = database or settings.SQLITE_PERSISTENCE['DATABASE']
+        except KeyError as exc:
+            msg = f'{exc.args[0]} is missing in the SQLITE_PERSISTENCE setting.'
+            raise ImproperlyConfigured(msg) from exc
+
+        self._connection: sqlite3.Connection | None = None
+        # All queries are executed in the same thread, so the connection
+        # is never shared between threads. The thread is started on
+        # the first query and stopped when the cache is closed.
+        self._executor: ThreadPoolExecutor | None = None
+
+    #
+    # Private methods
+    #
+
+    def _close(self: 'Self') -> None:
+        """Close the connection to the database, if it's open.
+        The method must be executed in the dedicated thread.
+        """
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    async def _execute(self: 'Self', func: 'Callable[..., Any]', *args: 'Any') -> 'Any':
+        """Execute the specified function in the dedicated thread."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='hammett-covers')
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def _fetch(self: 'Self', key: str) -> str | None:
+        """Return the ID of the cover by the specified key from SQLite."""
+        try:
+            row = await self._execute(self._select, f'{self._bot_id}:{key}')
+        except sqlite3.Error:
+            LOGGER.exception('Failed to get the ID of the cover %s from SQLite', key)
+            return None
+
+        return row[0] if row else None
+
+    def _get_connection(self: 'Self') -> sqlite3.Connection:
+        """Return the connection to the database, opening it if needed.
+        The method must be executed in the dedicated thread.
+        """
+        if self._connection is None:
+            connection = sqlite3.connect(
+                self.database,
+                check_same_thread=False,
+                isolation_level=None,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS hammett_covers ('
+                'key TEXT NOT NULL PRIMARY KEY, file_id TEXT NOT NULL) WITHOUT ROWID',
+            )
+            self._connection = connection
+
+        return self._connection
+
+    def _insert(self: 'Self', key: str, file_id: str) -> None:
+        """Insert the specified ID of the cover into the database.
+        The method must be executed in the dedicated thread.
+        """
+        self._get_connection().execute(
+            'INSERT OR REPLACE INTO hammett_covers (key, file_id) VALUES (?, ?)',
+            (key, file_id),
+        )
+
+    def _select(self: 'Self', key: str) -> tuple[str] | None:
+        """Return the row of the cover by the specified key.
+        The method must be executed in the dedicated thread.
+        """
+        cursor = self._get_connection().execute(
+            'SELECT file_id FROM hammett_covers WHERE key = ?',
+            (key, ),
+        )
+        row: tuple[str] | None = cursor.fetchone()
+        return row
+
+    async def _store(self: 'Self', key: str, file_id: str) -> None:
+        """Save the ID of the cover by the specified key to SQLite."""
+        try:
+            await self._execute(self._insert, f'{self._bot_id}:{key}', file_id)
+        except sqlite3.Error:
+            LOGGER.exception('Failed to save the ID of the cover %s to SQLite', key)
+
+    #
+    # Public methods
+    #
+
+    async def close(self: 'Self') -> None:
+        """Close the connection to the database and stop the dedicated thread."""
+        if self._executor is None:
+            return
+
+        await self._execute(self._close)
+        # The thread is idle since the connection is closed.
+        self._executor.shutdown(wait=True)
+        self._executor = None
+
+
+async def calc_cover_key(cover: 'str | PathLike[str]') -> str:
+    """Return the key of the specified local cover calculated from its
+    contents. The cover is read again only if it has changed.
+    """
+    path = str(cover)
+    stat = await aiofiles.os.stat(path)
+    signature = (stat.st_size, stat.st_mtime_ns)
+    cached = _cover_keys.get(path)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    async with aiofiles.open(path, 'rb') as infile:
+        contents = await infile.read()
+
+    key = hashlib.blake2b(contents, digest_size=_COVER_KEY_SIZE).hexdigest()
+    _cover_keys[path] = (signature, key)
+    return key
+
+
+async def close_covers_cache() -> None:
+    """Close the covers cache returned by `get_covers_cache`, if it has
+    been created. The next call to `get_covers_cache` creates it anew.
+    """
+    global _covers_cache  # noqa: PLW0603
+
+    if _covers_cache is None:
+        return
+
+    _, covers_cache = _covers_cache
+    _covers_cache = None
+    await covers_cache.close()
+
+
+def get_covers_cache() -> BaseCoversCache:
+    """Return the covers cache specified by the COVERS_CACHE setting.
+    The cache is created once and shared by all the screens.
+    """
+    global _covers_cache  # noqa: PLW0603
+
+    from hammett.conf import settings
+    config = settings.COVERS_CACHE
+    options = (
+        config.get('BACKEND', 'hammett.core.covers.MemoryCoversCache'),
+        config.get('MAX_SIZE', 1000),
+        config.get('DATABASE'),
+    )
+    if _covers_cache is None or _covers_cache[0] != options:
+        backend, max_size, database = options
+        covers_cache: type[BaseCoversCache] = import_string(backend)
+        kwargs: dict[str, Any] = {'max_size': max_size}
+        if database is not None:
+            kwargs['database'] = database
+
+        _covers_cache = (options, covers_cache(**kwargs))
+
+    return _covers_cache[1]
@@ -0,0 +1,79 @@
+"""The module contains the dispatcher routing the callback queries to
+the handlers of the buttons.
+"""
+
+from typing import TYPE_CHECKING, Any, cast
+
+from telegram import Update
+from telegram.ext import BaseHandler
+
+from hammett.core.callback_data import parse_callback_data
+
+if TYPE_CHECKING:
+    from telegram.ext import Application, CallbackContext
+    from typing_extensions import Self
+
+    from hammett.types import HandlerAlias
+
+__all__ = ('CallbackQueryDispatcher', )
+
+
+class CallbackQueryDispatcher(BaseHandler[Update, 'CallbackContext[Any, Any, Any, Any]']):
+    """The class implements the handler routing the callback queries of
+    a state to the handlers of the buttons. The callback data created by
+    the buttons contains the checksum of the handler, so the data is
+    parsed once and the handler is looked up by the checksum instead of
+    matching the data against the pattern of each handler in turn.
+    """
+
+    __slots__ = ('handlers', )
+
+    def __init__(self: 'Self') -> None:
+        """Initialize a callback query dispatcher object."""
+        super().__init__(self._dispatch)
+
+        self.handlers: dict[str, HandlerAlias] = {}
+
+    #
+    # Private methods
+    #
+
+    @staticmethod
+    async def _dispatch(_update: 'Update', _context: 'CallbackContext[Any, Any, Any, Any]') -> None:
+        """Stub the callback, since the handlers are called by `handle_update`."""
+
+    #
+    # Public methods
+    #
+
+    def add_handler(self: 'Self', checksum: str, handler: 'HandlerAlias') -> None:
+        """Route the callback queries with the specified checksum to
+        the specified handler. If the checksum is already routed,
+        the handler added first is kept.
+        """
+        self.handlers.setdefault(checksum, handler)
+
+    def check_update(self: 'Self', update: object) -> 'HandlerAlias | None':
+        """Return the handler the callback query should be routed to,
+        or None if the update is not handled by the dispatcher.
+        """
+        if not isinstance(update, Update) or not update.callback_query:
+            return None
+
+        data = update.callback_query.data
+        if not isinstance(data, str):
+            return None
+
+        callback_data = parse_callback_data(data)
+        return self.handlers.get(callback_data.handler_checksum) if callback_data else None
+
+    async def handle_update(  # type: ignore[override]
+        self: 'Self',
+        update: 'Update',
+        application: 'Application[Any, CallbackContext[Any, Any, Any, Any], Any, Any, Any, Any]',
+        check_result: object,
+        context: 'CallbackContext[Any, Any, Any, Any]',
+    ) -> object:
+        """Call the handler the callback query is routed to."""
+        self.collect_additional_context(context, update, application, check_result)
+        return await cast('HandlerAlias', check_result)(update, context)
@@ -7,6 +7,10 @@ class CommandNameIsEmpty(Exception):
     """
 
 
+class DeserializationFailed(Exception):
+    """Raised when the data to be deserialized is malformed."""
+
+
 class FailedToGetDataAttributeOfQuery(Exception):
     """Raised when the attempt to get a data attribute of a query fails."""
 
@@ -19,6 +23,16 @@ class ImproperlyConfigured(Exception):
     """Raised when Hammett is somehow improperly configured."""
 
 
+class HandlerChecksumCollision(Exception):
+    """Raised when the checksums of two different handlers are found
+    to be the same.
+    """
+
+
+class HiderIsInvalid(Exception):
+    """Raised when the ID of a hider is not a non-negative integer."""
+
+
 class HiderIsUnregistered(Exception):
     """Raised when an unregistered hider is used."""
 
@@ -1,26 +1,58 @@
 """The module contains the routines to ensure the functioning of handlers."""
 
+import base64
+import hashlib
 import inspect
 import logging
 import zlib
-from contextlib import suppress
-from functools import wraps
+from contextlib import contextmanager, suppress
+from contextvars import ContextVar
+from functools import lru_cache, wraps
+from types import MappingProxyType
 from typing import TYPE_CHECKING, Any, cast
 
-from hammett.core.exceptions import CommandNameIsEmpty
+from hammett.core.exceptions import CommandNameIsEmpty, HandlerChecksumCollision
+from hammett.core.payloads import PayloadStorage
 from hammett.types import HandlerAlias, HandlerType, State
 
 if TYPE_CHECKING:
-    from collections.abc import Callable
+    from collections.abc import Callable, Iterator
 
     from telegram.ext import CallbackContext
     from telegram.ext._utils.types import BD, BT, CD, UD
     from telegram.ext.filters import BaseFilter
 
-    from hammett.types import Handler, PayloadStorage
+    from hammett.types import Handler
 
 LOGGER = logging.getLogger(__name__)
 
+# The captions of the buttons are not registered, so their checksums are cached.
+_CHECKSUMS_CACHE_SIZE = 4096
+
+# 6 bytes are encoded with 8 characters of base64 without padding.
+_CHECKSUM_SIZE = 6
+
+_checksums: dict[str, str] = {}
+
+# Map the checksums to the names of the handlers registered with them and
+# the identities of the handlers (see `_get_handler_identity`).
+_checksum_owners: dict[str, tuple[str, tuple[type | None, 'Callable[..., Any]']]] = {}
+
+# The read-only view of the registry mapping the names of the handlers
+# to their checksums.
+CHECKSUMS = MappingProxyType(_checksums)
+
+# The ids of the messages are never empty, so the key can't clash with them.
+# The key is used only when the keyboard is created outside of rendering.
+_PENDING_PAYLOADS_KEY = ''
+
+# The payloads of the keyboard being rendered. Each rendering collects
+# its own ones, so the concurrent renderings don't mix them up.
+_pending_payloads: ContextVar[dict[str, Any] | None] = ContextVar(
+    'pending_payloads',
+    default=None,
+)
+
 
 def _clear_command_name(command_name: str) -> str:
     """Clear the specified command name.
@@ -36,6 +68,24 @@ def _clear_command_name(command_name: str) -> str:
     return command_name
 
 
+def _get_handler_identity(handler: 'Handler') -> tuple[type | None, 'Callable[..., Any]']:
+    """Return the class of the object the specified handler is bound to
+    (None if the handler is not bound) and the function it's bound to.
+    Bound methods are created on every attribute access, so they are
+    compared by their identities instead.
+    """
+    try:
+        return type(handler.__self__), handler.__func__  # type: ignore[attr-defined]
+    except AttributeError:  # when a handler is static
+        return None, handler
+
+
+def _get_handler_module(identity: tuple[type | None, 'Callable[..., Any]']) -> str:
+    """Return the module the handler with the specified identity is defined in."""
+    cls, func = identity
+    return (cls or func).__module__
+
+
 def _get_handler_name(handler: 'Handler') -> str:
     """Return the full name of the specified handler."""
     try:
@@ -81,28 +131,194 @@ def _register_handler(
     return create_decorator
 
 
+@lru_cache(maxsize=_CHECKSUMS_CACHE_SIZE)
+def _calc_name_checksum(name: str) -> str:
+    """Return the checksum of the specified name encoded with the URL-safe
+    base64 alphabet, so it never contains the separators of the callback data.
+    """
+    digest = hashlib.blake2b(name.encode('utf8'), digest_size=_CHECKSUM_SIZE).digest()
+    return base64.urlsafe_b64encode(digest).decode('ascii')
+
+
 def calc_checksum(obj: 'Any') -> str:
     """Calculate a checksum of the specified object."""
     if callable(obj):  # in a case of a handler
         handler_name = _get_handler_name(obj)
-        return str(zlib.adler32(handler_name.encode('utf8')))
+        return CHECKSUMS.get(handler_name) or _calc_name_checksum(handler_name)
 
     if isinstance(obj, str):  # in a case of a button caption
+        return _calc_name_checksum(obj)
+
+    raise TypeError
+
+
+def calc_legacy_checksum(obj: 'Any') -> str:
+    """Calculate a checksum of the specified object the way the previous
+    versions of Hammett did, to route the buttons sent by them.
+    """
+    if callable(obj):  # in a case of a handler
+        obj = _get_handler_name(obj)
+
+    if isinstance(obj, str):
         return str(zlib.adler32(obj.encode('utf8')))
 
     raise TypeError
 
 
-def get_payload_storage(context: 'CallbackContext[BT, UD, CD, BD]') -> 'PayloadStorage':
-    """Return the payload storage."""
+def register_checksum(handler: 'Handler') -> str:
+    """Calculate the checksum of the specified handler once and keep it in
+    the registry of the checksums, so the buttons don't recalculate it on
+    every render. Raise `HandlerChecksumCollision` if another handler has
+    already been registered with the same checksum.
+    """
+    handler_name = _get_handler_name(handler)
+    checksum = _calc_name_checksum(handler_name)
+    # The screens with the same name defined in different modules share
+    # the names of their handlers, even if the handlers are inherited from
+    # the same class, so the classes the handlers are bound to are compared too.
+    identity = _get_handler_identity(handler)
+    owner = _checksum_owners.setdefault(checksum, (handler_name, identity))
+    if owner != (handler_name, identity):
+        owner_name, owner_identity = owner
+        msg = (
+            f'The checksum of {handler_name} ({_get_handler_module(identity)}) '
+            f'collides with the checksum of {owner_name} '
+            f'({_get_handler_module(owner_identity)}). Rename one of the handlers.'
+        )
+        raise HandlerChecksumCollision(msg)
+
+    _checksums[handler_name] = checksum
+    return checksum
+
+
+def _get_user_payloads(
+    context: 'CallbackContext[BT, UD, CD, BD]',
+) -> 'dict[str, dict[str, Any]] | None':
+    """Return the dict mapping the ids of the messages sent to the user to
+    the payloads of their keyboards, or None if there is no user_data
+    (e.g., in jobs).
+    """
     from hammett.conf import settings
-    namespace = settings.PAYLOAD_NAMESPACE
-    bot_data = cast('dict[str, PayloadStorage]', context.bot_data)
+    if not isinstance(context.user_data, dict):
+        return None
+
+    user_data = cast('dict[str, dict[str, dict[str, Any]]]', context.user_data)
+    return user_data.setdefault(settings.PAYLOAD_NAMESPACE, {})
+
+
+@contextmanager
+def collect_pending_payloads() -> 'Iterator[None]':
+    """Collect the payloads of the keyboard created within the block separately
+    from the other renderings. The payloads not bound to a message via
+    `save_pending_payloads` are discarded on exit.
+    """
+    token = _pending_payloads.set({})
     try:
-        return bot_data[namespace]
-    except KeyError:
-        bot_data[namespace] = {}
-        return bot_data[namespace]
+        yield
+    finally:
+        _pending_payloads.reset(token)
+
+
+def delete_payloads(context: 'CallbackContext[BT, UD, CD, BD]', message_id: int) -> None:
+    """Delete the payloads of the keyboard of the specified message."""
+    user_payloads = _get_user_payloads(context)
+    if user_payloads is not None:
+        user_payloads.pop(str(message_id), None)
+
+
+def get_payload_storage(
+    context: 'CallbackContext[BT, UD, CD, BD]',
+    message_id: int | None = None,
+) -> 'PayloadStorage':
+    """Return the storage of the payloads of the keyboard of the specified
+    message, or the storage of the payloads of the keyboard being rendered
+    if the message is not specified. The payloads are kept in user_data, so
+    storing them doesn't change bot_data. If there is no user_data (e.g., in
+    jobs), return the storage shared by all users.
+    """
+    from hammett.conf import settings
+    user_payloads = _get_user_payloads(context)
+    if user_payloads is None:
+        return get_shared_payload_storage(context)
+
+    # Looking up the payloads of a message must not leave an empty storage
+    # in user_data, so only the storage of the keyboard being rendered is
+    # created on demand.
+    if message_id is None:
+        entries = _pending_payloads.get()
+        if entries is None:
+            entries = user_payloads.setdefault(_PENDING_PAYLOADS_KEY, {})
+    else:
+        entries = user_payloads.get(str(message_id), {})
+
+    return PayloadStorage(
+        entries,
+        settings.PAYLOAD_STORAGE_MAX_SIZE,
+        settings.PAYLOAD_STORAGE_TTL,
+    )
+
+
+def get_shared_payload_storage(context: 'CallbackContext[BT, UD, CD, BD]') -> 'PayloadStorage':
+    """Return the storage of the payloads shared by all users."""
+    from hammett.conf import settings
+    bot_data = cast('dict[str, dict[str, Any]]', context.bot_data)
+    return PayloadStorage(
+        bot_data.setdefault(settings.PAYLOAD_NAMESPACE, {}),
+        settings.PAYLOAD_STORAGE_MAX_SIZE,
+        settings.PAYLOAD_STORAGE_TTL,
+    )
+
+
+def get_unbound_payload_storage(
+    context: 'CallbackContext[BT, UD, CD, BD]',
+) -> 'PayloadStorage | None':
+    """Return the storage of the payloads of the keyboards created outside
+    of rendering, which are not bound to any message, or None if there is
+    no user_data (e.g., in jobs).
+    """
+    from hammett.conf import settings
+    user_payloads = _get_user_payloads(context)
+    if user_payloads is None:
+        return None
+
+    return PayloadStorage(
+        user_payloads.get(_PENDING_PAYLOADS_KEY, {}),
+        settings.PAYLOAD_STORAGE_MAX_SIZE,
+        settings.PAYLOAD_STORAGE_TTL,
+    )
+
+
+def save_pending_payloads(
+    context: 'CallbackContext[BT, UD, CD, BD]',
+    message_id: int | None,
+) -> None:
+    """Bind the payloads of the keyboard being rendered to the specified
+    message, replacing the payloads of its previous keyboard, or discard
+    them if the message is not specified. Only the payloads of the latest
+    `PAYLOAD_STORAGE_MAX_MESSAGES` messages are kept.
+    """
+    from hammett.conf import settings
+    user_payloads = _get_user_payloads(context)
+    if user_payloads is None:
+        return
+
+    pending_payloads = _pending_payloads.get()
+    if pending_payloads is None:
+        payloads = user_payloads.pop(_PENDING_PAYLOADS_KEY, None)
+    else:
+        payloads = dict(pending_payloads)
+        pending_payloads.clear()
+
+    if message_id is None:
+        return
+
+    key = str(message_id)
+    user_payloads.pop(key, None)
+    if payloads:
+        user_payloads[key] = payloads
+
+    while len(user_payloads) > settings.PAYLOAD_STORAGE_MAX_MESSAGES:
+        del user_payloads[next(iter(user_payloads))]
 
 
 def log_unregistered_handler(obj: 'Any') -> None:
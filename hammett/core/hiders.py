@@ -1,12 +1,27 @@
 """The module contains the implementation of the hiders mechanism."""
 
 import asyncio
+import contextlib
+import functools
+import inspect
+import json
+import logging
+import time
+import warnings
+from contextvars import ContextVar
+from dataclasses import dataclass, field
 from typing import TYPE_CHECKING
 
-from hammett.core.exceptions import HiderIsUnregistered
+from hammett.core.exceptions import HiderIsInvalid, HiderIsUnregistered, ImproperlyConfigured
+from hammett.utils.module_loading import import_string
+
+try:
+    from hammett.core import persistences
+except ImportError:
+    persistences = None  # type: ignore[assignment]
 
 if TYPE_CHECKING:
-    from collections.abc import Awaitable, Callable
+    from collections.abc import Awaitable, Callable, Iterator
     from typing import Any
 
     from telegram import Update
@@ -20,30 +35,357 @@ if TYPE_CHECKING:
     ONLY_FOR_MODERATORS,
 ) = range(3)
 
+LOGGER = logging.getLogger(__name__)
+
+# The number of seconds to wait before reconnecting to the invalidation
+# channel. The delay is doubled on every failed attempt up to the maximum.
+_RECONNECT_DELAY = 1
+
+_MAX_RECONNECT_DELAY = 60
+
+
+@dataclass
+class _RolesMask:
+    """The class represents the roles of a user as the bitmask of the hiders
+    the user passes, along with the bitmask of the hiders already checked.
+    """
+
+    checked: int = 0
+    roles: int = 0
+
+
+@dataclass
+class _RenderCache:
+    """The class represents the results of the checks made while
+    the current update is being rendered. The results are keyed by the id
+    of the checker, since the checkers may implement the same hiders
+    differently, the hider (if any) and the id of the user.
+    """
+
+    checks: 'dict[tuple[int, int, int | None], asyncio.Future[bool]]' = field(
+        default_factory=dict,
+    )
+    roles: dict[tuple[int, int | None], _RolesMask] = field(default_factory=dict)
+
+
+_render_cache: ContextVar[_RenderCache | None] = ContextVar('render_cache', default=None)
+
+
+@dataclass
+class ChecksCacheStats:
+    """The class represents the statistics of the cache of the results
+    of the hiders checks.
+    """
+
+    hits: int = 0
+    misses: int = 0
+    shared_hits: int = 0
+    shared_misses: int = 0
+
+
+CHECKS_CACHE_STATS = ChecksCacheStats()
+
+
+@contextlib.contextmanager
+def cache_checks() -> 'Iterator[None]':
+    """Cache the results of the hiders checks within the block, so each hider
+    is checked at most once for each user. The blocks can be nested, in which
+    case the cache of the outermost one is used.
+    """
+    if _render_cache.get() is not None:
+        yield
+        return
+
+    token = _render_cache.set(_RenderCache())
+    try:
+        yield
+    finally:
+        _render_cache.reset(token)
+
+
+class SharedChecksCache:
+    """The class implements the cache of the results of the hiders checks
+    shared by the updates. A result expires `ttl` seconds after it's cached,
+    and the least recently cached results are evicted as soon as the number
+    of them exceeds `max_size`.
+    """
+
+    def __init__(self: 'Self', ttl: float, max_size: int) -> None:
+        """Initialize a shared checks cache object."""
+        self.max_size = max_size
+        self.ttl = ttl
+
+        # The generation is incremented on every invalidation, so the results
+        # of the checks started before an invalidation are not cached.
+        self.generation = 0
+
+        self._results: dict[tuple[int | None, int], tuple[bool, float]] = {}
+
+    def get(self: 'Self', user_id: int | None, hider: int) -> bool | None:
+        """Return the cached result of checking the specified hider for
+        the specified user, or None if there is no such result or it has expired.
+        """
+        try:
+            result, expires_at = self._results[user_id, hider]
+        except KeyError:
+            return None
+
+        if expires_at <= time.monotonic():
+            del self._results[user_id, hider]
+            return None
+
+        return result
+
+    def invalidate(self: 'Self', user_id: int | None = None, hider: int | None = None) -> None:
+        """Remove the cached results of checking the specified hider for
+        the specified user. If the user is not specified, the results of all
+        the users are removed, and if the hider is not specified, the results
+        of all the hiders are removed.
+        """
+        self.generation += 1
+        if user_id is None and hider is None:
+            self._results.clear()
+            return
+
+        self._results = {
+            (result_user_id, result_hider): entry
+            for (result_user_id, result_hider), entry in self._results.items()
+            if (
+                (user_id is not None and result_user_id != user_id) or
+                (hider is not None and result_hider != hider)
+            )
+        }
+
+    def set(
+        self: 'Self',
+        user_id: int | None,
+        hider: int,
+        result: bool,  # noqa: FBT001
+        generation: int,
+    ) -> None:
+        """Cache the result of checking the specified hider for the specified
+        user, unless the cache has been invalidated since the specified
+        generation.
+        """
+        if generation != self.generation:
+            return
+
+        now = time.monotonic()
+        self._results.pop((user_id, hider), None)
+        self._results[user_id, hider] = (result, now + self.ttl)
+        while self._results:
+            key, (_, expires_at) = next(iter(self._results.items()))
+            if expires_at > now and len(self._results) <= self.max_size:
+                break
+
+            del self._results[key]
+
+
+_shared_checks_cache: SharedChecksCache | None = None
+
+_invalidations_listener: 'asyncio.Task[None] | None' = None
+
+
+def _apply_invalidation(message: dict[str, 'Any']) -> None:
+    """Apply the invalidation made by another process and received as
+    the specified message of the invalidation channel.
+    """
+    if message['type'] != 'message' or _shared_checks_cache is None:
+        return
+
+    try:
+        invalidation = json.loads(message['data'])
+        _shared_checks_cache.invalidate(invalidation['user_id'], invalidation['hider'])
+    except (KeyError, TypeError, ValueError):
+        LOGGER.warning('Malformed invalidation of the hiders checks: %r', message)
+
+
+def _create_redis_client() -> 'Any':
+    """Return the client of the Redis instance the invalidations are
+    published through (see `persistences.create_redis_client`).
+    """
+    if persistences is None:
+        msg = (
+            'The INVALIDATION_CHANNEL of the HIDERS_CHECKS_CACHE setting requires '
+            'the redis package to be installed.'
+        )
+        raise ImproperlyConfigured(msg)
+
+    return persistences.create_redis_client()
+
+
+def _get_shared_checks_cache() -> SharedChecksCache | None:
+    """Return the cache of the results of the hiders checks configured by
+    the HIDERS_CHECKS_CACHE setting, or None if the cache is disabled.
+    """
+    global _shared_checks_cache  # noqa: PLW0603
+
+    from hammett.conf import settings
+    ttl = settings.HIDERS_CHECKS_CACHE.get('TTL')
+    if ttl is None:
+        return None
+
+    max_size = settings.HIDERS_CHECKS_CACHE.get('MAX_SIZE', 10000)
+    if (
+        _shared_checks_cache is None or
+        (_shared_checks_cache.ttl, _shared_checks_cache.max_size) != (ttl, max_size)
+    ):
+        _shared_checks_cache = SharedChecksCache(ttl, max_size)
+
+    return _shared_checks_cache
+
+
+async def _listen_to_invalidations(channel: str) -> None:
+    """Apply the invalidations received through the specified Redis channel.
+    If the connection fails, reconnect with the exponentially growing delay.
+    """
+    delay = _RECONNECT_DELAY
+    while True:
+        client = _create_redis_client()
+        try:
+            async with client.pubsub() as pubsub:
+                await pubsub.subscribe(channel)
+                delay = _RECONNECT_DELAY
+                async for message in pubsub.listen():
+                    _apply_invalidation(message)
+        # The listener must keep running whatever happens to the connection,
+        # otherwise the invalidations made by other processes are lost.
+        except Exception:
+            LOGGER.exception(
+                'Failed to listen to the invalidation channel %s, reconnecting in %d seconds',
+                channel,
+                delay,
+            )
+        finally:
+            await client.aclose()
+
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, _MAX_RECONNECT_DELAY)
+
+
+async def invalidate_checks(*, user_id: int | None = None, hider: int | None = None) -> None:
+    """Remove the cached results of checking the specified hider (e.g.,
+    ONLY_FOR_ADMIN) for the specified user, so the hider is checked again
+    on the next render. If the user is not specified, the results of all
+    the users are removed, and if the hider is not specified, the results
+    of all the hiders are removed. The invalidation is published to
+    the other processes if the invalidation channel is specified.
+    """
+    cache = _get_shared_checks_cache()
+    if cache is None:
+        return
+
+    cache.invalidate(user_id, hider)
+
+    from hammett.conf import settings
+    channel = settings.HIDERS_CHECKS_CACHE.get('INVALIDATION_CHANNEL')
+    if channel:
+        client = _create_redis_client()
+        try:
+            await client.publish(channel, json.dumps({'user_id': user_id, 'hider': hider}))
+        finally:
+            await client.aclose()
+
+
+def start_invalidations_listener() -> None:
+    """Start the task applying the invalidations of the cached results of
+    the hiders checks made by the other processes, if the invalidation channel
+    is specified and the task is not running yet. The function must be called
+    in the event loop of the bot, so it's called by the application on start.
+    """
+    global _invalidations_listener  # noqa: PLW0603
+
+    from hammett.conf import settings
+    channel = settings.HIDERS_CHECKS_CACHE.get('INVALIDATION_CHANNEL')
+    if not channel or settings.HIDERS_CHECKS_CACHE.get('TTL') is None:
+        return
+
+    if _invalidations_listener is None or _invalidations_listener.done():
+        _invalidations_listener = asyncio.create_task(_listen_to_invalidations(channel))
+
+
+async def stop_invalidations_listener() -> None:
+    """Stop the task started by `start_invalidations_listener`, if it's running."""
+    global _invalidations_listener  # noqa: PLW0603
+
+    if _invalidations_listener is None:
+        return
+
+    _invalidations_listener.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await _invalidations_listener
+
+    _invalidations_listener = None
+
+
+def _forget_failed_check(
+    checks: 'dict[tuple[int, int, int | None], asyncio.Future[bool]]',
+    key: tuple[int, int, int | None],
+    check: 'asyncio.Future[bool]',
+) -> None:
+    """Remove the specified check from the cache if it has failed or has been
+    cancelled, so the hider is checked again instead of re-raising the error.
+    """
+    if (check.cancelled() or check.exception() is not None) and checks.get(key) is check:
+        del checks[key]
+
+
+def _get_user_id(
+    update: 'Update | None',
+    context: 'CallbackContext[BT, UD, CD, BD]',
+) -> int | None:
+    """Return the ID of the user the hiders are checked for."""
+    if update is None or update.effective_user is None:
+        return context._user_id  # noqa: SLF001
+
+    return update.effective_user.id
+
+
+def _validate_hider(hider: int) -> None:
+    """Raise `HiderIsInvalid` if the ID of the specified hider can't stand
+    for a bit of a bitmask, i.e. it's not a non-negative integer.
+    """
+    if not isinstance(hider, int) or hider < 0:
+        msg = f"The ID of the hider must be a non-negative integer, got '{hider!r}'"
+        raise HiderIsInvalid(msg)
+
 
 class Hider:
     """The class implements a hider."""
 
     def __init__(self: 'Self', hider: int) -> None:
         """Initialize a hider object."""
+        _validate_hider(hider)
         self.hider: int = hider
         self.hiders_set: set[int] = {hider}
+        # The bitmask with the bits of the combined hiders set.
+        self.mask: int = 1 << hider
 
     def __or__(self: 'Self', other: 'Hider') -> 'Self':
         """Perform `or` operation."""
         self.hiders_set.add(other.hider)
+        self.mask |= other.mask
         return self
 
 
 class HidersChecker:
     """The base class for the implementations of custom hiders checkers."""
 
-    def __init__(self: 'Self', hiders_set: set[int]) -> None:
-        """Initialize a hider checker object."""
+    def __init__(self: 'Self', hiders_set: set[int] | None = None) -> None:
+        """Initialize a hider checker object. The checker is shared by all
+        the buttons (see `get_hiders_checker`), so the hiders are passed to
+        `check_mask` on every call, while the hiders set the checker is
+        initialized with is used only by `run`.
+        """
         if getattr(self, 'custom_hiders', None) is None:
             self.custom_hiders: dict[int, Callable[[Any, Any], Awaitable[Any]]] = {}
 
-        self._hiders_set = hiders_set
+        self._hiders_set = hiders_set or set()
+        for hider in (*self._hiders_set, *self.custom_hiders):
+            _validate_hider(hider)
+
+        self._hiders_mask = sum(1 << hider for hider in self._hiders_set)
+        self._coroutine_hiders: set[int] = set()
         self._registered_hiders: dict[int, Callable[[Any, Any], Awaitable[Any]]] = {}
         self._register_hiders()
 
@@ -51,6 +393,70 @@ class HidersChecker:
     # Private methods
     #
 
+    async def _call_hider_handler(
+        self: 'Self',
+        hider: int,
+        update: 'Update | None',
+        context: 'CallbackContext[BT, UD, CD, BD]',
+    ) -> bool:
+        """Call the handler of the specified hider."""
+        try:
+            hider_handler = self._registered_hiders[hider]
+        except KeyError as exc:
+            msg = f"The hider '{hider}' is unregistered"
+            raise HiderIsUnregistered(msg) from exc
+
+        shared_cache = _get_shared_checks_cache()
+        if shared_cache is not None:
+            user_id = _get_user_id(update, context)
+            result = shared_cache.get(user_id, hider)
+            if result is not None:
+                CHECKS_CACHE_STATS.shared_hits += 1
+                return result
+
+            CHECKS_CACHE_STATS.shared_misses += 1
+            generation = shared_cache.generation
+
+        if hider in self._coroutine_hiders:
+            result = bool(await hider_handler(update, context))
+        else:
+            result = bool(hider_handler(update, context))
+
+        if shared_cache is not None:
+            shared_cache.set(user_id, hider, result, generation)
+
+        return result
+
+    async def _check(
+        self: 'Self',
+        hider: int,
+        update: 'Update | None',
+        context: 'CallbackContext[BT, UD, CD, BD]',
+    ) -> bool:
+        """Check the specified hider, reusing the result of the check made
+        earlier (or still in progress) while the current update is being
+        rendered.
+        """
+        cache = _render_cache.get()
+        if cache is None:
+            return await self._call_hider_handler(hider, update, context)
+
+        key = (id(self), hider, _get_user_id(update, context))
+        try:
+            check = cache.checks[key]
+        except KeyError:
+            CHECKS_CACHE_STATS.misses += 1
+            check = cache.checks[key] = asyncio.ensure_future(
+                self._call_hider_handler(hider, update, context),
+            )
+            check.add_done_callback(functools.partial(_forget_failed_check, cache.checks, key))
+        else:
+            CHECKS_CACHE_STATS.hits += 1
+
+        # Shield the check shared by the buttons, so cancelling one of them
+        # doesn't cancel the check for the others.
+        return await asyncio.shield(check)
+
     def _register_hiders(self: 'Self') -> None:
         self._registered_hiders = {
             ONLY_FOR_ADMIN: self.is_admin,
@@ -58,6 +464,11 @@ class HidersChecker:
             ONLY_FOR_MODERATORS: self.is_moderator,
             **self.custom_hiders,
         }
+        self._coroutine_hiders = {
+            hider
+            for hider, hider_handler in self._registered_hiders.items()
+            if asyncio.iscoroutinefunction(hider_handler)
+        }
 
     #
     # Public methods
@@ -87,6 +498,41 @@ class HidersChecker:
         """Represent a stub for checking whether the user is a moderator."""
         return False
 
+    async def check_mask(
+        self: 'Self',
+        mask: int,
+        update: 'Update | None',
+        context: 'CallbackContext[BT, UD, CD, BD]',
+    ) -> bool:
+        """Return True if the user passes any of the hiders the bits of
+        the specified mask stand for. While the current update is being
+        rendered, the roles of the user are resolved into a bitmask once,
+        so checking the hiders resolved earlier is a single bitwise AND.
+        """
+        cache = _render_cache.get()
+        if cache is None:
+            roles_mask = _RolesMask()
+        else:
+            roles_mask = cache.roles.setdefault(
+                (id(self), _get_user_id(update, context)),
+                _RolesMask(),
+            )
+
+        if roles_mask.roles & mask:
+            return True
+
+        unchecked = mask & ~roles_mask.checked
+        while unchecked:
+            bit = unchecked & -unchecked
+            unchecked ^= bit
+            passed = await self._check(bit.bit_length() - 1, update, context)
+            roles_mask.checked |= bit
+            if passed:
+                roles_mask.roles |= bit
+                return True
+
+        return False
+
     async def run(
         self: 'Self',
         update: 'Update | None',
@@ -97,17 +543,78 @@ class HidersChecker:
         returns True if any of the checks is True.
         The method is invoked under the hood, so you should not run it directly.
         """
-        for hider in self._hiders_set:
-            try:
-                hider_handler = self._registered_hiders[hider]
-            except KeyError as exc:
-                msg = f"The hider '{hider}' is unregistered"
-                raise HiderIsUnregistered(msg) from exc
-
-            if asyncio.iscoroutinefunction(hider_handler):
-                if await hider_handler(update, context):
-                    return True
-            elif hider_handler(update, context):
-                return True
+        return await self.check_mask(self._hiders_mask, update, context)
+
+
+_hiders_checker: 'tuple[str, type[HidersChecker], HidersChecker | None] | None' = None
 
+_legacy_hiders_checkers: dict[type[HidersChecker], bool] = {}
+
+
+def _requires_hiders_set(hiders_checker: type[HidersChecker]) -> bool:
+    """Return True if the specified hiders checker can't be initialized
+    without the hiders set.
+    """
+    _, *parameters = inspect.signature(hiders_checker.__init__).parameters.values()
+    if not parameters:
         return False
+
+    hiders_set = parameters[0]
+    return hiders_set.default is inspect.Parameter.empty and hiders_set.kind in {
+        inspect.Parameter.POSITIONAL_ONLY,
+        inspect.Parameter.POSITIONAL_OR_KEYWORD,
+    }
+
+
+def is_legacy_hiders_checker(hiders_checker: type[HidersChecker]) -> bool:
+    """Return True if the specified hiders checker is written for the API
+    where every button created its own checker, i.e. the checker requires
+    the hiders set when it's initialized or overrides `run`.
+    """
+    try:
+        return _legacy_hiders_checkers[hiders_checker]
+    except KeyError:
+        is_legacy = _legacy_hiders_checkers[hiders_checker] = (
+            hiders_checker.run is not HidersChecker.run or
+            _requires_hiders_set(hiders_checker)
+        )
+        return is_legacy
+
+
+def get_hiders_checker(hiders_set: set[int] | None = None) -> HidersChecker:
+    """Return the hiders checker specified by the HIDERS_CHECKER setting.
+    The checker is created once and shared by all the buttons, except
+    for the legacy checkers (see `is_legacy_hiders_checker`), which are
+    still created with the specified hiders set on every call.
+    Raise `ImproperlyConfigured` if the setting is not set.
+    """
+    global _hiders_checker  # noqa: PLW0603
+
+    from hammett.conf import settings
+    if not settings.HIDERS_CHECKER:
+        msg = "The 'HIDERS_CHECKER' setting is not set"
+        raise ImproperlyConfigured(msg)
+
+    if _hiders_checker is None or _hiders_checker[0] != settings.HIDERS_CHECKER:
+        hiders_checker_class: type[HidersChecker] = import_string(settings.HIDERS_CHECKER)
+        if is_legacy_hiders_checker(hiders_checker_class):
+            msg = (
+                f"The hiders checker '{settings.HIDERS_CHECKER}' requires the hiders set "
+                "when it's initialized or overrides 'run', so it's created for every "
+                "button. Such checkers are deprecated: make the hiders set optional "
+                "and implement the checks in the handlers of the hiders instead."
+            )
+            warnings.warn(msg, DeprecationWarning, stacklevel=2)
+            _hiders_checker = (settings.HIDERS_CHECKER, hiders_checker_class, None)
+        else:
+            _hiders_checker = (
+                settings.HIDERS_CHECKER,
+                hiders_checker_class,
+                hiders_checker_class(),
+            )
+
+    _, hiders_checker_class, hiders_checker = _hiders_checker
+    if hiders_checker is None:
+        return hiders_checker_class(hiders_set or set())
+
+    return hiders_checker
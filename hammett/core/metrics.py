@@ -0,0 +1,149 @@
+"""The module contains the metrics sinks the persistence reports its
+counters and histograms to.
+"""
+
+import bisect
+import threading
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Any
+
+    from typing_extensions import Self
+
+    Tags = dict[str, str]
+
+# The upper bounds of the histogram buckets grow exponentially, so the same
+# buckets fit both the latencies in seconds and the sizes in bytes.
+_DEFAULT_BUCKETS = tuple(2.0 ** power for power in range(-20, 31))
+
+
+@dataclass
+class Histogram:
+    """The class represents the distribution of the observed values."""
+
+    buckets: tuple[float, ...] = _DEFAULT_BUCKETS
+    count: int = 0
+    total: float = 0
+    min: float = float('inf')
+    max: float = float('-inf')
+    counts: list[int] = field(default_factory=list)
+
+    def __post_init__(self: 'Self') -> None:
+        """Initialize the counts of the buckets, including the overflow one."""
+        if not self.counts:
+            self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self: 'Self', value: float) -> None:
+        """Add the specified value to the distribution."""
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+
+    def quantile(self: 'Self', q: float) -> float:
+        """Return the upper bound of the bucket the specified quantile falls into,
+        or 0 if no values have been observed.
+        """
+        if not self.count:
+            return 0
+
+        rank = q * self.count
+        accumulated = 0
+        for i, bucket_count in enumerate(self.counts):
+            accumulated += bucket_count
+            if accumulated >= rank:
+                return min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+
+        return self.max
+
+
+class BaseMetricsSink:
+    """The base class for the implementations of metrics sinks.
+    A sink may forward the metrics to a monitoring system
+    (e.g., StatsD or Prometheus).
+    """
+
+    def increment(
+        self: 'Self',
+        name: str,
+        value: int = 1,
+        tags: 'Tags | None' = None,
+    ) -> None:
+        """Increment the specified counter by the specified value."""
+        raise NotImplementedError
+
+    def observe(
+        self: 'Self',
+        name: str,
+        value: float,
+        tags: 'Tags | None' = None,
+    ) -> None:
+        """Add the specified value to the specified histogram."""
+        raise NotImplementedError
+
+
+class InMemoryMetricsSink(BaseMetricsSink):
+    """The class implements the metrics sink keeping the counters and
+    histograms in the memory, so they can be inspected via `snapshot`.
+    """
+
+    def __init__(self: 'Self') -> None:
+        """Initialize an in-memory metrics sink object."""
+        self.counters: dict[tuple[str, tuple[tuple[str, str], ...]], int] = {}
+        self.histograms: dict[tuple[str, tuple[tuple[str, str], ...]], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def increment(
+        self: 'Self',
+        name: str,
+        value: int = 1,
+        tags: 'Tags | None' = None,
+    ) -> None:
+        """Increment the specified counter by the specified value."""
+        key = (name, tuple(sorted((tags or {}).items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(
+        self: 'Self',
+        name: str,
+        value: float,
+        tags: 'Tags | None' = None,
+    ) -> None:
+        """Add the specified value to the specified histogram."""
+        key = (name, tuple(sorted((tags or {}).items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+
+            histogram.observe(value)
+
+    def reset(self: 'Self') -> None:
+        """Remove all the collected metrics."""
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self: 'Self') -> dict[str, list[dict[str, 'Any']]]:
+        """Return the collected metrics grouped by their names."""
+        result: dict[str, list[dict[str, Any]]] = {}
+        with self._lock:
+            for (name, tags), value in self.counters.items():
+                result.setdefault(name, []).append({'tags': dict(tags), 'value': value})
+
+            for (name, tags), histogram in self.histograms.items():
+                result.setdefault(name, []).append({
+                    'tags': dict(tags),
+                    'count': histogram.count,
+                    'sum': histogram.total,
+                    'min': histogram.min,
+                    'max': histogram.max,
+                    'p50': histogram.quantile(0.5),
+                    'p99': histogram.quantile(0.99),
+                })
+
+        return result
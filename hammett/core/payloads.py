@@ -0,0 +1,94 @@
+"""The module contains the storage of the payloads passed through the buttons."""
+
+import time
+from collections.abc import MutableMapping
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from typing import Any
+
+    from typing_extensions import Self
+
+
+class PayloadStorage(MutableMapping[str, str]):
+    """The class implements the bounded storage of the payloads passed through
+    the buttons. A payload expires `ttl` seconds after it's stored (never, if
+    `ttl` is None), and the least recently stored payloads are evicted as soon
+    as the number of them exceeds `max_size`.
+
+    The storage operates on the dict it's created with, mapping the callback
+    data of the buttons to the lists consisting of the payload and the time it
+    expires at. The dict contains only the types supported by any serializer,
+    so it can be kept in bot_data and persisted along with it.
+    """
+
+    def __init__(
+        self: 'Self',
+        entries: dict[str, 'Any'],
+        max_size: int,
+        ttl: float | None,
+    ) -> None:
+        """Initialize a payload storage object."""
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self._entries = entries
+
+    def __delitem__(self: 'Self', key: str) -> None:
+        """Remove the payload stored by the specified key."""
+        del self._entries[key]
+
+    def __getitem__(self: 'Self', key: str) -> str:
+        """Return the payload stored by the specified key.
+        Raise `KeyError` if there is no such payload or it has expired.
+        """
+        entry = self._entries[key]
+        # The payloads stored by the previous versions of Hammett
+        # are plain strings which never expire.
+        if isinstance(entry, str):
+            return entry
+
+        payload, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self._entries[key]
+            raise KeyError(key)
+
+        return str(payload)
+
+    def __iter__(self: 'Self') -> 'Iterator[str]':
+        """Return the iterator over the keys of the stored payloads."""
+        return iter(self._entries)
+
+    def __len__(self: 'Self') -> int:
+        """Return the number of the stored payloads, including the expired
+        ones which are not evicted yet.
+        """
+        return len(self._entries)
+
+    def __setitem__(self: 'Self', key: str, payload: str) -> None:
+        """Store the specified payload by the specified key, making it
+        the most recently stored one, and evict the payloads which either
+        have expired or exceed the size of the storage.
+        """
+        now = time.time()
+        self._entries.pop(key, None)
+        self._entries[key] = [payload, now + self.ttl if self.ttl is not None else None]
+        self._evict(now)
+
+    #
+    # Private methods
+    #
+
+    def _evict(self: 'Self', now: float) -> None:
+        """Evict the least recently stored payloads while they either have
+        expired or exceed the size of the storage. Since all the payloads live
+        for the same time, the least recently stored ones expire first.
+        """
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            expired = not isinstance(entry, str) and entry[1] is not None and entry[1] <= now
+            if not expired and len(self._entries) <= self.max_size:
+                break
+
+            del self._entries[key]
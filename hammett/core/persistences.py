@@ -1,35 +1,234 @@
-"""The module contains the implementation of BasePersistence to make
-the bots based on Hammett persistent, storing their data in Redis.
+"""The module contains the implementations of BasePersistence to make
+the bots based on Hammett persistent, storing their data in Redis or SQLite.
 """
 
+import asyncio
 import contextlib
+import copy
+import json
 import logging
-import pickle
-from collections import defaultdict
-from typing import TYPE_CHECKING, cast
+import re
+import sqlite3
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, NamedTuple, cast
 
 import redis.asyncio as redis
-from redis.exceptions import ConnectionError
+from redis.exceptions import ConnectionError, RedisError
 from telegram.ext import BasePersistence, ContextTypes
 from telegram.ext._utils.types import BD, CD, UD
 
 from hammett.conf import settings
-from hammett.core.exceptions import ImproperlyConfigured
+from hammett.core.compressors import COMPRESSORS, CompressionStats
+from hammett.core.exceptions import DeserializationFailed, ImproperlyConfigured
+from hammett.core.serializers import PickleSerializer
+from hammett.utils.hash_ring import HashRing
+from hammett.utils.module_loading import import_string
 
 if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
     from typing import Any
 
     from telegram.ext import PersistenceInput
     from telegram.ext._utils.types import CDCData, ConversationDict, ConversationKey
     from typing_extensions import Self
 
+    from hammett.core.compressors import BaseCompressor
+    from hammett.core.metrics import BaseMetricsSink
+    from hammett.core.serializers import BaseSerializer
+
 
 LOGGER = logging.getLogger(__name__)
 
+# Each value starts with the byte identifying the codec it's compressed with,
+# or the byte, if it's not compressed, so the compressed values can be stored
+# along with the uncompressed ones whatever the serializer produces.
+_UNCOMPRESSED_CODEC_ID = b'n'
+
+_DEFAULT_COMPRESSION_THRESHOLD = 1024
+
+_DEFAULT_SERIALIZER = 'hammett.core.serializers.PickleSerializer'
+
+# The script sets the value of the key (or deletes the key if the value is
+# empty) and increments its version, but only if the current version is
+# the expected one. Otherwise, it returns the current version and value.
+_CAS_SCRIPT = """
+local version = tonumber(redis.call('GET', KEYS[2]) or '0')
+if version ~= tonumber(ARGV[1]) then
+    return {0, version, redis.call('GET', KEYS[1])}
+end
+version = version + 1
+local ttl = tonumber(ARGV[3])
+if ARGV[2] == '' then
+    redis.call('DEL', KEYS[1])
+elseif ttl > 0 then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ttl)
+else
+    redis.call('SET', KEYS[1], ARGV[2])
+end
+if ttl > 0 then
+    redis.call('SET', KEYS[2], version, 'EX', ttl)
+else
+    redis.call('SET', KEYS[2], version)
+end
+return {1, version}
+"""
+
+_DELETED = object()
+
+_MAX_WRITE_ATTEMPTS = 5
+
+_MISSING = object()
+
+
+class _Touched(NamedTuple):
+    """The class represents the data of the key, which expiry must be prolonged.
+    The data is stored again if the key has expired already.
+    """
+
+    data: object
+
+
+_KEYS_BATCH_SIZE = 1000
+
+# The number of the update intervals a user or a chat must stay idle for
+# to be evicted from the working set in the lazy mode. The application hands
+# the changed data over to the persistence once per update interval, so
+# the entries accessed more recently may have changes not yet persisted.
+_LAZY_IDLE_INTERVALS = 2
+
+
+def _decode_conversation_key(key: str) -> 'ConversationKey | None':
+    """Decode the specified conversation key previously encoded
+    by `_encode_conversation_key`, or return None if it's malformed.
+    """
+    try:
+        decoded_key = json.loads(key)
+    except ValueError:
+        return None
+
+    return tuple(decoded_key) if isinstance(decoded_key, list) else None
+
+
+def _encode_conversation_key(key: 'ConversationKey') -> str:
+    """Encode the specified conversation key to store it as a string."""
+    return json.dumps(key, separators=(',', ':'))
+
+
+def _merge(base: 'Any', ours: 'Any', theirs: 'Any') -> 'Any':
+    """Merge the changes made to the base data by two writers at the level
+    of the top-level keys, so that, for example, the states of different
+    widgets changed concurrently are all kept. If both writers changed
+    the same key, our change wins. The data other than dicts is not merged,
+    and our data wins.
+    """
+    if not isinstance(ours, dict) or not isinstance(theirs, dict):
+        return ours
+
+    if not isinstance(base, dict):
+        base = {}
+
+    merged = copy.copy(ours)
+    for key in theirs.keys() | base.keys():
+        if ours.get(key, _MISSING) != base.get(key, _MISSING):
+            continue
+
+        value = theirs.get(key, _MISSING)
+        if value is _MISSING:
+            merged.pop(key, None)
+        else:
+            merged[key] = value
+
+    return merged
+
+
+def create_redis_client() -> 'redis.Redis[Any]':
+    """Return the client of the Redis instance specified by the top-level
+    keys of the REDIS_PERSISTENCE setting, or by the first of its nodes if
+    the top-level keys are not specified. The client is intended for
+    the mechanisms sharing their state between the processes of the bot.
+    """
+    config = settings.REDIS_PERSISTENCE
+    nodes = config.get('NODES')
+    if not config.get('HOST') and nodes:
+        config = nodes[0]
+
+    return RedisPersistence._create_client(config)  # noqa: SLF001
+
 
 class RedisPersistence(BasePersistence[UD, CD, BD]):
     """The class implements the asynchronous interface for making
     the bots based on Hammett persistent. The data is stored in Redis.
+
+    Each user, chat and conversation is stored under its own key
+    (e.g., `user_data:<user_id>`), so an update touches only the entry
+    that changed. The data stored by the previous versions of Hammett
+    as a single key per data kind is migrated to the new layout when it
+    is loaded for the first time.
+
+    The changes are written to the database in one of the following modes:
+    - immediately, in the update path (the default mode);
+    - on flush only (i.e., on shutdown), if `on_flush` is True. In this mode,
+      the keys changed since the start are tracked, and only they are written;
+    - in the background, if `write_behind` is True. In this mode, the keys
+      changed since the previous write are tracked and written in one
+      pipelined request as soon as `write_behind_max_changes` keys are
+      changed, but no later than `write_behind_delay` seconds after the first
+      change. The remaining changes are drained on flush.
+
+    If `lazy` is True, the user and chat data is not loaded at startup.
+    Instead, the data of a user or a chat is fetched from the database on
+    the first update related to them, and kept in the working set of up to
+    `lazy_working_set_size` entries. When the working set is full, the entries
+    idle for the longest time are evicted from the memory. Note that in
+    the lazy mode the data of the users which have not sent any updates since
+    the start is not available in the jobs via `Application.user_data`.
+
+    If the USER_DATA_TTL and CHAT_DATA_TTL keys of the REDIS_PERSISTENCE
+    setting are specified, the data of the users and chats expire after
+    the specified number of seconds of inactivity. Every update related to
+    a user or a chat prolongs the expiry of their data. If the
+    CONVERSATIONS_SWEEP_INTERVAL key is specified too, every specified number
+    of seconds the conversations of the users and chats which data has expired
+    are removed, and the expired data is evicted from the memory. Only the data
+    which is stored (see `store_data`) and has TTL is taken into account, and
+    the sweeper doesn't run if there is no such data.
+
+    If the NODES key of the REDIS_PERSISTENCE setting is specified, the data of
+    the users, chats and conversations is distributed across the listed Redis
+    instances using consistent hashing, so adding a node moves only about 1/N
+    of the keys. The keys stored on the nodes they don't belong to anymore are
+    moved by `rebalance`. The bot data and the callback data are always stored
+    on the instance specified by the top-level keys of the setting.
+
+    If `optimistic_locking` is True, several bot processes may share the same
+    database. Each key is accompanied by a version, and the data is written
+    only if its version hasn't changed since the data was read. Otherwise,
+    the changes made by other processes are merged with the own ones at the
+    level of the top-level keys (the own changes win if both changed the same
+    key), and the write is retried. Before handling an update, the changes
+    made by other processes to the related user, chat and bot data are
+    merged into the data the application holds. Note that the conversation
+    states are loaded only at startup, so the latest written state wins.
+    Use short update intervals (or the write-behind mode) in this mode to
+    reduce the number of conflicts.
+
+    The data is serialized using the serializer specified via the SERIALIZER
+    key of the REDIS_PERSISTENCE setting (pickle by default). Note that
+    the data stored by one serializer can't be read by another one.
+    If the COMPRESSOR key of the setting is specified, the serialized values
+    exceeding COMPRESSION_THRESHOLD bytes are compressed. Each value starts with
+    a one-byte header identifying the codec (or its absence), so the compressed
+    values can be stored along with the uncompressed ones, and the compression
+    can be turned on and off at any time. The statistics of the compression
+    are collected in the `compression_stats` attribute.
+
+    If the METRICS_SINK key of the setting is specified, the latency and
+    the size of the reads and writes, the hits and misses, the writes skipped
+    because the data hasn't changed, and the write conflicts are reported to
+    the sink, tagged with the kind of the data (e.g., user_data). The sink
+    is available via the `metrics` attribute.
     """
 
     _BOT_DATA_KEY = 'bot_data'
@@ -37,59 +236,937 @@ class RedisPersistence(BasePersistence[UD, CD, BD]):
     _USER_DATA_KEY = 'user_data'
     _CALLBACK_DATA_KEY = 'callback_data'
     _CONVERSATIONS_KEY = 'conversations'
+    _VERSIONS_KEY = 'versions'
+    _SHARDED_KEYS = (_CHAT_DATA_KEY, _USER_DATA_KEY, _CONVERSATIONS_KEY)
 
-    def __init__(
+    def __init__(  # noqa: PLR0913, PLR0915
         self: 'Self',
         store_data: 'PersistenceInput | None' = None,
         on_flush: bool = False,  # noqa: FBT001,FBT002
         update_interval: float = 60,
         context_types: 'ContextTypes[Any, UD, CD, BD] | None' = None,
+        *,
+        write_behind: bool = False,
+        write_behind_delay: float = 0.5,
+        write_behind_max_changes: int = 1000,
+        lazy: bool = False,
+        lazy_working_set_size: int = 10000,
+        optimistic_locking: bool = False,
     ) -> None:
         """Initialize a redis persistence object."""
+        if on_flush and write_behind:
+            msg = 'on_flush and write_behind are mutually exclusive.'
+            raise ImproperlyConfigured(msg)
+
+        if on_flush and lazy:
+            msg = 'on_flush and lazy are mutually exclusive.'
+            raise ImproperlyConfigured(msg)
+
+        if on_flush and optimistic_locking:
+            msg = 'on_flush and optimistic_locking are mutually exclusive.'
+            raise ImproperlyConfigured(msg)
+
         super().__init__(
             store_data=store_data,  # type: ignore[arg-type]
             update_interval=update_interval,
         )
 
-        try:
-            self.redis_cli: redis.Redis[Any] = redis.Redis(
-                host=settings.REDIS_PERSISTENCE.get('HOST'),
-                port=settings.REDIS_PERSISTENCE.get('PORT'),
-                db=settings.REDIS_PERSISTENCE['DB'],
-                password=settings.REDIS_PERSISTENCE.get('PASSWORD'),
-                unix_socket_path=settings.REDIS_PERSISTENCE.get('UNIX_SOCKET_PATH'),
+        self.redis_cli = self._create_client(settings.REDIS_PERSISTENCE)
+
+        self._clients: dict[str, redis.Redis[Any]] = {}
+        for node in settings.REDIS_PERSISTENCE.get('NODES') or []:
+            self._clients[self._get_node_name(node)] = self._create_client(node)
+
+        self._ring = HashRing(self._clients) if self._clients else None
+        self._cas_script = self.redis_cli.register_script(_CAS_SCRIPT)
+
+        serializer: type[BaseSerializer] = import_string(
+            settings.REDIS_PERSISTENCE.get('SERIALIZER', _DEFAULT_SERIALIZER),
+        )
+        self.serializer = serializer()
+
+        self.compressor: BaseCompressor | None = None
+        compressor_path = settings.REDIS_PERSISTENCE.get('COMPRESSOR')
+        if compressor_path:
+            compressor: type[BaseCompressor] = import_string(compressor_path)
+            self.compressor = compressor()
+
+        self.compression_stats = CompressionStats()
+        self.compression_threshold: int = settings.REDIS_PERSISTENCE.get(
+            'COMPRESSION_THRESHOLD',
+            _DEFAULT_COMPRESSION_THRESHOLD,
+        )
+        self._decompressors: dict[bytes, BaseCompressor] = {}
+
+        self.metrics: BaseMetricsSink | None = None
+        metrics_sink_path = settings.REDIS_PERSISTENCE.get('METRICS_SINK')
+        if metrics_sink_path:
+            metrics_sink: type[BaseMetricsSink] = import_string(metrics_sink_path)
+            self.metrics = metrics_sink()
+
+        self.chat_data_ttl: int | None = settings.REDIS_PERSISTENCE.get('CHAT_DATA_TTL')
+        self.user_data_ttl: int | None = settings.REDIS_PERSISTENCE.get('USER_DATA_TTL')
+        self.conversations_sweep_interval: float | None = settings.REDIS_PERSISTENCE.get(
+            'CONVERSATIONS_SWEEP_INTERVAL',
+        )
+        self._ttls = {
+            self._CHAT_DATA_KEY: self.chat_data_ttl,
+            self._USER_DATA_KEY: self.user_data_ttl,
+        }
+        # The conversations are removed only when the data which expires does,
+        # because the data which is not stored or has no TTL is always missing
+        # or present respectively.
+        self._expiring_kinds = [
+            kind for kind, stored in (
+                (self._CHAT_DATA_KEY, self.store_data.chat_data),
+                (self._USER_DATA_KEY, self.store_data.user_data),
             )
-        except KeyError as exc:
-            msg = f'{exc.args[0]} is missing in the REDIS_PERSISTENCE setting.'
-            raise ImproperlyConfigured(msg) from exc
+            if stored and self._ttls[kind]
+        ]
+        self._sweeper_task: asyncio.Task[None] | None = None
 
         self.bot_data: BD | None = None
         self.callback_data: CDCData | None = None
         self.chat_data: defaultdict[int, CD] | None = None
         self.conversations: dict[str, dict[tuple[str | int, ...], object]] | None = None
         self.context_types = cast('ContextTypes[Any, UD, CD, BD]', context_types or ContextTypes())
+        self.lazy = lazy
+        self.lazy_working_set_size = lazy_working_set_size
         self.on_flush = on_flush
+        self.optimistic_locking = optimistic_locking
         self.user_data: defaultdict[int, UD] | None = None
+        self.write_behind = write_behind
+        self.write_behind_delay = write_behind_delay
+        self.write_behind_max_changes = write_behind_max_changes
+
+        self._dirty: dict[str, object] = {}
+        # Map the IDs of the users and chats loaded in the lazy mode to the time
+        # of the latest access, the key and the data the application holds.
+        self._loaded_chats: OrderedDict[int, tuple[float, str, Any]] = OrderedDict()
+        self._loaded_users: OrderedDict[int, tuple[float, str, Any]] = OrderedDict()
+        self._pending_loads: dict[str, asyncio.Future[Any]] = {}
+        self._dirty_event = asyncio.Event()
+        self._dirty_limit_event = asyncio.Event()
+        self._write_behind_stopped = False
+        self._write_behind_task: asyncio.Task[None] | None = None
+        # Map the keys to the versions known to the persistence and the data
+        # of those versions. The keys merged with the changes made by other
+        # processes, which are not yet seen by the application, are stale.
+        self._versions: dict[str, tuple[int, Any]] = {}
+        self._stale_keys: set[str] = set()
 
     #
     # Private methods
     #
 
+    @staticmethod
+    def _create_client(config: dict[str, 'Any']) -> 'redis.Redis[Any]':
+        """Return the Redis client configured by the specified part of
+        the REDIS_PERSISTENCE setting. HOST and PORT are required unless
+        the instance is connected to via UNIX_SOCKET_PATH.
+        """
+        try:
+            if config.get('UNIX_SOCKET_PATH'):
+                # The host and the port are ignored by the socket connections.
+                host, port = config.get('HOST', 'localhost'), config.get('PORT', 6379)
+            else:
+                host, port = config['HOST'], config['PORT']
+
+            return redis.Redis(
+                host=host,
+                port=port,
+                db=config['DB'],
+                password=config.get('PASSWORD'),
+                unix_socket_path=config.get('UNIX_SOCKET_PATH'),
+            )
+        except KeyError as exc:
+            msg = f'{exc.args[0]} is missing in the REDIS_PERSISTENCE setting.'
+            raise ImproperlyConfigured(msg) from exc
+
+    @staticmethod
+    def _escape_pattern(value: str) -> str:
+        """Escape the glob-style special characters of the specified value."""
+        return re.sub(r'([*?\[\]\\])', r'\\\1', value)
+
+    @staticmethod
+    def _get_node_name(config: dict[str, 'Any']) -> str:
+        """Return the name the specified node is placed on the hash ring by.
+        The name must stay the same when the list of the nodes changes,
+        otherwise the keys of the node are redistributed.
+        """
+        name = config.get('NAME') or config.get('UNIX_SOCKET_PATH')
+        if name:
+            return str(name)
+
+        return f"{config.get('HOST')}:{config.get('PORT')}/{config.get('DB')}"
+
+    def _get_chat_data_key(self: 'Self', chat_id: int) -> str:
+        """Return the key the data of the specified chat is stored by."""
+        return f'{self._CHAT_DATA_KEY}:{chat_id}'
+
+    def _get_client(self: 'Self', key: str) -> 'redis.Redis[Any]':
+        """Return the client of the Redis instance the specified key is stored in."""
+        node = self._get_node(key)
+        if node is None:
+            return self.redis_cli
+
+        return self._clients[node]
+
+    def _get_clients(self: 'Self') -> 'list[redis.Redis[Any]]':
+        """Return the clients of all Redis instances the sharded keys are stored in."""
+        if self._ring is None:
+            return [self.redis_cli]
+
+        return list(self._clients.values())
+
+    def _get_conversation_key(self: 'Self', name: str, key: 'ConversationKey') -> str:
+        """Return the key the state of the specified conversation is stored by."""
+        return f'{self._CONVERSATIONS_KEY}:{name}:{_encode_conversation_key(key)}'
+
+    @staticmethod
+    def _get_kind(key: str) -> str:
+        """Return the kind of the data stored by the specified key (e.g., user_data)."""
+        return key.partition(':')[0]
+
+    def _get_node(self: 'Self', key: str) -> str | None:
+        """Return the name of the node the specified key is stored on, or None
+        if the key is stored on the main instance. The version of a key is
+        stored on the same node as the key itself.
+        """
+        if self._ring is None:
+            return None
+
+        key = key.removeprefix(f'{self._VERSIONS_KEY}:')
+        if not self._is_sharded(key):
+            return None
+
+        return self._ring.get_node(key)
+
+    def _get_ttl(self: 'Self', key: str) -> int | None:
+        """Return the TTL of the specified key, if any."""
+        return self._ttls.get(key.partition(':')[0])
+
+    def _get_user_data_key(self: 'Self', user_id: int) -> str:
+        """Return the key the data of the specified user is stored by."""
+        return f'{self._USER_DATA_KEY}:{user_id}'
+
+    def _get_version_key(self: 'Self', key: str) -> str:
+        """Return the key the version of the specified key is stored by."""
+        return f'{self._VERSIONS_KEY}:{key}'
+
+    def _group_by_client(
+        self: 'Self',
+        keys: 'Iterable[str]',
+    ) -> 'list[tuple[redis.Redis[Any], list[str]]]':
+        """Group the specified keys by the Redis instances they are stored in."""
+        groups: dict[int, tuple[redis.Redis[Any], list[str]]] = {}
+        for key in keys:
+            client = self._get_client(key)
+            groups.setdefault(id(client), (client, []))[1].append(key)
+
+        return list(groups.values())
+
+    def _increment(self: 'Self', name: str, kind: str, **tags: str) -> None:
+        """Increment the specified counter of the persistence, if the metrics
+        are collected.
+        """
+        if self.metrics is not None:
+            self.metrics.increment(f'persistence.{name}', 1, {'kind': kind, **tags})
+
+    def _is_sharded(self: 'Self', key: str) -> bool:
+        """Return whether the specified key is distributed across the nodes."""
+        prefix, separator, _ = key.partition(':')
+        return bool(separator) and prefix in self._SHARDED_KEYS
+
+    def _record_compression(
+        self: 'Self',
+        operation: str,
+        codec_id: bytes,
+        start: float,
+        ratio: float | None = None,
+    ) -> None:
+        """Report the time of the specified operation (either compression or
+        decompression) started at the specified time and the ratio of the size
+        of the value before the compression to its size after it, if the metrics
+        are collected.
+        """
+        if self.metrics is None:
+            return
+
+        tags = {'codec': codec_id.decode('utf8')}
+        self.metrics.observe(f'persistence.{operation}_time', time.perf_counter() - start, tags)
+        if ratio is not None:
+            self.metrics.observe('persistence.compression_ratio', ratio, tags)
+
+    def _record_reads(
+        self: 'Self',
+        kind: str,
+        values: 'list[bytes | None]',
+        start: float,
+    ) -> None:
+        """Report the latency and the results of the read of the specified values
+        started at the specified time, if the metrics are collected.
+        """
+        if self.metrics is None:
+            return
+
+        tags = {'kind': kind}
+        self.metrics.observe('persistence.read_latency', time.perf_counter() - start, tags)
+        hits = 0
+        for value in values:
+            if value:
+                hits += 1
+                self.metrics.observe('persistence.read_bytes', len(value), tags)
+
+        if hits:
+            self.metrics.increment('persistence.reads', hits, {**tags, 'result': 'hit'})
+
+        if len(values) > hits:
+            self.metrics.increment('persistence.reads', len(values) - hits, {
+                **tags, 'result': 'miss',
+            })
+
+    def _record_writes(self: 'Self', operations: list[tuple[str, str, int]], start: float) -> None:
+        """Report the latency of the write started at the specified time and
+        the specified operations (the key, the name of the operation and the size
+        of the written value) it consisted of, if the metrics are collected.
+        """
+        if self.metrics is None or not operations:
+            return
+
+        kinds = {self._get_kind(key) for key, *_ in operations}
+        self.metrics.observe('persistence.write_latency', time.perf_counter() - start, {
+            'kind': kinds.pop() if len(kinds) == 1 else 'mixed',
+        })
+        for key, operation, size in operations:
+            kind = self._get_kind(key)
+            self.metrics.increment('persistence.writes', 1, {'kind': kind, 'operation': operation})
+            if size:
+                self.metrics.observe('persistence.write_bytes', size, {'kind': kind})
+
+    async def _delete_data(self: 'Self', key: str) -> None:
+        """Delete the data from the database by the specified key."""
+        if self.optimistic_locking:
+            await self._set_many_to(self._get_client(key), {key: _DELETED})
+        else:
+            start = time.perf_counter()
+            await self._get_client(key).delete(key)
+            self._record_writes([(key, 'delete', 0)], start)
+
+    async def _drain_dirty(self: 'Self') -> None:
+        """Write all the tracked changes to the database."""
+        dirty, self._dirty = self._dirty, {}
+        self._dirty_event.clear()
+        self._dirty_limit_event.clear()
+        try:
+            await self._set_many(dirty)
+        # Besides the connection errors, the data may fail to be serialized
+        # or compressed. The loop writing in the background must keep running
+        # anyway, otherwise no changes are written anymore.
+        except Exception:
+            LOGGER.exception('Failed to write %d changed keys to Redis', len(dirty))
+            # Put the failed changes back unless they were superseded
+            # while the write was in progress.
+            self._dirty = {**dirty, **self._dirty}
+            self._dirty_event.set()
+
+    async def _drop(self: 'Self', key: str) -> None:
+        """Delete the data by the specified key, depending on the mode,
+        either immediately, in the background or on flush.
+        """
+        if self.on_flush:
+            self._dirty[key] = _DELETED
+        elif self.write_behind:
+            self._mark_dirty(key, _DELETED)
+        else:
+            await self._delete_data(key)
+
+    async def _evict_expired(self: 'Self') -> None:
+        """Evict the data of the users and chats which has expired in
+        the database from the memory. The data not yet written is kept.
+        """
+        mirrors = {
+            self._CHAT_DATA_KEY: (self.chat_data, self._get_chat_data_key),
+            self._USER_DATA_KEY: (self.user_data, self._get_user_data_key),
+        }
+        for kind in self._expiring_kinds:
+            mirror, get_key = mirrors[kind]
+            if not mirror:
+                continue
+
+            keys = {get_key(entity_id): entity_id for entity_id in mirror}
+            existing_keys = await self._get_existing_keys(keys)
+            expired_keys = [
+                key for key in keys if key not in existing_keys and key not in self._dirty
+            ]
+            for key in expired_keys:
+                mirror.pop(keys[key], None)
+                self._versions.pop(key, None)
+                self._stale_keys.discard(key)
+
+            if expired_keys:
+                LOGGER.debug('Evicted %d expired entries of %s', len(expired_keys), kind)
+
+    async def _fetch_data(self: 'Self', key: str) -> 'Any':
+        """Fetch the data from the database by the specified key.
+        Unlike `_get_data`, the method doesn't suppress the errors.
+        """
+        start = time.perf_counter()
+        if self.optimistic_locking:
+            redis_data, version = await self._get_client(key).mget(
+                key,
+                self._get_version_key(key),
+            )
+        else:
+            redis_data, version = await self._get_client(key).get(key), None
+
+        self._record_reads(self._get_kind(key), [redis_data], start)
+        data = self._loads(redis_data) if redis_data else None
+        if self.optimistic_locking:
+            self._versions[key] = (int(version or 0), data)
+
+        return data
+
     async def _get_data(self: 'Self', key: str) -> 'Any':
-        """Fetch the data from the database by the specified key."""
+        """Fetch the data from the database by the specified key.
+        Return None if the data fails to be fetched.
+        """
         try:
-            redis_data = await self.redis_cli.get(key)
-            if redis_data:
-                return pickle.loads(redis_data)  # noqa: S301
-        except (ConnectionError, pickle.UnpicklingError):
+            return await self._fetch_data(key)
+        except (ConnectionError, DeserializationFailed):
             LOGGER.exception('Failed to get the data from Redis by the key %s', key)
             return None
-        else:
-            return redis_data
+
+    async def _get_existing_keys(self: 'Self', keys: 'Iterable[str]') -> set[str]:
+        """Return the specified keys which exist in the database."""
+
+        async def get_existing(client: 'redis.Redis[Any]', batch: list[str]) -> set[str]:
+            async with client.pipeline(transaction=False) as pipe:
+                for key in batch:
+                    pipe.exists(key)
+
+                results = await pipe.execute()
+
+            return {key for key, exists in zip(batch, results, strict=True) if exists}
+
+        existing: set[str] = set()
+        for keys_subset in await asyncio.gather(*[
+            get_existing(client, batch) for client, batch in self._group_by_client(keys)
+        ]):
+            existing.update(keys_subset)
+
+        return existing
+
+    async def _get_many(self: 'Self', prefix: str) -> dict[str, 'Any']:
+        """Fetch the data from the database by all the keys starting with
+        the specified prefix. The keys of the returned dict are stripped of
+        the prefix.
+        """
+        result: dict[str, Any] = {}
+        for data in await asyncio.gather(*[
+            self._get_many_from(client, prefix) for client in self._get_clients()
+        ]):
+            result.update(data)
+
+        return result
+
+    async def _get_many_from(
+        self: 'Self',
+        client: 'redis.Redis[Any]',
+        prefix: str,
+    ) -> dict[str, 'Any']:
+        """Fetch the data from the specified Redis instance by all the keys
+        starting with the specified prefix.
+        """
+        result: dict[str, Any] = {}
+        try:
+            keys = [
+                key async for key in client.scan_iter(
+                    match=f'{self._escape_pattern(prefix)}*',
+                    count=_KEYS_BATCH_SIZE,
+                )
+            ]
+            for i in range(0, len(keys), _KEYS_BATCH_SIZE):
+                batch = [key.decode('utf8') for key in keys[i:i + _KEYS_BATCH_SIZE]]
+                start = time.perf_counter()
+                if self.optimistic_locking:
+                    values = await client.mget(
+                        batch + [self._get_version_key(key) for key in batch],
+                    )
+                    values, versions = values[:len(batch)], values[len(batch):]
+                else:
+                    values, versions = await client.mget(batch), [None] * len(batch)
+
+                self._record_reads(self._get_kind(prefix), values, start)
+
+                for key, redis_data, version in zip(batch, values, versions, strict=True):
+                    if redis_data:
+                        data = self._loads(redis_data)
+                        result[key[len(prefix):]] = data
+                        if self.optimistic_locking:
+                            self._versions[key] = (int(version or 0), data)
+        except (ConnectionError, DeserializationFailed):
+            LOGGER.exception('Failed to get the data from Redis by the prefix %s', prefix)
+
+        return result
+
+    async def _migrate_legacy_data(self: 'Self', key: str) -> None:
+        """Split the data stored by the previous versions of Hammett as
+        a single key per data kind into the separate keys. The legacy key is
+        deleted only after the separate keys are written, so the interrupted
+        migration is repeated on the next start.
+        """
+        try:
+            redis_data = await self.redis_cli.get(key)
+        except RedisError:
+            LOGGER.exception('Failed to get the legacy data from Redis by the key %s', key)
+            return
+
+        if not redis_data:
+            return
+
+        # The previous versions of Hammett always used pickle.
+        try:
+            data = PickleSerializer().loads(redis_data)
+        except DeserializationFailed:
+            data = None
+
+        if not isinstance(data, dict):
+            # Keep the legacy key, so the data can be recovered manually.
+            LOGGER.error('Failed to migrate the malformed legacy data stored by the key %s', key)
+            return
+
+        mapping: dict[str, object] = {}
+        if key == self._USER_DATA_KEY:
+            mapping = {
+                self._get_user_data_key(user_id): user_data
+                for user_id, user_data in data.items()
+            }
+        elif key == self._CHAT_DATA_KEY:
+            mapping = {
+                self._get_chat_data_key(chat_id): chat_data
+                for chat_id, chat_data in data.items()
+            }
+        elif key == self._CONVERSATIONS_KEY:
+            mapping = {
+                self._get_conversation_key(name, conversation_key): state
+                for name, conversations in data.items()
+                for conversation_key, state in conversations.items()
+            }
+
+        await self._set_many(mapping)
+        await self.redis_cli.delete(key)
+
+        LOGGER.info('Migrated %d entries from the legacy key %s', len(mapping), key)
+
+    def _dumps(self: 'Self', data: object) -> bytes:
+        """Serialize the specified data and compress it if it's large enough."""
+        value = self.serializer.dumps(data)
+        if self.compressor is None or len(value) < self.compression_threshold:
+            self.compression_stats.uncompressed_values += 1
+            return _UNCOMPRESSED_CODEC_ID + value
+
+        codec_id = self.compressor.codec_id
+        start = time.perf_counter()
+        compressed_value = self.compressor.compress(value)
+        self.compression_stats.compression_time += time.perf_counter() - start
+        if len(compressed_value) >= len(value):  # the compression is useless
+            self.compression_stats.uncompressed_values += 1
+            self._record_compression('compression', codec_id, start)
+            return _UNCOMPRESSED_CODEC_ID + value
+
+        self.compression_stats.compressed_values += 1
+        self.compression_stats.bytes_before += len(value)
+        self.compression_stats.bytes_after += len(compressed_value)
+        self._record_compression('compression', codec_id, start, len(value) / len(compressed_value))
+        return codec_id + compressed_value
+
+    def _evict_idle(
+        self: 'Self',
+        loaded: 'OrderedDict[int, tuple[float, str, Any]]',
+        mirror: 'dict[int, Any]',
+    ) -> None:
+        """Evict the least recently used entries from the working set until
+        it fits `lazy_working_set_size`. The entries which are not idle long
+        enough or have changes not yet written are kept.
+        """
+        idle_since = time.monotonic() - self.update_interval * _LAZY_IDLE_INTERVALS
+        while len(loaded) > self.lazy_working_set_size:
+            entity_id, (accessed_at, key, data) = next(iter(loaded.items()))
+            if accessed_at > idle_since or key in self._dirty:
+                break
+
+            del loaded[entity_id]
+            mirror.pop(entity_id, None)
+            self._versions.pop(key, None)
+            self._stale_keys.discard(key)
+            # The application keeps referencing the data, so empty it
+            # to release the memory. The data is fetched again on the next
+            # update related to the user or chat.
+            data.clear()
+
+    async def _load_lazily(
+        self: 'Self',
+        loaded: 'OrderedDict[int, tuple[float, str, Any]]',
+        mirror: 'dict[int, Any]',
+        key: str,
+        entity_id: int,
+        data: 'Any',
+    ) -> None:
+        """Fill the data the application holds for the specified user or chat
+        with the data fetched from the database, unless it's loaded already.
+        If the data fails to be fetched, the error is propagated, so
+        the update is not processed with the incomplete data, which would
+        overwrite the stored one. The data is fetched again on the next update.
+        """
+        self._increment(
+            'working_set',
+            self._get_kind(key),
+            result='hit' if entity_id in loaded else 'miss',
+        )
+        if entity_id not in loaded:
+            pending_load = self._pending_loads.get(key)
+            if pending_load:
+                # The data is being loaded on a concurrent update,
+                # so just wait until it's done.
+                await pending_load
+            else:
+                pending_load = asyncio.ensure_future(self._fetch_data(key))
+                self._pending_loads[key] = pending_load
+                try:
+                    stored_data = await pending_load
+                except (ConnectionError, DeserializationFailed):
+                    LOGGER.exception('Failed to load the data from Redis by the key %s', key)
+                    raise
+                finally:
+                    del self._pending_loads[key]
+
+                if stored_data:
+                    mirror[entity_id] = stored_data
+                    # The application modifies its data in place, so it must not
+                    # share any objects with the copy used to detect changes.
+                    data.update(copy.deepcopy(stored_data))
+
+        loaded[entity_id] = (time.monotonic(), key, data)
+        loaded.move_to_end(entity_id)
+        self._evict_idle(loaded, mirror)
+
+    def _loads(self: 'Self', value: bytes) -> 'Any':
+        """Decompress the specified value if it's compressed, and deserialize it."""
+        codec_id, value = value[:1], value[1:]
+        if codec_id != _UNCOMPRESSED_CODEC_ID:
+            try:
+                decompressor = self._decompressors[codec_id]
+            except KeyError:
+                if self.compressor and self.compressor.codec_id == codec_id:
+                    decompressor = self.compressor
+                elif codec_id in COMPRESSORS:
+                    decompressor = COMPRESSORS[codec_id]()
+                else:
+                    msg = f'Unknown compression codec {codec_id!r}'
+                    raise DeserializationFailed(msg) from None
+
+                self._decompressors[codec_id] = decompressor
+
+            start = time.perf_counter()
+            value = decompressor.decompress(value)
+            self.compression_stats.decompressed_values += 1
+            self.compression_stats.decompression_time += time.perf_counter() - start
+            self._record_compression('decompression', codec_id, start)
+
+        return self.serializer.loads(value)
+
+    def _mark_dirty(self: 'Self', key: str, data: object) -> None:
+        """Track the change of the specified key to write it in the background."""
+        self._dirty[key] = data
+        self._dirty_event.set()
+        if len(self._dirty) >= self.write_behind_max_changes:
+            self._dirty_limit_event.set()
+
+        if self._write_behind_task is None or self._write_behind_task.done():
+            self._write_behind_task = asyncio.create_task(self._run_write_behind())
+
+    async def _run_write_behind(self: 'Self') -> None:
+        """Write the tracked changes to the database either when their number
+        reaches `write_behind_max_changes` or `write_behind_delay` seconds after
+        the first of them.
+        """
+        while True:
+            await self._dirty_event.wait()
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(
+                    self._dirty_limit_event.wait(),
+                    timeout=self.write_behind_delay,
+                )
+
+            await self._drain_dirty()
+            if self._write_behind_stopped:
+                return
+
+    async def _pull_changes(self: 'Self', key: str, base: 'Any', data: 'Any') -> 'Any':
+        """Merge the changes made by other processes to the specified key since
+        it was read or written by the persistence into the data the application
+        holds. The base is the data the application's data was last compared
+        with. Return the stored data, or `_MISSING` if there are no changes.
+        """
+        client = self._get_client(key)
+        version_key = self._get_version_key(key)
+        try:
+            current_version = int(await client.get(version_key) or 0)
+            known_version = self._versions.get(key, (0, None))[0]
+            if current_version == known_version and key not in self._stale_keys:
+                return _MISSING
+
+            redis_data, version = await client.mget(key, version_key)
+            stored_data = self._loads(redis_data) if redis_data else None
+        except (ConnectionError, DeserializationFailed):
+            LOGGER.exception('Failed to pull the changes from Redis by the key %s', key)
+            return _MISSING
+
+        self._versions[key] = (int(version or 0), stored_data)
+        self._stale_keys.discard(key)
+        # The application modifies its data in place, so it must not
+        # share any objects with the copy used to detect changes.
+        merged = _merge(base, data, copy.deepcopy(stored_data))
+        if merged is not data:
+            data.clear()
+            data.update(merged)
+
+        return stored_data
+
+    async def _refresh_entity(
+        self: 'Self',
+        mirror: 'dict[int, Any]',
+        key: str,
+        entity_id: int,
+        data: 'Any',
+    ) -> None:
+        """Merge the changes made by other processes into the data the application
+        holds for the specified user or chat.
+        """
+        stored_data = await self._pull_changes(key, mirror.get(entity_id), data)
+        if stored_data is None:
+            mirror.pop(entity_id, None)
+        elif stored_data is not _MISSING:
+            mirror[entity_id] = stored_data
+
+    def _resolve_write(self: 'Self', key: str, data: object, result: list['Any']) -> object:
+        """Handle the result of writing the specified data by the CAS script.
+        If the data was written, remember its version. Otherwise, return
+        the data merged with the stored one to retry the write with.
+        """
+        if result[0]:
+            self._versions[key] = (int(result[1]), None if data is _DELETED else data)
+            return _MISSING
+
+        base = self._versions.get(key, (0, None))[1]
+        try:
+            stored_data = self._loads(result[2]) if len(result) > 2 and result[2] else None  # noqa: PLR2004
+        except DeserializationFailed:
+            LOGGER.exception('Failed to merge the data stored by the key %s', key)
+            stored_data = None
+
+        self._versions[key] = (int(result[1]), stored_data)
+        self._stale_keys.add(key)
+        self._increment('conflicts', self._get_kind(key))
+        LOGGER.debug('The data stored by the key %s was changed concurrently', key)
+        return data if data is _DELETED else _merge(base, data, stored_data)
 
     async def _set_data(self: 'Self', key: str, data: object) -> None:
         """Store the data to the database using the specified key."""
-        await self.redis_cli.set(key, pickle.dumps(data))
+        if self.optimistic_locking:
+            await self._set_many_to(self._get_client(key), {key: data})
+        else:
+            value = self._dumps(data)
+            start = time.perf_counter()
+            await self._get_client(key).set(key, value, ex=self._get_ttl(key))
+            self._record_writes([(key, 'set', len(value))], start)
+
+    async def _set_many(self: 'Self', mapping: dict[str, object]) -> None:
+        """Store the data to the database using the keys of the specified mapping.
+        The keys which values are `_DELETED` are deleted, and the expiry of
+        the keys which values are `_Touched` is prolonged.
+        """
+        await asyncio.gather(*[
+            self._set_many_to(client, {key: mapping[key] for key in keys})
+            for client, keys in self._group_by_client(mapping)
+        ])
+
+    async def _set_many_to(
+        self: 'Self',
+        client: 'redis.Redis[Any]',
+        mapping: dict[str, object],
+        attempt: int = 1,
+    ) -> None:
+        """Store the data to the specified Redis instance using the keys of
+        the specified mapping. In the optimistic locking mode, the data
+        changed concurrently is merged and written again.
+        """
+        if not mapping:
+            return
+
+        touched, versioned, operations = [], [], []
+        async with client.pipeline(transaction=False) as pipe:
+            for key, data in mapping.items():
+                if isinstance(data, _Touched):
+                    touched.append((len(pipe), key, data.data))
+                    operations.append((key, 'expire', 0))
+                    pipe.expire(key, self._get_ttl(key))  # type: ignore[arg-type]
+                    if self.optimistic_locking:
+                        pipe.expire(self._get_version_key(key), self._get_ttl(key))  # type: ignore[arg-type]
+                    continue
+
+                # The empty value makes the CAS script delete the key.
+                value = b'' if data is _DELETED else self._dumps(data)
+                operations.append((key, 'delete' if data is _DELETED else 'set', len(value)))
+                if self.optimistic_locking:
+                    versioned.append((len(pipe), key, data))
+                    await self._cas_script(
+                        keys=[key, self._get_version_key(key)],
+                        args=[
+                            self._versions.get(key, (0, None))[0],
+                            value,
+                            self._get_ttl(key) or 0,
+                        ],
+                        client=pipe,
+                    )
+                elif data is _DELETED:
+                    pipe.delete(key)
+                else:
+                    pipe.set(key, value, ex=self._get_ttl(key))
+
+            start = time.perf_counter()
+            results = await pipe.execute()
+
+        self._record_writes(operations, start)
+
+        retries = {key: data for i, key, data in touched if not results[i]}
+        for i, key, data in versioned:
+            merged = self._resolve_write(key, data, results[i])
+            if merged is not _MISSING:
+                retries[key] = merged
+
+        if retries and attempt >= _MAX_WRITE_ATTEMPTS:
+            LOGGER.error('Gave up writing %d keys changed concurrently', len(retries))
+            return
+
+        await self._set_many_to(client, retries, attempt + 1)
+
+    async def _run_sweeper(self: 'Self', interval: float) -> None:
+        """Remove the conversations of the expired users and chats, and evict
+        their data from the memory every specified number of seconds.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self._sweep_conversations()
+                await self._evict_expired()
+            except RedisError:
+                LOGGER.exception('Failed to sweep the expired data')
+
+    def _start_sweeper(self: 'Self') -> None:
+        """Start sweeping the expired data in the background, unless
+        it's started already or there is no data which expires.
+        """
+        if (
+            self.conversations_sweep_interval
+            and self._expiring_kinds
+            and self._sweeper_task is None
+        ):
+            self._sweeper_task = asyncio.create_task(
+                self._run_sweeper(self.conversations_sweep_interval),
+            )
+
+    async def _store(self: 'Self', key: str, data: object) -> None:
+        """Store the data using the specified key, depending on the mode,
+        either immediately, in the background or on flush.
+        """
+        if self.on_flush:
+            self._dirty[key] = data
+        elif self.write_behind:
+            self._mark_dirty(key, data)
+        else:
+            await self._set_data(key, data)
+
+    async def _sweep_conversations(self: 'Self') -> None:
+        """Remove the conversations all users and chats of which have neither
+        user data nor chat data in the database anymore, i.e. their data has expired.
+        """
+        for client in self._get_clients():
+            await self._sweep_conversations_in(client)
+
+    async def _sweep_conversations_in(self: 'Self', client: 'redis.Redis[Any]') -> None:
+        """Remove the expired conversations stored in the specified Redis instance."""
+        prefix = f'{self._CONVERSATIONS_KEY}:'
+        keys = [
+            key.decode('utf8') async for key in client.scan_iter(
+                match=f'{prefix}*',
+                count=_KEYS_BATCH_SIZE,
+            )
+        ]
+        for i in range(0, len(keys), _KEYS_BATCH_SIZE):
+            batch = keys[i:i + _KEYS_BATCH_SIZE]
+            entities = []
+            for key in batch:
+                name, _, encoded_key = key[len(prefix):].rpartition(':[')
+                conversation_key = _decode_conversation_key(f'[{encoded_key}')
+                if conversation_key is None:
+                    continue
+
+                entity_keys = [
+                    f'{kind}:{entity_id}'
+                    for entity_id in conversation_key if isinstance(entity_id, int)
+                    for kind in self._expiring_kinds
+                ]
+                if entity_keys:
+                    entities.append((key, name, conversation_key, entity_keys))
+
+            if not entities:
+                continue
+
+            existing_keys = await self._get_existing_keys({
+                entity_key for *_, entity_keys in entities for entity_key in entity_keys
+            })
+            # The data not yet written in the write-behind mode is alive.
+            existing_keys.update(key for key, data in self._dirty.items() if data is not _DELETED)
+            expired = [
+                (key, name, conversation_key)
+                for key, name, conversation_key, entity_keys in entities
+                if existing_keys.isdisjoint(entity_keys)
+            ]
+            if not expired:
+                continue
+
+            expired_keys = [key for key, *_ in expired]
+            if self.optimistic_locking:
+                expired_keys += [self._get_version_key(key) for key in expired_keys]
+
+            await client.delete(*expired_keys)
+            for _, name, conversation_key in expired:
+                if self.conversations and name in self.conversations:
+                    self.conversations[name].pop(conversation_key, None)
+
+            LOGGER.debug('Removed %d expired conversations', len(expired))
+
+    async def _touch(self: 'Self', key: str, data: object) -> None:
+        """Prolong the expiry of the specified key, if it has TTL.
+        If the key has expired already, store the specified data again.
+        """
+        ttl = self._get_ttl(key)
+        if self.on_flush or not ttl:
+            return
+
+        if self.write_behind:
+            if key not in self._dirty:
+                self._mark_dirty(key, _Touched(data))
+        else:
+            start = time.perf_counter()
+            expired = not await self._get_client(key).expire(key, ttl)
+            self._record_writes([(key, 'expire', 0)], start)
+            if expired:
+                await self._set_data(key, data)
+            elif self.optimistic_locking:
+                await self._get_client(key).expire(self._get_version_key(key), ttl)
 
     #
     # Public methods
@@ -97,7 +1174,7 @@ class RedisPersistence(BasePersistence[UD, CD, BD]):
 
     async def drop_chat_data(self: 'Self', chat_id: int) -> None:
         """Delete the specified key from `chat_data` and, depending on
-        the on_flush attribute, reflect the change in the database.
+        the mode, reflect the change in the database.
         """
         if self.chat_data is None:
             return
@@ -105,37 +1182,41 @@ class RedisPersistence(BasePersistence[UD, CD, BD]):
         with contextlib.suppress(KeyError):
             self.chat_data.pop(chat_id)
 
+        self._loaded_chats.pop(chat_id, None)
 
-        if not self.on_flush:
-            await self._set_data(self._CHAT_DATA_KEY, self.chat_data)
+        await self._drop(self._get_chat_data_key(chat_id))
 
     async def drop_user_data(self: 'Self', user_id: int) -> None:
         """Delete the specified key from `user_data` and, depending on
-        the on_flush attribute, reflect the change in the database.
+        the mode, reflect the change in the database.
         """
         if self.user_data is None:
             return
 
         self.user_data.pop(user_id, None)
-        if not self.on_flush:
-            await self._set_data(self._USER_DATA_KEY, self.user_data)
+        self._loaded_users.pop(user_id, None)
+        await self._drop(self._get_user_data_key(user_id))
 
     async def flush(self: 'Self') -> None:
-        """Store all the data kept in the memory to the database."""
-        if self.bot_data:
-            await self._set_data(self._BOT_DATA_KEY, self.bot_data)
-
-        if self.callback_data:
-            await self._set_data(self._CALLBACK_DATA_KEY, self.callback_data)
+        """Write the changes not yet written to the database. The keys which
+        haven't changed are not written, so the expired ones are not stored
+        again. In the write-behind mode, stop writing in the background first.
+        """
+        if self._sweeper_task is not None:
+            self._sweeper_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._sweeper_task
 
-        if self.chat_data:
-            await self._set_data(self._CHAT_DATA_KEY, self.chat_data)
+            self._sweeper_task = None
 
-        if self.conversations:
-            await self._set_data(self._CONVERSATIONS_KEY, self.conversations)
+        if self.write_behind:
+            self._write_behind_stopped = True
+            if self._write_behind_task is not None:
+                self._dirty_event.set()
+                self._dirty_limit_event.set()
+                await self._write_behind_task
 
-        if self.user_data:
-            await self._set_data(self._USER_DATA_KEY, self.user_data)
+        await self._drain_dirty()
 
     async def get_bot_data(self: 'Self') -> 'BD':
         """Return the bot data from the database, if it exists,
@@ -147,7 +1228,7 @@ class RedisPersistence(BasePersistence[UD, CD, BD]):
 
             self.bot_data = data
 
-        return self.bot_data
+        return copy.deepcopy(self.bot_data)
 
     async def get_callback_data(self: 'Self') -> 'CDCData | None':
         """Return the callback data from the database, if it exists,
@@ -169,72 +1250,104 @@ class RedisPersistence(BasePersistence[UD, CD, BD]):
         """Return the chat data from the database, if it exists,
         or an empty dict otherwise.
         """
+        self._start_sweeper()
         if not self.chat_data:
-            data = (await self._get_data(self._CHAT_DATA_KEY) or
-                    defaultdict(self.context_types.chat_data))
-            data = defaultdict(self.context_types.chat_data, data)
+            await self._migrate_legacy_data(self._CHAT_DATA_KEY)
+            if self.lazy:
+                self.chat_data = defaultdict(self.context_types.chat_data)
+                return self.chat_data
 
-            self.chat_data = data
+            data = await self._get_many(f'{self._CHAT_DATA_KEY}:')
+            self.chat_data = defaultdict(self.context_types.chat_data, {
+                int(chat_id): chat_data for chat_id, chat_data in data.items()
+            })
 
-        return self.chat_data
+        # The application modifies its data in place, so it must not
+        # share any objects with the copy used to detect changes.
+        return copy.deepcopy(self.chat_data)
 
     async def get_conversations(self: 'Self', name: str) -> 'ConversationDict':
         """Return the conversations from the database, if it exists,
         or an empty dict otherwise.
         """
-        if not self.conversations:
-            self.conversations = await self._get_data(self._CONVERSATIONS_KEY) or {name: {}}
+        if self.conversations is None:
+            await self._migrate_legacy_data(self._CONVERSATIONS_KEY)
+            self.conversations = {}
+
+        self._start_sweeper()
+        if name not in self.conversations:
+            # The encoded conversation keys are JSON arrays, so the prefix
+            # including the bracket doesn't match the keys of the conversations
+            # whose names start with the name followed by a colon.
+            data = await self._get_many(f'{self._CONVERSATIONS_KEY}:{name}:[')
+            conversations = {}
+            for key, state in data.items():
+                conversation_key = _decode_conversation_key(f'[{key}')
+                if conversation_key is None:
+                    LOGGER.warning('Skipped the malformed key of the conversation %s', name)
+                else:
+                    conversations[conversation_key] = state
 
-        return self.conversations.get(name, {}).copy()
+            self.conversations[name] = conversations
+
+        return self.conversations[name].copy()
 
     async def get_user_data(self: 'Self') -> 'defaultdict[int, UD]':
         """Return the user data from the database, if it exists,
         or an empty dict otherwise.
         """
+        self._start_sweeper()
         if not self.user_data:
-            data = (await self._get_data(self._USER_DATA_KEY) or
-                    defaultdict(self.context_types.user_data))
-            data = defaultdict(self.context_types.user_data, data)
+            await self._migrate_legacy_data(self._USER_DATA_KEY)
+            if self.lazy:
+                self.user_data = defaultdict(self.context_types.user_data)
+                return self.user_data
 
-            self.user_data = data
+            data = await self._get_many(f'{self._USER_DATA_KEY}:')
+            self.user_data = defaultdict(self.context_types.user_data, {
+                int(user_id): user_data for user_id, user_data in data.items()
+            })
 
-        return self.user_data
+        # The application modifies its data in place, so it must not
+        # share any objects with the copy used to detect changes.
+        return copy.deepcopy(self.user_data)
 
     async def update_bot_data(self: 'Self', data: 'BD') -> None:
-        """Update the bot data (if changed) and, depending on on_flush attribute,
+        """Update the bot data (if changed) and, depending on the mode,
         reflect the change in the database.
         """
         if self.bot_data == data:
+            self._increment('skipped_writes', self._BOT_DATA_KEY)
             return
 
-        self.bot_data = data
-        if not self.on_flush:
-            await self._set_data(self._BOT_DATA_KEY, self.bot_data)
+        self.bot_data = copy.deepcopy(data)
+        await self._store(self._BOT_DATA_KEY, self.bot_data)
 
     async def update_callback_data(self: 'Self', data: 'CDCData') -> None:
-        """Update the callback data (if changed) and, depending on on_flush attribute,
+        """Update the callback data (if changed) and, depending on the mode,
         reflect the change in the database.
         """
         if self.callback_data == data:
+            self._increment('skipped_writes', self._CALLBACK_DATA_KEY)
             return
 
         self.callback_data = (data[0], data[1].copy())
-        if not self.on_flush:
-            await self._set_data(self._CALLBACK_DATA_KEY, self.callback_data)
+        await self._store(self._CALLBACK_DATA_KEY, self.callback_data)
 
     async def update_chat_data(self: 'Self', chat_id: int, data: 'CD') -> None:
-        """Update the chat data (if changed) and, depending on on_flush attribute,
+        """Update the chat data (if changed) and, depending on the mode,
         reflect the change in the database.
         """
         if self.chat_data is None:
             self.chat_data = defaultdict(self.context_types.chat_data)
 
         if self.chat_data.get(chat_id) == data:
+            self._increment('skipped_writes', self._CHAT_DATA_KEY)
+            await self._touch(self._get_chat_data_key(chat_id), data)
             return
 
-        self.chat_data[chat_id] = data
-        if not self.on_flush:
-            await self._set_data(self._CHAT_DATA_KEY, self.chat_data)
+        self.chat_data[chat_id] = copy.deepcopy(data)
+        await self._store(self._get_chat_data_key(chat_id), self.chat_data[chat_id])
 
     async def update_conversation(
         self: 'Self',
@@ -242,32 +1355,514 @@ class RedisPersistence(BasePersistence[UD, CD, BD]):
         key: 'ConversationKey',
         new_state: object | None,
     ) -> None:
-        """Update the conversations for the given handler and, depending on on_flush attribute,
+        """Update the conversations for the given handler and, depending on the mode,
         reflect the change in the database.
         """
         if not self.conversations:
             self.conversations = {}
 
         if self.conversations.setdefault(name, {}).get(key) == new_state:
+            self._increment('skipped_writes', self._CONVERSATIONS_KEY)
             return
 
         self.conversations[name][key] = new_state
-        if not self.on_flush:
-            await self._set_data(self._CONVERSATIONS_KEY, self.conversations)
+        await self._store(self._get_conversation_key(name, key), new_state)
 
     async def update_user_data(self: 'Self', user_id: int, data: 'UD') -> None:
-        """Update the user data (if changed) and, depending on the on_flush attribute,
+        """Update the user data (if changed) and, depending on the mode,
         reflect the change in the database.
         """
         if self.user_data is None:
             self.user_data = defaultdict(self.context_types.user_data)
 
         if self.user_data.get(user_id) == data:
+            self._increment('skipped_writes', self._USER_DATA_KEY)
+            await self._touch(self._get_user_data_key(user_id), data)
+            return
+
+        self.user_data[user_id] = copy.deepcopy(data)
+        await self._store(self._get_user_data_key(user_id), self.user_data[user_id])
+
+    async def rebalance(self: 'Self') -> int:
+        """Move the keys stored on the nodes they don't belong to anymore
+        (e.g., after a node is added to the NODES key of the REDIS_PERSISTENCE
+        setting) to their nodes, preserving their expiry. Return the number of
+        the moved keys. The method is intended to be run while the bot is stopped.
+        """
+        if self._ring is None:
+            return 0
+
+        moved = 0
+        for name, client in self._clients.items():
+            keys = [
+                key.decode('utf8') async for key in client.scan_iter(count=_KEYS_BATCH_SIZE)
+            ]
+            keys = [key for key in keys if self._get_node(key) not in {None, name}]
+            for i in range(0, len(keys), _KEYS_BATCH_SIZE):
+                batch = keys[i:i + _KEYS_BATCH_SIZE]
+                async with client.pipeline(transaction=False) as pipe:
+                    for key in batch:
+                        pipe.dump(key)
+                        pipe.pttl(key)
+
+                    results = await pipe.execute()
+
+                dumps = {
+                    key: (value, max(ttl, 0))
+                    for key, value, ttl in zip(batch, results[::2], results[1::2], strict=True)
+                    if value is not None
+                }
+                for target, target_keys in self._group_by_client(dumps):
+                    async with target.pipeline(transaction=False) as pipe:
+                        for key in target_keys:
+                            value, ttl = dumps[key]
+                            pipe.restore(key, ttl, value, replace=True)
+
+                        await pipe.execute()
+
+                await client.delete(*batch)
+                moved += len(dumps)
+
+        LOGGER.info('Moved %d keys to their nodes', moved)
+        return moved
+
+    async def refresh_bot_data(self: 'Self', bot_data: 'BD') -> None:
+        """In the optimistic locking mode, merge the changes made by other
+        processes into the bot data. Otherwise, do nothing.
+        """
+        if not self.optimistic_locking:
+            return
+
+        stored_data = await self._pull_changes(self._BOT_DATA_KEY, self.bot_data, bot_data)
+        if stored_data is not _MISSING:
+            self.bot_data = stored_data
+
+    async def refresh_chat_data(self: 'Self', chat_id: int, chat_data: 'CD') -> None:
+        """In the lazy mode, load the data of the specified chat from the database
+        on the first update related to the chat. In the optimistic locking mode,
+        merge the changes made by other processes into the data.
+        """
+        if not self.lazy and not self.optimistic_locking:
             return
 
-        self.user_data[user_id] = data
+        if self.chat_data is None:
+            self.chat_data = defaultdict(self.context_types.chat_data)
+
+        key = self._get_chat_data_key(chat_id)
+        if self.lazy:
+            await self._load_lazily(self._loaded_chats, self.chat_data, key, chat_id, chat_data)
+
+        if self.optimistic_locking:
+            await self._refresh_entity(self.chat_data, key, chat_id, chat_data)
+
+    async def refresh_user_data(self: 'Self', user_id: int, user_data: 'UD') -> None:
+        """In the lazy mode, load the data of the specified user from the database
+        on the first update related to the user. In the optimistic locking mode,
+        merge the changes made by other processes into the data.
+        """
+        if not self.lazy and not self.optimistic_locking:
+            return
+
+        if self.user_data is None:
+            self.user_data = defaultdict(self.context_types.user_data)
+
+        key = self._get_user_data_key(user_id)
+        if self.lazy:
+            await self._load_lazily(self._loaded_users, self.user_data, key, user_id, user_data)
+
+        if self.optimistic_locking:
+            await self._refresh_entity(self.user_data, key, user_id, user_data)
+
+
+class SQLitePersistence(BasePersistence[UD, CD, BD]):
+    """The class implements the asynchronous interface for making
+    the bots based on Hammett persistent. The data is stored in SQLite,
+    so the persistence suits the bots running on a single node.
+
+    Each user, chat and conversation is stored in its own row, so an update
+    touches only the entry that changed. The database is opened in the WAL
+    mode, and all queries are executed in a dedicated thread, so they don't
+    block the event loop. The changes made while a transaction is being
+    committed are collected and committed together in the next transaction,
+    so the number of transactions doesn't grow with the number of concurrent
+    updates. If `on_flush` is True, the changes are written to the database
+    on flush only (i.e., on shutdown). The application receives copies of
+    the stored data, so the changes it makes in place are detected on update.
+
+    The path to the database and the serializer are specified via
+    the DATABASE and SERIALIZER keys of the SQLITE_PERSISTENCE setting.
+    """
+
+    _BOT_DATA_KIND = 'bot_data'
+    _CHAT_DATA_KIND = 'chat_data'
+    _USER_DATA_KIND = 'user_data'
+    _CALLBACK_DATA_KIND = 'callback_data'
+    _CONVERSATIONS_KIND = 'conversations'
+
+    def __init__(
+        self: 'Self',
+        store_data: 'PersistenceInput | None' = None,
+        on_flush: bool = False,  # noqa: FBT001,FBT002
+        update_interval: float = 60,
+        context_types: 'ContextTypes[Any, UD, CD, BD] | None' = None,
+    ) -> None:
+        """Initialize an SQLite persistence object."""
+        super().__init__(
+            store_data=store_data,  # type: ignore[arg-type]
+            update_interval=update_interval,
+        )
+
+        try:
+            self.database: str = settings.SQLITE_PERSISTENCE['DATABASE']
+        except KeyError as exc:
+            msg = f'{exc.args[0]} is missing in the SQLITE_PERSISTENCE setting.'
+            raise ImproperlyConfigured(msg) from exc
+
+        serializer: type[BaseSerializer] = import_string(
+            settings.SQLITE_PERSISTENCE.get('SERIALIZER', _DEFAULT_SERIALIZER),
+        )
+        self.serializer = serializer()
+
+        self.bot_data: BD | None = None
+        self.callback_data: CDCData | None = None
+        self.chat_data: defaultdict[int, CD] | None = None
+        self.conversations: dict[str, dict[tuple[str | int, ...], object]] | None = None
+        self.context_types = cast('ContextTypes[Any, UD, CD, BD]', context_types or ContextTypes())
+        self.on_flush = on_flush
+        self.user_data: defaultdict[int, UD] | None = None
+
+        self._committer: asyncio.Task[None] | None = None
+        self._connection: sqlite3.Connection | None = None
+        # All queries are executed in the same thread, so the connection
+        # is never shared between threads. The thread is started on the first
+        # query and stopped on flush.
+        self._executor: ThreadPoolExecutor | None = None
+        self._pending: dict[tuple[str, str], bytes | None] = {}
+        self._pending_batch: asyncio.Future[None] | None = None
+
+    #
+    # Private methods
+    #
+
+    def _close(self: 'Self') -> None:
+        """Close the connection to the database, if it's open.
+        The method must be executed in the dedicated thread.
+        """
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _commit(self: 'Self', changes: dict[tuple[str, str], bytes | None]) -> None:
+        """Write the specified changes to the database in one transaction.
+        The rows which values are None are deleted.
+        The method must be executed in the dedicated thread.
+        """
+        connection = self._get_connection()
+        connection.execute('BEGIN')
+        try:
+            connection.executemany(
+                'INSERT OR REPLACE INTO hammett_data (kind, key, value) VALUES (?, ?, ?)',
+                [(kind, key, value) for (kind, key), value in changes.items() if value is not None],
+            )
+            connection.executemany(
+                'DELETE FROM hammett_data WHERE kind = ? AND key = ?',
+                [(kind, key) for (kind, key), value in changes.items() if value is None],
+            )
+        except sqlite3.Error:
+            connection.execute('ROLLBACK')
+            raise
+
+        connection.execute('COMMIT')
+
+    def _fetch(self: 'Self', kind: str) -> list[tuple[str, bytes]]:
+        """Return the keys and values of all the rows of the specified kind.
+        The method must be executed in the dedicated thread.
+        """
+        cursor = self._get_connection().execute(
+            'SELECT key, value FROM hammett_data WHERE kind = ?',
+            (kind, ),
+        )
+        return cursor.fetchall()
+
+    def _get_connection(self: 'Self') -> sqlite3.Connection:
+        """Return the connection to the database, opening it if needed.
+        The method must be executed in the dedicated thread.
+        """
+        if self._connection is None:
+            connection = sqlite3.connect(
+                self.database,
+                check_same_thread=False,
+                isolation_level=None,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            # In the WAL mode, the database stays consistent with the NORMAL
+            # level, and only the latest transactions may be lost on power loss.
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS hammett_data ('
+                'kind TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, '
+                'PRIMARY KEY (kind, key)) WITHOUT ROWID',
+            )
+            self._connection = connection
+
+        return self._connection
+
+    async def _close_database(self: 'Self') -> None:
+        """Close the connection to the database and stop the dedicated thread."""
+        await self._execute(self._close)
+        if self._executor is not None:
+            # The thread is idle since the connection is closed.
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def _drop(self: 'Self', kind: str, key: str) -> None:
+        """Delete the specified row, unless the changes are written on flush only."""
         if not self.on_flush:
-            await self._set_data(self._USER_DATA_KEY, self.user_data)
+            await self._write({(kind, key): None})
+
+    async def _execute(self: 'Self', func: 'Callable[..., Any]', *args: 'Any') -> 'Any':
+        """Execute the specified function in the dedicated thread."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='hammett-sqlite')
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def _load(self: 'Self', kind: str) -> dict[str, 'Any']:
+        """Fetch the data of all the rows of the specified kind from the database."""
+        result: dict[str, Any] = {}
+        try:
+            for key, value in await self._execute(self._fetch, kind):
+                result[key] = self.serializer.loads(value)
+        except (sqlite3.Error, DeserializationFailed):
+            LOGGER.exception('Failed to get the data from SQLite by the kind %s', kind)
+
+        return result
+
+    async def _run_commits(self: 'Self') -> None:
+        """Commit the pending changes until there are no more of them."""
+        while self._pending:
+            changes, self._pending = self._pending, {}
+            batch, self._pending_batch = self._pending_batch, None
+            try:
+                await self._execute(self._commit, changes)
+            except sqlite3.Error as exc:
+                if batch is not None:
+                    batch.set_exception(exc)
+            else:
+                if batch is not None:
+                    batch.set_result(None)
+
+    async def _store(self: 'Self', kind: str, key: str, data: object) -> None:
+        """Store the data in the specified row, unless the changes are
+        written on flush only.
+        """
+        if not self.on_flush:
+            await self._write({(kind, key): self.serializer.dumps(data)})
+
+    async def _write(self: 'Self', changes: dict[tuple[str, str], bytes | None]) -> None:
+        """Add the specified changes to the next transaction and wait until
+        the transaction is committed.
+        """
+        self._pending.update(changes)
+        if self._pending_batch is None:
+            self._pending_batch = asyncio.get_running_loop().create_future()
+
+        batch = self._pending_batch
+        if self._committer is None or self._committer.done():
+            self._committer = asyncio.create_task(self._run_commits())
+
+        await asyncio.shield(batch)
+
+    #
+    # Public methods
+    #
+
+    async def drop_chat_data(self: 'Self', chat_id: int) -> None:
+        """Delete the specified key from `chat_data` and, depending on
+        the mode, reflect the change in the database.
+        """
+        if self.chat_data is None:
+            return
+
+        self.chat_data.pop(chat_id, None)
+        await self._drop(self._CHAT_DATA_KIND, str(chat_id))
+
+    async def drop_user_data(self: 'Self', user_id: int) -> None:
+        """Delete the specified key from `user_data` and, depending on
+        the mode, reflect the change in the database.
+        """
+        if self.user_data is None:
+            return
+
+        self.user_data.pop(user_id, None)
+        await self._drop(self._USER_DATA_KIND, str(user_id))
+
+    async def flush(self: 'Self') -> None:
+        """Wait until the pending changes are committed and close the database.
+        If the changes are written on flush only, store all the data kept in
+        the memory to the database first.
+        """
+        if self.on_flush:
+            changes: dict[tuple[str, str], bytes | None] = {}
+            if self.bot_data:
+                changes[self._BOT_DATA_KIND, ''] = self.serializer.dumps(self.bot_data)
+
+            if self.callback_data:
+                changes[self._CALLBACK_DATA_KIND, ''] = self.serializer.dumps(self.callback_data)
+
+            for chat_id, chat_data in (self.chat_data or {}).items():
+                changes[self._CHAT_DATA_KIND, str(chat_id)] = self.serializer.dumps(chat_data)
+
+            for name, conversations in (self.conversations or {}).items():
+                for key, state in conversations.items():
+                    changes[
+                        f'{self._CONVERSATIONS_KIND}:{name}',
+                        _encode_conversation_key(key),
+                    ] = self.serializer.dumps(state)
+
+            for user_id, user_data in (self.user_data or {}).items():
+                changes[self._USER_DATA_KIND, str(user_id)] = self.serializer.dumps(user_data)
+
+            if changes:
+                await self._write(changes)
+
+        if self._committer is not None:
+            await self._committer
+
+        await self._close_database()
+
+    async def get_bot_data(self: 'Self') -> 'BD':
+        """Return the bot data from the database, if it exists,
+        or an empty object of the type `telegram.ext.ContextTypes.bot_data`
+        otherwise.
+        """
+        if not self.bot_data:
+            data = await self._load(self._BOT_DATA_KIND)
+            self.bot_data = data.get('') or self.context_types.bot_data()
+
+        return copy.deepcopy(self.bot_data)
+
+    async def get_callback_data(self: 'Self') -> 'CDCData | None':
+        """Return the callback data from the database, if it exists,
+        or None otherwise.
+        """
+        if not self.callback_data:
+            data = await self._load(self._CALLBACK_DATA_KIND)
+            self.callback_data = data.get('') or None
+
+        if self.callback_data is None:
+            return None
+
+        return self.callback_data[0], self.callback_data[1].copy()
+
+    async def get_chat_data(self: 'Self') -> 'defaultdict[int, CD]':
+        """Return the chat data from the database, if it exists,
+        or an empty dict otherwise.
+        """
+        if not self.chat_data:
+            data = await self._load(self._CHAT_DATA_KIND)
+            self.chat_data = defaultdict(self.context_types.chat_data, {
+                int(chat_id): chat_data for chat_id, chat_data in data.items()
+            })
+
+        return copy.deepcopy(self.chat_data)
+
+    async def get_conversations(self: 'Self', name: str) -> 'ConversationDict':
+        """Return the conversations from the database, if it exists,
+        or an empty dict otherwise.
+        """
+        if self.conversations is None:
+            self.conversations = {}
+
+        if name not in self.conversations:
+            data = await self._load(f'{self._CONVERSATIONS_KIND}:{name}')
+            conversations = ((_decode_conversation_key(key), state) for key, state in data.items())
+            self.conversations[name] = {
+                key: state for key, state in conversations if key is not None
+            }
+
+        return self.conversations[name].copy()
+
+    async def get_user_data(self: 'Self') -> 'defaultdict[int, UD]':
+        """Return the user data from the database, if it exists,
+        or an empty dict otherwise.
+        """
+        if not self.user_data:
+            data = await self._load(self._USER_DATA_KIND)
+            self.user_data = defaultdict(self.context_types.user_data, {
+                int(user_id): user_data for user_id, user_data in data.items()
+            })
+
+        return copy.deepcopy(self.user_data)
+
+    async def update_bot_data(self: 'Self', data: 'BD') -> None:
+        """Update the bot data (if changed) and, depending on the mode,
+        reflect the change in the database.
+        """
+        if self.bot_data == data:
+            return
+
+        self.bot_data = copy.deepcopy(data)
+        await self._store(self._BOT_DATA_KIND, '', self.bot_data)
+
+    async def update_callback_data(self: 'Self', data: 'CDCData') -> None:
+        """Update the callback data (if changed) and, depending on the mode,
+        reflect the change in the database.
+        """
+        if self.callback_data == data:
+            return
+
+        self.callback_data = (data[0], data[1].copy())
+        await self._store(self._CALLBACK_DATA_KIND, '', self.callback_data)
+
+    async def update_chat_data(self: 'Self', chat_id: int, data: 'CD') -> None:
+        """Update the chat data (if changed) and, depending on the mode,
+        reflect the change in the database.
+        """
+        if self.chat_data is None:
+            self.chat_data = defaultdict(self.context_types.chat_data)
+
+        if self.chat_data.get(chat_id) == data:
+            return
+
+        self.chat_data[chat_id] = copy.deepcopy(data)
+        await self._store(self._CHAT_DATA_KIND, str(chat_id), data)
+
+    async def update_conversation(
+        self: 'Self',
+        name: str,
+        key: 'ConversationKey',
+        new_state: object | None,
+    ) -> None:
+        """Update the conversations for the given handler and, depending on the mode,
+        reflect the change in the database.
+        """
+        if not self.conversations:
+            self.conversations = {}
+
+        if self.conversations.setdefault(name, {}).get(key) == new_state:
+            return
+
+        self.conversations[name][key] = new_state
+        await self._store(
+            f'{self._CONVERSATIONS_KIND}:{name}',
+            _encode_conversation_key(key),
+            new_state,
+        )
+
+    async def update_user_data(self: 'Self', user_id: int, data: 'UD') -> None:
+        """Update the user data (if changed) and, depending on the mode,
+        reflect the change in the database.
+        """
+        if self.user_data is None:
+            self.user_data = defaultdict(self.context_types.user_data)
+
+        if self.user_data.get(user_id) == data:
+            return
+
+        self.user_data[user_id] = copy.deepcopy(data)
+        await self._store(self._USER_DATA_KIND, str(user_id), data)
 
     async def refresh_bot_data(self: 'Self', bot_data: 'BD') -> None:
         """Do nothing. Required by the `BasePersistence` interface."""
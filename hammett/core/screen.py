@@ -2,10 +2,14 @@
 (i.e., cover, description and keyboard).
 """
 
+import asyncio
 import contextlib
+import hashlib
+import itertools
+import json
 import logging
 import re
-from dataclasses import asdict
+from dataclasses import asdict, dataclass
 from os import PathLike
 from typing import TYPE_CHECKING, cast
 from uuid import uuid4
@@ -22,7 +26,8 @@ from telegram._utils.defaultvalue import DEFAULT_NONE
 from telegram.constants import ParseMode
 from telegram.error import BadRequest
 
-from hammett.core import handlers
+from hammett.core import covers, handlers, hiders
+from hammett.core.callback_data import parse_callback_data
 from hammett.core.constants import DEFAULT_STATE, EMPTY_KEYBOARD, FinalRenderConfig, RenderConfig
 from hammett.core.exceptions import (
     FailedToGetDataAttributeOfQuery,
@@ -30,24 +35,55 @@ from hammett.core.exceptions import (
     ScreenDescriptionIsEmpty,
     ScreenDocumentDataIsEmpty,
 )
-from hammett.utils.render_config import get_latest_msg_config, save_latest_msg_config
+from hammett.utils.render_config import (
+    get_latest_msg_config,
+    get_latest_msg_fingerprint,
+    save_latest_msg_config,
+    save_unchanged_msg_config,
+)
 
 if TYPE_CHECKING:
     from collections.abc import Awaitable, Callable
     from typing import Any
 
-    from telegram import CallbackQuery, Update
+    from telegram import CallbackQuery, InlineKeyboardButton, Update
     from telegram._utils.defaultvalue import DefaultValue
     from telegram._utils.types import FileInput
     from telegram.ext import CallbackContext
     from telegram.ext._utils.types import BD, BT, CD, UD
     from typing_extensions import Self
 
+    from hammett.core.button import Button
     from hammett.core.constants import SerializedFinalRenderConfig
     from hammett.types import Document, Keyboard, State
 
 LOGGER = logging.getLogger(__name__)
 
+_FINGERPRINT_SEPARATOR = ':'
+
+_FINGERPRINT_SIZE = 16
+
+
+@dataclass
+class EditsStats:
+    """The class represents the statistics of the edits of the messages
+    made when rendering the screens.
+    """
+
+    keyboard_only: int = 0
+    sent: int = 0
+    skipped: int = 0
+
+
+EDITS_STATS = EditsStats()
+
+
+def _calc_digest(data: bytes) -> str:
+    """Return the digest of the specified data for the fingerprints of
+    the messages.
+    """
+    return hashlib.blake2b(data, digest_size=_FINGERPRINT_SIZE).hexdigest()
+
 
 class Screen:
     """The class implements the interface of a screen."""
@@ -58,10 +94,11 @@ class Screen:
     document: 'Document | None' = None
     html_parse_mode: 'ParseMode | DefaultValue[None]' = DEFAULT_NONE
     hide_keyboard: bool = False
+    static_keyboard: bool = False
 
-    _cached_covers: dict[str | PathLike[str], str] = {}
     _initialized: bool = False
     _instance: 'Screen | None' = None
+    _static_keyboard: 'Keyboard | None' = None
 
     def __init__(self: 'Self') -> None:
         """Initialize a screen object."""
@@ -83,6 +120,79 @@ class Screen:
     # Private methods
     #
 
+    @staticmethod
+    async def _cache_cover(cover_key: str | None, file_id: str) -> None:
+        """Save the ID the local cover with the specified key (see
+        `_calc_cover_key`) got when it was uploaded.
+        """
+        if cover_key is not None:
+            await covers.get_covers_cache().set(cover_key, file_id)
+
+    async def _calc_cover_key(self: 'Self', cover: 'str | PathLike[str]') -> str | None:
+        """Return the key of the specified cover calculated from its contents
+        if it's a local file, otherwise (e.g., if it's a URL or a file ID)
+        return None.
+        """
+        if isinstance(cover, PhotoSize) or self._is_url(cover):
+            return None
+
+        try:
+            return await covers.calc_cover_key(cover)
+        except OSError:
+            return None
+
+    async def _calc_fingerprint(
+        self: 'Self',
+        config: 'FinalRenderConfig',
+        markup: InlineKeyboardMarkup,
+        cover_key: str | None = None,
+    ) -> str | None:
+        """Return the fingerprint of the message rendered with the specified
+        config, or None if the media can't be fingerprinted (e.g., the cover
+        is a URL requested anew on each render). The fingerprint consists of
+        the digest of the text and media, and the digest of the markup, so
+        the keyboard-only changes can be told apart.
+        """
+        media: Any = None
+        if config.document:
+            data = config.document.get('data')
+            if isinstance(data, bytes):
+                media = _calc_digest(data)
+            elif isinstance(data, str | PathLike):
+                media = await self._calc_media_key(data)
+            else:
+                return None
+
+            media = [media, config.document.get('name', '')]
+        elif isinstance(config.cover, PhotoSize):
+            media = config.cover.file_unique_id
+        elif config.cover:
+            if self._is_url(config.cover):
+                if not config.cache_covers:
+                    return None
+
+                media = str(config.cover)
+            else:
+                media = cover_key or str(config.cover)
+
+        content = json.dumps([config.description, bool(self.html_parse_mode), media])
+        return (
+            f'{_calc_digest(content.encode("utf8"))}'
+            f'{_FINGERPRINT_SEPARATOR}'
+            f'{_calc_digest(json.dumps(markup.to_dict()).encode("utf8"))}'
+        )
+
+    @staticmethod
+    async def _calc_media_key(media: 'str | PathLike[str]') -> str:
+        """Return the key of the specified media calculated from its contents
+        if it's a local file, so the changes of the file are not missed,
+        otherwise (e.g., if it's a file ID) return the media itself.
+        """
+        try:
+            return await covers.calc_cover_key(media)
+        except OSError:
+            return str(media)
+
     def _create_input_media_document(
         self: 'Self',
         document: 'Document',
@@ -119,22 +229,76 @@ class Screen:
         update: 'Update | None',
         context: 'CallbackContext[BT, UD, CD, BD]',
     ) -> InlineKeyboardMarkup:
-        keyboard = []
-        for row in rows:
-            buttons = []
-            for button in row:
-                inline_button, visible = await button.create(update, context)
-                if visible:
-                    buttons.append(inline_button)
+        from hammett.conf import settings
 
-            keyboard.append(buttons)
+        semaphore = asyncio.Semaphore(settings.HIDERS_CHECKS_CONCURRENCY)
+
+        async def create(button: 'Button') -> 'tuple[InlineKeyboardButton, bool]':
+            async with semaphore:
+                return await button.create(update, context)
+
+        buttons = [button for row in rows for button in row]
+        results: list[tuple[InlineKeyboardButton, bool] | None] = [None] * len(buttons)
+        hidden_buttons = []
+        for i, button in enumerate(buttons):
+            if button.hiders:
+                hidden_buttons.append(i)
+            else:
+                results[i] = await button.create(update, context)
+
+        # The hiders may query a database or the Bot API, so the buttons
+        # with hiders are created concurrently.
+        if hidden_buttons:
+            hidden_results = await asyncio.gather(*[
+                create(buttons[i]) for i in hidden_buttons
+            ])
+            for i, result in zip(hidden_buttons, hidden_results, strict=True):
+                results[i] = result
+
+        created_buttons = iter(cast('list[tuple[InlineKeyboardButton, bool]]', results))
+        return InlineKeyboardMarkup([
+            [
+                inline_button
+                for inline_button, visible in itertools.islice(created_buttons, len(row))
+                if visible
+            ]
+            for row in rows
+        ])
 
-        return InlineKeyboardMarkup(keyboard)
+    @staticmethod
+    async def _get_cached_cover(cover_key: str | None) -> str | None:
+        """Return the ID of the local cover with the specified key (see
+        `_calc_cover_key`) if it has already been uploaded by any process
+        sharing the covers cache, otherwise None.
+        """
+        if cover_key is None:
+            return None
+
+        return await covers.get_covers_cache().get(cover_key)
+
+    async def _get_default_keyboard(
+        self: 'Self',
+        update: 'Update | None',
+        context: 'CallbackContext[BT, UD, CD, BD]',
+    ) -> 'Keyboard':
+        """Return the default keyboard of the screen. If the keyboard is
+        static, it's set up once, so the buttons build the parts of their
+        callback data that don't depend on the user only once too.
+        """
+        if not self.static_keyboard:
+            return await self.add_default_keyboard(update, context)
+
+        if self._static_keyboard is None:
+            self._static_keyboard = await self.add_default_keyboard(update, context)
+
+        return self._static_keyboard
 
     async def _get_edit_render_method(
         self: 'Self',
         context: 'CallbackContext[BT, UD, CD, BD]',
         config: 'FinalRenderConfig',
+        *,
+        cover_key: str | None = None,
     ) -> tuple['Callable[..., Awaitable[Any]] | None', dict[str, 'Any']]:
         """Return the render method and its kwargs for editing a message."""
         kwargs: Any = {
@@ -147,6 +311,7 @@ class Screen:
             media = config.document or config.cover
             media_kwargs = await self._get_edit_render_method_media_kwargs(
                 cache_covers=config.cache_covers,
+                cover_key=cover_key,
                 description=config.description,
                 media=media,
             )
@@ -167,6 +332,7 @@ class Screen:
         *,
         description: str = '',
         cache_covers: bool = False,
+        cover_key: str | None = None,
     ) -> 'Any':
         """Return the kwargs for edit render method with media."""
         kwargs: Any = {}
@@ -185,18 +351,20 @@ class Screen:
                 caption=description,
                 media=str(media) if cache_covers else f'{media}?{uuid4()}',
             )
-        elif media in self._cached_covers:
-            kwargs['media'] = self._create_input_media_photo(
-                caption=description,
-                media=self._cached_covers[media],
-            )
         else:
-            async with aiofiles.open(media, 'rb') as infile:
-                file = await infile.read()
+            file_id = await self._get_cached_cover(cover_key) if cache_covers else None
+            if file_id:
                 kwargs['media'] = self._create_input_media_photo(
                     caption=description,
-                    media=file,
+                    media=file_id,
                 )
+            else:
+                async with aiofiles.open(media, 'rb') as infile:
+                    file = await infile.read()
+                    kwargs['media'] = self._create_input_media_photo(
+                        caption=description,
+                        media=file,
+                    )
 
         return kwargs
 
@@ -204,6 +372,8 @@ class Screen:
         self: 'Self',
         context: 'CallbackContext[BT, UD, CD, BD]',
         config: 'FinalRenderConfig',
+        *,
+        cover_key: str | None = None,
     ) -> tuple['Callable[..., Awaitable[Any]]', dict[str, 'Any']]:
         """Return the render method and its kwargs for sending a new message."""
         kwargs: Any = {
@@ -216,8 +386,7 @@ class Screen:
             if self._is_url(cover) and config.cache_covers:
                 cover = f'{cover}?{uuid4()}'
             elif config.cache_covers:
-                cover_file_id = self._cached_covers.get(cover)
-                cover = cover_file_id if cover_file_id else cover
+                cover = await self._get_cached_cover(cover_key) or cover
 
             kwargs['caption'] = config.description
             kwargs['photo'] = cover
@@ -248,17 +417,33 @@ class Screen:
         description unchanged.
         """
         config = FinalRenderConfig(**latest_msg_config)
-        send, kwargs = await self._get_edit_render_method(context, config)
-        if send:
-            with contextlib.suppress(BadRequest):
-                await send(
-                    reply_markup=await self._create_markup_keyboard(
-                        EMPTY_KEYBOARD,
-                        None,
-                        context,
-                    ),
-                    **kwargs,
-                )
+        with contextlib.suppress(BadRequest):
+            await context.bot.edit_message_reply_markup(
+                chat_id=config.chat_id,
+                message_id=config.message_id,
+                reply_markup=await self._create_markup_keyboard(
+                    EMPTY_KEYBOARD,
+                    None,
+                    context,
+                ),
+            )
+
+        handlers.delete_payloads(context, config.message_id)
+
+    @staticmethod
+    def _is_keyboard_only_change(
+        fingerprint: str | None,
+        latest_fingerprint: str | None,
+    ) -> bool:
+        """Check if the message with the specified fingerprint differs from
+        the latest sent message only in the keyboard.
+        """
+        if not fingerprint or not latest_fingerprint:
+            return False
+
+        content, _, markup = fingerprint.partition(_FINGERPRINT_SEPARATOR)
+        latest_content, _, latest_markup = latest_fingerprint.partition(_FINGERPRINT_SEPARATOR)
+        return content == latest_content and markup != latest_markup
 
     @staticmethod
     def _is_url(cover: 'str | PathLike[str]') -> bool:
@@ -295,7 +480,7 @@ class Screen:
 
         if not config or config.keyboard is None:
             final_config.keyboard = (
-                final_config.keyboard or await self.add_default_keyboard(update, context)
+                final_config.keyboard or await self._get_default_keyboard(update, context)
             )
 
         if not final_config.message_id and update:
@@ -324,23 +509,70 @@ class Screen:
         """Render the screen components (i.e., cover, description and keyboard),
         and return a corresponding object of the Message type.
         """
+        # Unfortunately, it's currently not possible to send a keyboard along
+        # with a group of attachments
+        from hammett.conf import settings
+
+        # Calculating the key of a local cover requires checking the file,
+        # so the key is calculated once for the render and passed through.
+        cover_key: str | None = None
+        if config.cover and (config.cache_covers or settings.SAVE_LATEST_MESSAGE):
+            cover_key = await self._calc_cover_key(config.cover)
+
+        markup: InlineKeyboardMarkup | None = None
+        if not config.attachments:
+            markup = await self._create_markup_keyboard(config.keyboard, update, context)
+            # The fingerprint is used only when it's saved along with
+            # the latest message config, and calculating it may require
+            # reading the cover.
+            if settings.SAVE_LATEST_MESSAGE:
+                config.fingerprint = await self._calc_fingerprint(config, markup, cover_key)
+
         send: Callable[..., Awaitable[Any]] | None = None
         kwargs: Any = {}
         if config.as_new_message:
-            send, kwargs = await self._get_new_message_render_method(context, config)
+            send, kwargs = await self._get_new_message_render_method(
+                context,
+                config,
+                cover_key=cover_key,
+            )
         else:
-            send, kwargs = await self._get_edit_render_method(context, config)
+            latest_fingerprint = await get_latest_msg_fingerprint(
+                context,
+                config.chat_id,
+                config.message_id,
+            )
+            if config.fingerprint and config.fingerprint == latest_fingerprint:
+                # Editing a message without changing it costs a round trip
+                # to the Bot API ending with the 'Message is not modified' error.
+                EDITS_STATS.skipped += 1
+                handlers.save_pending_payloads(context, config.message_id)
+                # The message is the same, but the rest of the config
+                # (e.g., hide_keyboard) may have changed.
+                await save_unchanged_msg_config(context, config)
+                return None
+
+            if self._is_keyboard_only_change(config.fingerprint, latest_fingerprint):
+                # Edit only the keyboard, so the cover is not uploaded again.
+                EDITS_STATS.keyboard_only += 1
+                send = context.bot.edit_message_reply_markup
+                kwargs = {
+                    'chat_id': config.chat_id,
+                    'message_id': config.message_id,
+                }
+            else:
+                send, kwargs = await self._get_edit_render_method(
+                    context,
+                    config,
+                    cover_key=cover_key,
+                )
+
+            EDITS_STATS.sent += 1
 
         message: Message | None = None
         if send and kwargs:
-            # Unfortunately, it's currently not possible to send a keyboard along
-            # with a group of attachments
-            if not config.attachments:
-                kwargs['reply_markup'] = await self._create_markup_keyboard(
-                    config.keyboard,
-                    update,
-                    context,
-                )
+            if markup is not None:
+                kwargs['reply_markup'] = markup
 
             send_object = await send(**kwargs)
 
@@ -352,7 +584,7 @@ class Screen:
                 and not self._is_url(config.cover)
             ):
                 photo_size_object = send_object.photo[-1]
-                self._cached_covers[config.cover] = photo_size_object.file_id
+                await self._cache_cover(cover_key, photo_size_object.file_id)
 
         return message
 
@@ -477,11 +709,31 @@ class Screen:
         if data is None:
             raise FailedToGetDataAttributeOfQuery
 
-        try:
-            payload_storage = handlers.get_payload_storage(context)
-            return payload_storage.pop(data)
-        except KeyError as exc:
-            raise PayloadIsEmpty from exc
+        callback_data = parse_callback_data(data)
+        if callback_data and callback_data.payload is not None:
+            return callback_data.payload
+
+        payload_storages = []
+        if query and query.message:
+            payload_storages.append(
+                handlers.get_payload_storage(context, query.message.message_id),
+            )
+
+        # The keyboards created outside of rendering keep their payloads
+        # unbound to any message.
+        unbound_payload_storage = handlers.get_unbound_payload_storage(context)
+        if unbound_payload_storage is not None:
+            payload_storages.append(unbound_payload_storage)
+
+        # The keyboards sent without user_data (e.g., by jobs) keep their payloads
+        # in the storage shared by all users.
+        payload_storages.append(handlers.get_shared_payload_storage(context))
+
+        for payload_storage in payload_storages:
+            with contextlib.suppress(KeyError):
+                return payload_storage.pop(data)
+
+        raise PayloadIsEmpty
 
     async def render(
         self: 'Self',
@@ -492,12 +744,18 @@ class Screen:
         extra_data: 'Any | None' = None,
     ) -> None:
         """Render the screen components (i.e., cover, description and keyboard)."""
-        final_config = await self._finalize_config(update, context, config)
-        await self._pre_render(update, context, final_config, extra_data)
-
-        message = await self._render(update, context, final_config, extra_data)
-        if message:
-            await self._post_render(update, context, message, final_config, extra_data)
+        with hiders.cache_checks(), handlers.collect_pending_payloads():
+            final_config = await self._finalize_config(update, context, config)
+            await self._pre_render(update, context, final_config, extra_data)
+
+            message = await self._render(update, context, final_config, extra_data)
+            latest_message = message[-1] if isinstance(message, tuple) else message
+            handlers.save_pending_payloads(
+                context,
+                latest_message.message_id if latest_message else None,
+            )
+            if message:
+                await self._post_render(update, context, message, final_config, extra_data)
 
     async def goto(
         self: 'Self',
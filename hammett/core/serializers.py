@@ -0,0 +1,234 @@
+"""The module contains the serializers used by the persistence to convert
+the data to bytes and back.
+"""
+
+import base64
+import json
+import pickle
+from pathlib import Path, PurePath
+from typing import TYPE_CHECKING
+
+from hammett.core.constants import LATEST_SENT_MSG_KEY
+from hammett.core.exceptions import DeserializationFailed, ImproperlyConfigured
+
+try:
+    import msgpack  # type: ignore[import-untyped,import-not-found,unused-ignore]
+except ImportError:
+    msgpack = None
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from typing import Any
+
+    from typing_extensions import Self
+
+_BYTES_TAG = '~b'
+
+_DICT_TAG = '~d'
+
+_PATH_TAG = '~p'
+
+_SET_TAG = '~s'
+
+_TUPLE_TAG = '~t'
+
+_TAGS = (_BYTES_TAG, _DICT_TAG, _PATH_TAG, _SET_TAG, _TUPLE_TAG)
+
+_SCALAR_TYPES = frozenset((type(None), bool, int, float, str))
+
+
+def _decode_tagged(obj: dict[str, 'Any']) -> 'Any':
+    """Restore the Python type of the object tagged by the encoder.
+    The function is intended to be used as the object hook of the decoders,
+    so the items of the object are already restored.
+    """
+    if len(obj) == 1:
+        tag, value = next(iter(obj.items()))
+        if tag == _TUPLE_TAG:
+            return tuple(value)
+
+        if tag == _DICT_TAG:
+            return dict(value)
+
+        if tag == _BYTES_TAG:
+            return base64.b64decode(value)
+
+        if tag == _SET_TAG:
+            return set(value)
+
+        if tag == _PATH_TAG:
+            return Path(value)
+
+    return obj
+
+
+def _make_encoder(  # noqa: C901
+    *,
+    str_keys_only: bool,
+    bytes_supported: bool,
+) -> 'Callable[[Any], Any]':
+    """Return the function converting an object to the one consisting only of
+    the types supported by JSON (or msgpack), tagging the Python types that
+    would be lost otherwise.
+    """
+    key_types: tuple[type, ...] = (str, ) if str_keys_only else (str, int)
+
+    def encode(obj: 'Any') -> 'Any':  # noqa: C901, PLR0911
+        # Check the exact types first since it's much faster than isinstance.
+        obj_type = type(obj)
+        if obj_type in _SCALAR_TYPES:
+            return obj
+
+        if obj_type is list:
+            return [encode(item) for item in obj]
+
+        if obj_type is tuple:
+            return {_TUPLE_TAG: [encode(item) for item in obj]}
+
+        if isinstance(obj, dict):
+            if LATEST_SENT_MSG_KEY in obj:
+                obj = {
+                    **obj,
+                    LATEST_SENT_MSG_KEY: _encode_latest_msg_config(obj[LATEST_SENT_MSG_KEY]),
+                }
+
+            if all(type(key) in key_types and key not in _TAGS for key in obj):
+                return {key: encode(value) for key, value in obj.items()}
+
+            return {_DICT_TAG: [[encode(key), encode(value)] for key, value in obj.items()]}
+
+        if obj is None or isinstance(obj, bool | int | float | str):
+            return obj
+
+        if isinstance(obj, list):
+            return [encode(item) for item in obj]
+
+        if isinstance(obj, tuple):
+            return {_TUPLE_TAG: [encode(item) for item in obj]}
+
+        if isinstance(obj, bytes):
+            return obj if bytes_supported else {_BYTES_TAG: base64.b64encode(obj).decode('ascii')}
+
+        if isinstance(obj, set | frozenset):
+            return {_SET_TAG: [encode(item) for item in obj]}
+
+        if isinstance(obj, PurePath):
+            return {_PATH_TAG: str(obj)}
+
+        msg = f'Object of type {type(obj).__name__} is not serializable'
+        raise TypeError(msg)
+
+    return encode
+
+
+def _encode_latest_msg_config(config: 'Any') -> 'Any':
+    """Drop the parts of the latest message config that can't be serialized
+    without pickle. The keyboard consists of the buttons bound to the screens,
+    and the attachments are the objects of python-telegram-bot. Neither of them
+    is needed to hide the keyboard of the message later.
+    """
+    if not isinstance(config, dict):
+        return config
+
+    return {**config, 'attachments': None, 'keyboard': []}
+
+
+class BaseSerializer:
+    """The base class for the implementations of serializers."""
+
+    def dumps(self: 'Self', obj: 'Any') -> bytes:
+        """Serialize the specified object to bytes."""
+        raise NotImplementedError
+
+    def loads(self: 'Self', data: bytes) -> 'Any':
+        """Deserialize the specified bytes to an object.
+        Raise `DeserializationFailed` if the data is malformed.
+        """
+        raise NotImplementedError
+
+
+class JSONSerializer(BaseSerializer):
+    """The class implements the serializer based on JSON.
+    The tuples, the dicts with non-string keys, sets, bytes and paths are
+    stored tagged to restore their types on deserialization.
+    """
+
+    _encode = staticmethod(_make_encoder(str_keys_only=True, bytes_supported=False))
+
+    def dumps(self: 'Self', obj: 'Any') -> bytes:
+        """Serialize the specified object to bytes."""
+        return json.dumps(
+            self._encode(obj),
+            ensure_ascii=False,
+            separators=(',', ':'),
+        ).encode('utf8')
+
+    def loads(self: 'Self', data: bytes) -> 'Any':
+        """Deserialize the specified bytes to an object."""
+        try:
+            return json.loads(data, object_hook=_decode_tagged)
+        except ValueError as exc:
+            raise DeserializationFailed from exc
+
+
+class MsgpackSerializer(BaseSerializer):
+    """The class implements the serializer based on msgpack.
+    The serializer requires the msgpack package to be installed.
+    """
+
+    _encode = staticmethod(_make_encoder(str_keys_only=False, bytes_supported=True))
+
+    def __init__(self: 'Self') -> None:
+        """Initialize a msgpack serializer object."""
+        if msgpack is None:
+            msg = 'MsgpackSerializer requires the msgpack package to be installed.'
+            raise ImproperlyConfigured(msg)
+
+        self._msgpack = msgpack
+
+    def dumps(self: 'Self', obj: 'Any') -> bytes:
+        """Serialize the specified object to bytes."""
+        data: bytes = self._msgpack.packb(
+            self._encode(obj),
+            use_bin_type=True,
+        )
+        return data
+
+    def loads(self: 'Self', data: bytes) -> 'Any':
+        """Deserialize the specified bytes to an object."""
+        try:
+            return self._msgpack.unpackb(
+                data,
+                object_hook=_decode_tagged,
+                raw=False,
+                strict_map_key=False,
+            )
+        except (ValueError, self._msgpack.UnpackException) as exc:
+            raise DeserializationFailed from exc
+
+
+class PickleSerializer(BaseSerializer):
+    """The class implements the serializer based on pickle.
+    The serializer supports any picklable objects, but the data is not
+    guaranteed to be readable by other versions of the code.
+    """
+
+    def dumps(self: 'Self', obj: 'Any') -> bytes:
+        """Serialize the specified object to bytes."""
+        return pickle.dumps(obj)
+
+    def loads(self: 'Self', data: bytes) -> 'Any':
+        """Deserialize the specified bytes to an object."""
+        try:
+            return pickle.loads(data)  # noqa: S301
+        # Besides UnpicklingError, the malformed data may cause
+        # the exceptions of other types.
+        except (
+            pickle.UnpicklingError,
+            AttributeError,
+            EOFError,
+            ImportError,
+            IndexError,
+            ValueError,
+        ) as exc:
+            raise DeserializationFailed from exc
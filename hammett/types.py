@@ -12,6 +12,7 @@ from telegram.ext import BaseHandler, CallbackContext
 from telegram.ext._utils.types import BD, BT, CCT, CD, UD, ConversationKey
 from telegram.ext.filters import BaseFilter
 
+from hammett.core import payloads
 from hammett.core.button import Button
 from hammett.core.screen import Screen
 
@@ -30,9 +31,11 @@ class Document(TypedDict):
 
 Keyboard = list[list[Button]]
 
-NativeStates = dict[object, list[BaseHandler]]  # type: ignore[type-arg]
+# The storage of the payloads used to be a plain dict.
+# The alias is kept for backward compatibility.
+PayloadStorage = payloads.PayloadStorage
 
-PayloadStorage = dict[str, str]
+NativeStates = dict[object, list[BaseHandler]]  # type: ignore[type-arg]
 
 State = NewType('State', str)
 
@@ -0,0 +1,88 @@
+"""The module contains the implementation of consistent hashing used to
+distribute the keys across several nodes.
+"""
+
+import bisect
+import hashlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from typing_extensions import Self
+
+_DEFAULT_REPLICAS = 160
+
+
+def _hash(value: str) -> int:
+    """Return the position of the specified value on the ring."""
+    return int.from_bytes(hashlib.blake2b(value.encode('utf8'), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """The class implements the consistent hash ring. Each node is placed
+    on the ring at `replicas` points, and a key belongs to the node owning
+    the first point following the position of the key. Adding or removing
+    a node moves only the keys of the ring segments the node takes or gives
+    away, i.e. about 1/N of all keys.
+    """
+
+    def __init__(
+        self: 'Self',
+        nodes: 'Iterable[str]' = (),
+        replicas: int = _DEFAULT_REPLICAS,
+    ) -> None:
+        """Initialize a hash ring object."""
+        self.replicas = replicas
+
+        self._nodes: set[str] = set()
+        self._points: list[int] = []
+        self._owners: list[str] = []
+        for node in nodes:
+            self.add_node(node)
+
+    def __len__(self: 'Self') -> int:
+        """Return the number of the nodes on the ring."""
+        return len(self._nodes)
+
+    @property
+    def nodes(self: 'Self') -> frozenset[str]:
+        """Return the nodes on the ring."""
+        return frozenset(self._nodes)
+
+    def add_node(self: 'Self', node: str) -> None:
+        """Place the specified node on the ring."""
+        if node in self._nodes:
+            return
+
+        self._nodes.add(node)
+        for i in range(self.replicas):
+            point = _hash(f'{node}#{i}')
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def get_node(self: 'Self', key: str) -> str:
+        """Return the node the specified key belongs to.
+        Raise `LookupError` if the ring is empty.
+        """
+        if not self._points:
+            msg = 'The hash ring has no nodes'
+            raise LookupError(msg)
+
+        index = bisect.bisect(self._points, _hash(key))
+        return self._owners[index % len(self._owners)]
+
+    def remove_node(self: 'Self', node: str) -> None:
+        """Remove the specified node from the ring."""
+        if node not in self._nodes:
+            return
+
+        self._nodes.remove(node)
+        kept = [
+            (point, owner)
+            for point, owner in zip(self._points, self._owners, strict=True)
+            if owner != node
+        ]
+        self._points = [point for point, _ in kept]
+        self._owners = [owner for _, owner in kept]
@@ -38,6 +38,39 @@ async def get_latest_msg_config(
     return state
 
 
+async def get_latest_msg_fingerprint(
+    context: 'CallbackContext[BT, UD, CD, BD]',
+    chat_id: int | None,
+    message_id: int,
+) -> str | None:
+    """Return the fingerprint of the latest sent message if it's
+    the specified message, otherwise return None.
+    """
+    if not isinstance(context.user_data, dict):
+        return None
+
+    state = context.user_data.get(LATEST_SENT_MSG_KEY)
+    if not state or state['chat_id'] != chat_id or state['message_id'] != message_id:
+        return None
+
+    return cast('str | None', state.get('fingerprint'))
+
+
+async def save_unchanged_msg_config(
+    context: 'CallbackContext[BT, UD, CD, BD]',
+    config: 'FinalRenderConfig',
+) -> None:
+    """Save the render config of the latest sent message that was rendered
+    again without being edited, since it hasn't changed. Such messages are
+    found in user_data only (see `get_latest_msg_fingerprint`).
+    """
+    if isinstance(context.user_data, dict):
+        context.user_data[LATEST_SENT_MSG_KEY] = {
+            **asdict(config),
+            'message_id': config.message_id,
+        }
+
+
 async def save_latest_msg_config(
     context: 'CallbackContext[BT, UD, CD, BD]',
     config: 'FinalRenderConfig',
@@ -255,13 +255,36 @@ class BaseChoiceWidget(BaseWidget):
                 Button(
                     f'{box} {name}',
                     self._on_choice_click,
-                    payload=json.dumps({'code': code, 'name': name}),
+                    # The code alone is short enough to be passed right in
+                    # the callback data in most cases. The name is looked up
+                    # in the widget state on click.
+                    payload=code,
                     source_type=SourcesTypes.HANDLER_SOURCE_TYPE,
                 ),
             ])
 
         return keyboard + await self.add_extra_keyboard(update, context)
 
+    async def _get_selected_choice(
+        self: 'Self',
+        update: 'Update',
+        context: 'CallbackContext[BT, UD, CD, BD]',
+        payload: str,
+    ) -> 'Choice':
+        """Return the choice the specified payload of the pressed button refers to."""
+        # The buttons created by the previous versions of Hammett pass
+        # both the code and the name of the choice encoded in JSON.
+        with contextlib.suppress(ValueError):
+            legacy_payload = json.loads(payload)
+            if isinstance(legacy_payload, dict) and 'code' in legacy_payload:
+                return legacy_payload['code'], legacy_payload.get('name', '')
+
+        for _, code, name in await self.get_initialized_choices(update, context):
+            if code == payload:
+                return code, name
+
+        return payload, ''
+
     async def _init(
         self: 'Self',
         update: 'Update | None',
@@ -303,9 +326,13 @@ class BaseChoiceWidget(BaseWidget):
         **_kwargs: 'Any',
     ) -> 'State':
         """Invoke when clicking on a choice."""
-        payload: dict[str, str] = json.loads(await self.get_payload(update, context))
+        selected_choice = await self._get_selected_choice(
+            update,
+            context,
+            await self.get_payload(update, context),
+        )
 
-        choices = await self.switch(update, context, (payload['code'], payload['name']))
+        choices = await self.switch(update, context, selected_choice)
         keyboard = await self._build_keyboard(update, context, choices)
         config = RenderConfig(
             keyboard=keyboard,
@@ -30,10 +30,13 @@ setup(
     maintainer='Evgeny Golyshev',
     maintainer_email='eugulixes@gmail.com',
     license='Apache License, Version 2.0',
-    packages=find_packages(exclude=('demos.*', 'demos', 'tests.*', 'tests')),
+    packages=find_packages(exclude=('benchmarks', 'demos.*', 'demos', 'tests.*', 'tests')),
     include_package_data=True,
     data_files=[('', ['requirements.txt'])],
     install_requires=requirements,
+    extras_require={
+        'msgpack': ['msgpack'],
+    },
     python_requires='>=3.10',
     keywords='python telegram bot api',
     project_urls={
@@ -7,8 +7,17 @@ import unittest
 
 from tests.test_application import ApplicationTests
 from tests.test_buttons import ButtonsTests
+from tests.test_callback_data import CallbackDataTests
+from tests.test_covers import CoversCacheTests
+from tests.test_hash_ring import HashRingTests
 from tests.test_hiders_check_mechanism import HidersCheckerTests
+from tests.test_metrics import MetricsTests
+from tests.test_payloads import PayloadStorageTests
 from tests.test_permissions_mechanism import PermissionsTests
+from tests.test_redis_persistence import RedisPersistenceTests
+from tests.test_screens import ScreensTests
+from tests.test_serializers import SerializersTests
+from tests.test_sqlite_persistence import SQLitePersistenceTests
 
 if __name__ == '__main__':
     os.environ.setdefault('HAMMETT_SETTINGS_MODULE', 'tests.settings')
@@ -3,15 +3,17 @@
 # ruff: noqa: ANN001, ANN101, ANN201, ANN202, D401, S106, SLF001
 
 import logging
-import re
+from unittest.mock import AsyncMock, patch
 
+from telegram import CallbackQuery, Update, User
 from telegram.ext import CommandHandler
 
-from hammett.core import Application
+from hammett.core import Application, handlers
 from hammett.core.button import Button
 from hammett.core.constants import DEFAULT_STATE, SourcesTypes
-from hammett.core.exceptions import TokenIsNotSpecified
-from hammett.core.handlers import calc_checksum
+from hammett.core.dispatchers import CallbackQueryDispatcher
+from hammett.core.exceptions import HandlerChecksumCollision, TokenIsNotSpecified
+from hammett.core.handlers import calc_checksum, register_checksum
 from hammett.test.base import BaseTestCase
 from hammett.test.utils import override_settings
 from tests.base import TestScreen, TestStartScreen
@@ -94,14 +96,13 @@ class ApplicationTests(BaseTestCase):
         app = self._init_application()
 
         handlers = app._native_application.handlers[0][0]
-        pattern = calc_checksum('TestScreenWithKeyboard.goto')
+        dispatcher = handlers.states[DEFAULT_STATE][0]
+        checksum = calc_checksum('TestScreenWithKeyboard.goto')
 
         self.assertIsInstance(handlers.entry_points[0], CommandHandler)
         self.assertEqual(handlers.name, _APPLICATION_TEST_NAME)
-        self.assertEqual(
-            handlers.states[DEFAULT_STATE][0].pattern,
-            re.compile(pattern),
-        )
+        self.assertIsInstance(dispatcher, CallbackQueryDispatcher)
+        self.assertIn(checksum, dispatcher.handlers)
 
     @override_settings(TOKEN='')
     def test_unsuccessful_app_init_with_empty_token(self):
@@ -129,5 +130,98 @@ class ApplicationTests(BaseTestCase):
         """
         app = self._init_application()
         handlers = app._native_application.handlers[0][0]
-        is_wrapped = getattr(handlers.states[DEFAULT_STATE][0].callback, '__wrapped__', None)
+        dispatcher = handlers.states[DEFAULT_STATE][0]
+        checksum = calc_checksum('TestScreenWithKeyboard.goto')
+        is_wrapped = getattr(dispatcher.handlers[checksum], '__wrapped__', None)
         self.assertIsNotNone(is_wrapped)
+
+    def test_dispatching_callback_query_by_checksum(self):
+        """Tests the case when a callback query is routed to the handler
+        with exactly the same checksum, even if the checksum of another
+        handler is a prefix of it.
+        """
+        async def short_handler(_update, _context):
+            pass
+
+        async def long_handler(_update, _context):
+            pass
+
+        dispatcher = CallbackQueryDispatcher()
+        dispatcher.add_handler('123', short_handler)
+        dispatcher.add_handler('1234', long_handler)
+
+        def make_update(data):
+            return Update(1, callback_query=CallbackQuery(
+                '1',
+                User(1, 'User', is_bot=False),
+                'chat_instance',
+                data=data,
+            ))
+
+        self.assertIs(dispatcher.check_update(make_update('1234,button=1,user_id=1')), long_handler)
+        self.assertIs(dispatcher.check_update(make_update('123,button=1,user_id=1')), short_handler)
+        self.assertIsNone(dispatcher.check_update(make_update('12,button=1,user_id=1')))
+
+    def test_registering_colliding_checksums(self):
+        """Tests the case when two different handlers have the same name,
+        so their checksums collide.
+        """
+        for registry in (handlers._checksums, handlers._checksum_owners):
+            patcher = patch.dict(registry)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        def create_handler():
+            async def colliding_handler(_update, _context):
+                pass
+
+            return colliding_handler
+
+        handler = create_handler()
+        checksum = register_checksum(handler)
+
+        self.assertEqual(register_checksum(handler), checksum)
+        self.assertEqual(calc_checksum(handler), checksum)
+        with self.assertRaises(HandlerChecksumCollision):
+            register_checksum(create_handler())
+
+        # The screens with the same name defined in different modules
+        # inherit the same handler.
+        first_screen = type('CollidingScreen', (TestScreen, ), {'__module__': 'first'})
+        second_screen = type('CollidingScreen', (TestScreen, ), {'__module__': 'second'})
+        checksum = register_checksum(first_screen().goto)
+
+        self.assertEqual(register_checksum(first_screen().goto), checksum)
+        with self.assertRaisesRegex(HandlerChecksumCollision, r'\(second\).*\(first\)'):
+            register_checksum(second_screen().goto)
+
+    async def test_running_background_tasks(self):
+        """Tests the case when the application is started and shut down, so
+        the background tasks are started and stopped, and the covers cache is
+        closed, along with running the hooks specified via the application
+        builder.
+        """
+        post_init = AsyncMock()
+
+        class TestApplication(Application):
+            def provide_application_builder(self):
+                return super().provide_application_builder().post_init(post_init)
+
+        with (
+            patch('hammett.core.application.start_invalidations_listener') as start,
+            patch('hammett.core.application.stop_invalidations_listener') as stop,
+            patch('hammett.core.application.close_covers_cache') as close_covers_cache,
+        ):
+            app = TestApplication(_APPLICATION_TEST_NAME, entry_point=TestStartScreen)
+            native_application = app._native_application
+            await native_application.post_init(native_application)
+
+            start.assert_called_once_with()
+            post_init.assert_awaited_once_with(native_application)
+            stop.assert_not_called()
+            close_covers_cache.assert_not_called()
+
+            await native_application.post_shutdown(native_application)
+
+            stop.assert_awaited_once_with()
+            close_covers_cache.assert_awaited_once_with()
@@ -1,6 +1,6 @@
 """The module contains the tests for buttons."""
 
-# ruff: noqa: ANN101, ANN201
+# ruff: noqa: ANN001, ANN101, ANN201, SLF001
 
 from hammett.core.button import Button
 from hammett.core.constants import SourcesTypes
@@ -17,6 +17,27 @@ class AnythingElseButScreen:
     """A dummy class used for the testing purposes."""
 
 
+class TestStaticKeyboardScreen(TestScreen):
+    """The class implements a screen with the static keyboard for the tests."""
+
+    static_keyboard = True
+
+    setups = 0
+
+    # Screen is a singleton, so the screen must not get the instance
+    # of TestScreen inherited from it.
+    _instance = None
+
+    async def add_default_keyboard(self, _update, _context):
+        """Set up a new keyboard each time it's called."""
+        type(self).setups += 1
+        return [[Button(
+            'Static',
+            'https://github.com/cusdeb-com/hammett',
+            source_type=SourcesTypes.URL_SOURCE_TYPE,
+        )]]
+
+
 class ButtonsTests(BaseTestCase):
     """The class implements the tests for buttons."""
 
@@ -29,6 +50,40 @@ class ButtonsTests(BaseTestCase):
                 source_type=SourcesTypes.HANDLER_SOURCE_TYPE,
             )
 
+    async def test_reusing_callback_data_prefix(self):
+        """Tests the case when the part of the callback data that doesn't
+        depend on the user is built once for a button.
+        """
+        button = Button(
+            'Test',
+            TestScreen,
+            source_type=SourcesTypes.GOTO_SOURCE_TYPE,
+        )
+        self.context._user_id = 1
+        inline_button, _ = await button.create(None, self.context)
+        prefix = button._callback_data_prefix
+
+        self.context._user_id = 2
+        another_inline_button, _ = await button.create(None, self.context)
+
+        self.assertIsNotNone(prefix)
+        self.assertIs(button._callback_data_prefix, prefix)
+        self.assertTrue(inline_button.callback_data.startswith(prefix))
+        self.assertTrue(another_inline_button.callback_data.startswith(prefix))
+        self.assertNotEqual(inline_button.callback_data, another_inline_button.callback_data)
+
+    async def test_reusing_static_keyboard(self):
+        """Tests the case when the keyboard of a screen is static, so
+        `add_default_keyboard` is called once, and the same buttons are used
+        on every render, keeping the parts of the callback data they build once.
+        """
+        TestStaticKeyboardScreen.setups = 0
+        screen = TestStaticKeyboardScreen()
+        keyboard = await screen._get_default_keyboard(self.update, self.context)
+
+        self.assertIs(await screen._get_default_keyboard(self.update, self.context), keyboard)
+        self.assertEqual(TestStaticKeyboardScreen.setups, 1)
+
     async def test_unknown_source_type(self):
         """Tests the case when an unknown source type passed."""
         with self.assertRaises(UnknownSourceType):
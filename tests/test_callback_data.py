@@ -0,0 +1,77 @@
+"""The module contains the tests for the callback data of the buttons."""
+
+# ruff: noqa: ANN201
+
+from hammett.core.callback_data import (
+    CALLBACK_DATA_MAX_SIZE,
+    CallbackData,
+    build_callback_data,
+    parse_callback_data,
+)
+from hammett.test.base import BaseTestCase
+
+_BUTTON_CHECKSUM = 'VwXyZ-_0'
+
+_HANDLER_CHECKSUM = 'AbCdEf12'
+
+_USER_ID = 1234567890
+
+
+class CallbackDataTests(BaseTestCase):
+    """The class implements the tests for the callback data of the buttons."""
+
+    def test_building_callback_data(self):
+        """Tests the case when the callback data is built and parsed back."""
+        data = build_callback_data(_HANDLER_CHECKSUM, _BUTTON_CHECKSUM, _USER_ID)
+
+        self.assertEqual(
+            parse_callback_data(data),
+            CallbackData(_HANDLER_CHECKSUM, _BUTTON_CHECKSUM, _USER_ID, None),
+        )
+
+    def test_building_callback_data_without_user(self):
+        """Tests the case when the callback data is built for a button
+        created without a user (e.g., in a job).
+        """
+        data = build_callback_data(_HANDLER_CHECKSUM, _BUTTON_CHECKSUM, None)
+
+        self.assertIsNone(parse_callback_data(data).user_id)
+
+    def test_building_callback_data_with_payload(self):
+        """Tests the case when a short payload is passed right in
+        the callback data.
+        """
+        payload = 'код:1,button=2'
+        data = build_callback_data(_HANDLER_CHECKSUM, _BUTTON_CHECKSUM, _USER_ID, payload)
+
+        self.assertLessEqual(len(data.encode('utf8')), CALLBACK_DATA_MAX_SIZE)
+        self.assertEqual(
+            parse_callback_data(data),
+            CallbackData(_HANDLER_CHECKSUM, _BUTTON_CHECKSUM, _USER_ID, payload),
+        )
+
+    def test_building_callback_data_with_too_long_payload(self):
+        """Tests the case when a payload doesn't fit in the callback data,
+        so it must be kept in the payload storage.
+        """
+        data = build_callback_data(_HANDLER_CHECKSUM, _BUTTON_CHECKSUM, _USER_ID, 'п' * 21)
+
+        self.assertIsNone(data)
+
+    def test_parsing_legacy_callback_data(self):
+        """Tests the case when the callback data of the format used by
+        the previous versions of Hammett is parsed.
+        """
+        self.assertEqual(
+            parse_callback_data('123,button=456,user_id=789,p=code'),
+            CallbackData('123', '456', 789, 'code'),
+        )
+        self.assertEqual(
+            parse_callback_data('123,button=456,user_id=None'),
+            CallbackData('123', '456', None, None),
+        )
+
+    def test_parsing_foreign_callback_data(self):
+        """Tests the case when the callback data is not created by a button."""
+        self.assertIsNone(parse_callback_data('next_page'))
+        self.assertIsNone(parse_callback_data('page,number=1'))
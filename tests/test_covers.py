@@ -0,0 +1,184 @@
+"""The module contains the tests for the caches of the IDs of the covers."""
+
+# ruff: noqa: ANN001, ANN201, ANN202, S106
+
+import importlib.util
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from hammett.core.constants import RenderConfig
+from hammett.core.covers import (
+    MemoryCoversCache,
+    RedisCoversCache,
+    SQLiteCoversCache,
+    calc_cover_key,
+    get_covers_cache,
+)
+from hammett.test.base import BaseTestCase, TestBot
+from hammett.test.utils import override_settings
+from tests.base import TestScreen
+
+if importlib.util.find_spec('fakeredis'):
+    from fakeredis import FakeAsyncRedis, FakeServer
+
+_FILE_ID = 'file-id'
+
+
+class CoversCacheTests(BaseTestCase):
+    """The class implements the tests for the caches of the IDs of the covers."""
+
+    def setUp(self):
+        """Create the temporary directory for the covers and the database."""
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.tmp_dir = Path(tmp_dir.name)
+
+    def _create_cover(self, name, contents=b'cover'):
+        """Return the path to the cover with the specified contents."""
+        path = self.tmp_dir / name
+        path.write_bytes(contents)
+        return str(path)
+
+    async def test_calculating_cover_key_by_contents(self):
+        """Tests the case when the covers with the same contents have the same
+        key regardless of their paths, and the key changes with the contents.
+        """
+        first_cover = self._create_cover('first.jpg')
+        second_cover = self._create_cover('second.jpg')
+        key = await calc_cover_key(first_cover)
+
+        self.assertEqual(await calc_cover_key(second_cover), key)
+
+        self._create_cover('first.jpg', b'another cover')
+
+        self.assertNotEqual(await calc_cover_key(first_cover), key)
+
+    async def test_evicting_least_recently_used_ids(self):
+        """Tests the case when the number of the IDs exceeds the size of
+        the in-memory cache, and the least recently used ones are evicted.
+        """
+        covers_cache = MemoryCoversCache(max_size=2)
+        await covers_cache.set('first', '1')
+        await covers_cache.set('second', '2')
+        await covers_cache.get('first')  # makes the ID the most recently used one
+        await covers_cache.set('third', '3')
+
+        self.assertEqual(await covers_cache.get('first'), '1')
+        self.assertIsNone(await covers_cache.get('second'))
+
+    @override_settings(TOKEN='1:secret-token')
+    async def test_sharing_ids_through_sqlite(self):
+        """Tests the case when the ID of a cover saved by one process is
+        returned to another one through the database.
+        """
+        database = str(self.tmp_dir / 'hammett.sqlite3')
+        first_cache = SQLiteCoversCache(database=database)
+        second_cache = SQLiteCoversCache(database=database)
+        with override_settings(TOKEN='2:secret-token'):
+            another_bot_cache = SQLiteCoversCache(database=database)
+
+        try:
+            await first_cache.set('key', _FILE_ID)
+
+            self.assertEqual(await second_cache.get('key'), _FILE_ID)
+            self.assertIsNone(await another_bot_cache.get('key'))
+        finally:
+            for covers_cache in (first_cache, second_cache, another_bot_cache):
+                await covers_cache.close()
+
+    @override_settings(TOKEN='secret-token')
+    async def test_closing_sqlite_cache(self):
+        """Tests the case when the SQLite cache is closed, so its thread is
+        stopped, and the database is opened again on the next query.
+        """
+        # The IDs are not kept in memory, so every query reaches the database.
+        covers_cache = SQLiteCoversCache(
+            max_size=0,
+            database=str(self.tmp_dir / 'hammett.sqlite3'),
+        )
+        await covers_cache.set('key', _FILE_ID)
+        await covers_cache.close()
+
+        self.assertNotIn('hammett-covers', {
+            thread.name.partition('_')[0] for thread in threading.enumerate()
+        })
+
+        try:
+            self.assertEqual(await covers_cache.get('key'), _FILE_ID)
+        finally:
+            await covers_cache.close()
+
+    @unittest.skipUnless(importlib.util.find_spec('fakeredis'), 'fakeredis is not installed')
+    @override_settings(TOKEN='1:secret-token')
+    async def test_sharing_ids_through_redis(self):
+        """Tests the case when the ID of a cover saved by one process is
+        returned to another one through the Redis instance returned by
+        `create_redis_client`.
+        """
+        server = FakeServer()
+        with patch(
+            'hammett.core.persistences.create_redis_client',
+            side_effect=lambda: FakeAsyncRedis(server=server),
+        ):
+            first_cache = RedisCoversCache()
+            second_cache = RedisCoversCache()
+
+        try:
+            await first_cache.set('key', _FILE_ID)
+
+            self.assertEqual(await second_cache.get('key'), _FILE_ID)
+        finally:
+            for covers_cache in (first_cache, second_cache):
+                await covers_cache.close()
+
+    @override_settings(SAVE_LATEST_MESSAGE=True, TOKEN='secret-token')
+    async def test_calculating_cover_key_once_per_render(self):
+        """Tests the case when the cover is looked up in the cache, saved to it
+        and fingerprinted while a screen is rendered, and its key is calculated
+        only once for that.
+        """
+        send_photo = AsyncMock(return_value=MagicMock(photo=[MagicMock(file_id=_FILE_ID)]))
+        user_data: dict[str, object] = {}
+        with (
+            patch.object(type(self.context), 'user_data', user_data),
+            patch.object(TestBot, 'send_photo', send_photo),
+            patch('hammett.core.covers.calc_cover_key', wraps=calc_cover_key) as calc_key,
+        ):
+            await TestScreen().render(None, self.context, config=RenderConfig(
+                as_new_message=True,
+                cache_covers=True,
+                chat_id=1,
+                cover=self._create_cover('cover.jpg'),
+            ))
+
+        calc_key.assert_awaited_once()
+        self.assertEqual(
+            await get_covers_cache().get(await calc_cover_key(self.tmp_dir / 'cover.jpg')),
+            _FILE_ID,
+        )
+
+    @override_settings(TOKEN='secret-token')
+    async def test_sending_cached_cover_by_id(self):
+        """Tests the case when a cover has been uploaded, so the screen with
+        the cover of the same contents sends its ID instead.
+        """
+        cover = self._create_cover('cover.jpg')
+        await get_covers_cache().set(await calc_cover_key(cover), _FILE_ID)
+
+        send_photo = AsyncMock(return_value=MagicMock(photo=None))
+        user_data: dict[str, object] = {}
+        with (
+            patch.object(type(self.context), 'user_data', user_data),
+            patch.object(TestBot, 'send_photo', send_photo),
+        ):
+            await TestScreen().render(None, self.context, config=RenderConfig(
+                as_new_message=True,
+                cache_covers=True,
+                chat_id=1,
+                cover=self._create_cover('copy.jpg'),
+            ))
+
+        self.assertEqual(send_photo.await_args.kwargs['photo'], _FILE_ID)
@@ -0,0 +1,55 @@
+"""The module contains the tests for the consistent hash ring."""
+
+# ruff: noqa: ANN201
+
+from hammett.test.base import BaseTestCase
+from hammett.utils.hash_ring import HashRing
+
+_KEYS = [f'user_data:{i}' for i in range(10000)]
+
+
+class HashRingTests(BaseTestCase):
+    """The class implements the tests for the consistent hash ring."""
+
+    def test_adding_node_moves_only_its_share_of_keys(self):
+        """Tests the case when a node is added to the ring, and only
+        the keys it takes over are moved.
+        """
+        ring = HashRing(['a', 'b', 'c'])
+        before = {key: ring.get_node(key) for key in _KEYS}
+        ring.add_node('d')
+        moved = [key for key in _KEYS if ring.get_node(key) != before[key]]
+
+        self.assertTrue(all(ring.get_node(key) == 'd' for key in moved))
+        self.assertLess(len(moved), len(_KEYS) * 0.35)
+
+    def test_distributing_keys(self):
+        """Tests the case when the keys are distributed across the nodes
+        evenly enough, regardless of the order of the nodes.
+        """
+        ring = HashRing(['a', 'b', 'c', 'd'])
+        counts = dict.fromkeys(ring.nodes, 0)
+        for key in _KEYS:
+            counts[ring.get_node(key)] += 1
+
+        reversed_ring = HashRing(['d', 'c', 'b', 'a'])
+        self.assertTrue(all(key_count > len(_KEYS) / 8 for key_count in counts.values()))
+        self.assertTrue(all(ring.get_node(key) == reversed_ring.get_node(key) for key in _KEYS))
+
+    def test_empty_ring(self):
+        """Tests the case when a key is looked up on the ring without nodes."""
+        with self.assertRaises(LookupError):
+            HashRing().get_node('user_data:1')
+
+    def test_removing_node(self):
+        """Tests the case when a node is removed from the ring, and its keys
+        are taken over by the remaining nodes.
+        """
+        ring = HashRing(['a', 'b', 'c'])
+        before = {key: ring.get_node(key) for key in _KEYS}
+        ring.remove_node('b')
+
+        self.assertEqual(ring.nodes, {'a', 'c'})
+        self.assertTrue(all(
+            ring.get_node(key) == node for key, node in before.items() if node != 'b'
+        ))
@@ -1,20 +1,41 @@
 """The module contains the tests for the hiders mechanism."""
 
-# ruff: noqa: ANN001, ANN101, ANN201, ANN202, D401
+# ruff: noqa: ANN001, ANN101, ANN201, ANN202, D401, SLF001
+
+import asyncio
+import importlib.util
+import json
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
 
 from hammett.conf import settings
 from hammett.core.button import Button
 from hammett.core.constants import SourcesTypes
-from hammett.core.exceptions import ImproperlyConfigured
+from hammett.core.exceptions import HiderIsInvalid, ImproperlyConfigured
 from hammett.core.hiders import (
+    CHECKS_CACHE_STATS,
     ONLY_FOR_ADMIN,
     ONLY_FOR_MODERATORS,
     Hider,
     HidersChecker,
+    SharedChecksCache,
+    _get_shared_checks_cache,
+    _render_cache,
+    cache_checks,
+    invalidate_checks,
+    is_legacy_hiders_checker,
+    start_invalidations_listener,
+    stop_invalidations_listener,
 )
+from hammett.core.screen import Screen
 from hammett.test.base import BaseTestCase
 from hammett.test.utils import override_settings
 
+if importlib.util.find_spec('fakeredis'):
+    from fakeredis import FakeAsyncRedis, FakeServer
+
+_INVALIDATION_CHANNEL = 'hiders'
+
 _TEST_BUTTON_NAME = 'Test button'
 
 _TEST_URL = 'https://github.com/cusdeb-com/hammett'
@@ -46,6 +67,70 @@ class TestAsyncHidersChecker(HidersChecker):
         return settings.IS_MODERATOR
 
 
+class TestFailingHidersChecker(HidersChecker):
+    """The class implements a hiders checker that fails on the first check,
+    for the tests.
+    """
+
+    checks = 0
+
+    async def is_admin(self, _update, _context):
+        """A stub hiders checker for the testing purposes."""
+        cls = type(self)
+        cls.checks += 1
+        if cls.checks == 1:
+            raise ConnectionError
+
+        return True
+
+
+class TestLegacyHidersChecker(HidersChecker):
+    """The class implements a hiders checker written for the API where
+    every button created its own checker, for the tests.
+    """
+
+    runs = 0
+
+    def __init__(self, hiders_set) -> None:
+        """Initialize a hider checker object."""
+        super().__init__(hiders_set)
+
+    async def run(self, update, context):
+        """Run the checks associated with the registered hiders."""
+        type(self).runs += 1
+        return await super().run(update, context)
+
+    def is_admin(self, _update, _context):
+        """A stub hiders checker for the testing purposes."""
+        return settings.IS_ADMIN
+
+
+class TestSlowHidersChecker(HidersChecker):
+    """The class implements a hiders checker that takes time to check
+    the hiders, for the tests.
+    """
+
+    checks = 0
+
+    running_checks = 0
+
+    max_running_checks = 0
+
+    async def is_admin(self, _update, _context):
+        """A stub hiders checker for the testing purposes."""
+        cls = type(self)
+        cls.checks += 1
+        cls.running_checks += 1
+        cls.max_running_checks = max(cls.max_running_checks, cls.running_checks)
+        await asyncio.sleep(0.01)
+        cls.running_checks -= 1
+        return True
+
+    async def is_moderator(self, _update, _context):
+        """A stub hiders checker for the testing purposes."""
+        return False
+
+
 class HidersCheckerTests(BaseTestCase):
     """The class implements the tests for the hiders checker mechanism."""
 
@@ -136,3 +221,367 @@ class HidersCheckerTests(BaseTestCase):
                 hiders=Hider(ONLY_FOR_ADMIN),
                 source_type=SourcesTypes.URL_SOURCE_TYPE,
             )
+
+    @override_settings(
+        HIDERS_CHECKER='tests.test_hiders_check_mechanism.TestSlowHidersChecker',
+        HIDERS_CHECKS_CONCURRENCY=2,
+    )
+    async def test_checking_hiders_concurrently(self):
+        """Tests the case when the hiders of the buttons of a keyboard are
+        checked concurrently, and the order of the buttons is preserved.
+        """
+        def create_button(caption, hider):
+            return Button(
+                caption,
+                _TEST_URL,
+                hiders=Hider(hider),
+                source_type=SourcesTypes.URL_SOURCE_TYPE,
+            )
+
+        keyboard = [
+            [create_button('1', ONLY_FOR_ADMIN), create_button('2', ONLY_FOR_MODERATORS)],
+            [create_button('3', ONLY_FOR_ADMIN)],
+            [create_button('4', ONLY_FOR_ADMIN), create_button('5', ONLY_FOR_ADMIN)],
+        ]
+        TestSlowHidersChecker.max_running_checks = 0
+        markup = await Screen._create_markup_keyboard(keyboard, self.update, self.context)
+
+        self.assertEqual(
+            [[button.text for button in row] for row in markup.inline_keyboard],
+            [['1'], ['3'], ['4', '5']],
+        )
+        self.assertEqual(TestSlowHidersChecker.max_running_checks, 2)
+
+    @override_settings(HIDERS_CHECKER='tests.test_hiders_check_mechanism.TestSlowHidersChecker')
+    async def test_caching_checks(self):
+        """Tests the case when the same hider is attached to several buttons,
+        and it's checked only once while the keyboard is being rendered.
+        """
+        keyboard = [
+            [
+                Button(
+                    caption,
+                    _TEST_URL,
+                    hiders=Hider(ONLY_FOR_ADMIN),
+                    source_type=SourcesTypes.URL_SOURCE_TYPE,
+                )
+                for caption in ('1', '2', '3')
+            ],
+        ]
+        TestSlowHidersChecker.checks = 0
+        CHECKS_CACHE_STATS.hits = CHECKS_CACHE_STATS.misses = 0
+        with cache_checks():
+            await Screen._create_markup_keyboard(keyboard, self.update, self.context)
+            await Screen._create_markup_keyboard(keyboard, self.update, self.context)
+
+        self.assertEqual(TestSlowHidersChecker.checks, 1)
+        # The buttons of the first keyboard wait for the same check, while
+        # the buttons of the second one use the resolved roles of the user.
+        self.assertEqual((CHECKS_CACHE_STATS.hits, CHECKS_CACHE_STATS.misses), (2, 1))
+
+        await Screen._create_markup_keyboard(keyboard, self.update, self.context)
+
+        self.assertEqual(TestSlowHidersChecker.checks, 4)
+
+    @override_settings(
+        HIDERS_CHECKER='tests.test_hiders_check_mechanism.TestSlowHidersChecker',
+        HIDERS_CHECKS_CACHE={'TTL': 60},
+    )
+    async def test_caching_checks_between_updates(self):
+        """Tests the case when the results of the checks are cached between
+        the updates until they are invalidated.
+        """
+        button = Button(
+            _TEST_BUTTON_NAME,
+            _TEST_URL,
+            hiders=Hider(ONLY_FOR_ADMIN),
+            source_type=SourcesTypes.URL_SOURCE_TYPE,
+        )
+        TestSlowHidersChecker.checks = 0
+        await button.create(self.update, self.context)
+        await button.create(self.update, self.context)
+
+        self.assertEqual(TestSlowHidersChecker.checks, 1)
+
+        await invalidate_checks(hider=ONLY_FOR_MODERATORS)
+        await button.create(self.update, self.context)
+
+        self.assertEqual(TestSlowHidersChecker.checks, 1)
+
+        await invalidate_checks(hider=ONLY_FOR_ADMIN)
+        await button.create(self.update, self.context)
+
+        self.assertEqual(TestSlowHidersChecker.checks, 2)
+
+    async def test_caching_checks_per_checker(self):
+        """Tests the case when the same hider is checked by different checkers
+        while the keyboard is being rendered, and each checker checks it itself.
+        """
+        mask = Hider(ONLY_FOR_ADMIN).mask
+        with override_settings(IS_ADMIN=False), cache_checks():
+            self.assertTrue(await TestSlowHidersChecker().check_mask(
+                mask, self.update, self.context,
+            ))
+            self.assertFalse(await TestAsyncHidersChecker().check_mask(
+                mask, self.update, self.context,
+            ))
+
+    def test_expiring_shared_checks(self):
+        """Tests the case when the cached results of the checks expire or
+        are invalidated while the checks are in progress.
+        """
+        cache = SharedChecksCache(ttl=60, max_size=10)
+        with patch('hammett.core.hiders.time.monotonic', return_value=1000):
+            cache.set(1, ONLY_FOR_ADMIN, True, cache.generation)  # noqa: FBT003
+
+            self.assertTrue(cache.get(1, ONLY_FOR_ADMIN))
+
+        with patch('hammett.core.hiders.time.monotonic', return_value=1060):
+            self.assertIsNone(cache.get(1, ONLY_FOR_ADMIN))
+
+            generation = cache.generation
+            cache.invalidate(user_id=2)
+            cache.set(1, ONLY_FOR_ADMIN, True, generation)  # noqa: FBT003
+
+            self.assertIsNone(cache.get(1, ONLY_FOR_ADMIN))
+
+    def test_combining_hiders_into_mask(self):
+        """Tests the case when hiders are combined into a bitmask."""
+        hider = Hider(ONLY_FOR_ADMIN) | Hider(ONLY_FOR_MODERATORS)
+
+        self.assertEqual(hider.mask, 1 << ONLY_FOR_ADMIN | 1 << ONLY_FOR_MODERATORS)
+        self.assertEqual(hider.hiders_set, {ONLY_FOR_ADMIN, ONLY_FOR_MODERATORS})
+
+    async def test_rechecking_failed_hiders(self):
+        """Tests the case when a check fails while the keyboard is being
+        rendered, so the hider is checked again instead of re-raising the error.
+        """
+        checker = TestFailingHidersChecker()
+        mask = Hider(ONLY_FOR_ADMIN).mask
+        TestFailingHidersChecker.checks = 0
+        with cache_checks():
+            with self.assertRaises(ConnectionError):
+                await checker.check_mask(mask, self.update, self.context)
+
+            self.assertFalse(_render_cache.get().checks)
+            self.assertTrue(await checker.check_mask(mask, self.update, self.context))
+
+        self.assertEqual(TestFailingHidersChecker.checks, 2)
+
+    async def test_checking_resolved_roles(self):
+        """Tests the case when the hiders of the mask have already been
+        resolved while the keyboard is being rendered, so the mask is checked
+        without checking the hiders again.
+        """
+        checker = TestSlowHidersChecker()
+        mask = Hider(ONLY_FOR_ADMIN).mask
+        with cache_checks():
+            self.assertTrue(await checker.check_mask(mask, self.update, self.context))
+
+            with patch.object(checker, '_check', new=AsyncMock()) as check:
+                self.assertTrue(await checker.check_mask(mask, self.update, self.context))
+                self.assertTrue(await checker.check_mask(
+                    (Hider(ONLY_FOR_ADMIN) | Hider(ONLY_FOR_MODERATORS)).mask,
+                    self.update,
+                    self.context,
+                ))
+
+        check.assert_not_awaited()
+
+    async def test_checking_partially_resolved_roles(self):
+        """Tests the case when only some hiders of the mask have been checked
+        while the keyboard is being rendered, so only the rest are checked.
+        """
+        checker = TestSlowHidersChecker()
+        moderators_mask = Hider(ONLY_FOR_MODERATORS).mask
+        with cache_checks():
+            self.assertFalse(await checker.check_mask(
+                moderators_mask, self.update, self.context,
+            ))
+
+            with patch.object(checker, '_check', wraps=checker._check) as check:
+                self.assertTrue(await checker.check_mask(
+                    (Hider(ONLY_FOR_ADMIN) | Hider(ONLY_FOR_MODERATORS)).mask,
+                    self.update,
+                    self.context,
+                ))
+                self.assertFalse(await checker.check_mask(
+                    moderators_mask, self.update, self.context,
+                ))
+
+            roles_mask, = _render_cache.get().roles.values()
+
+        check.assert_awaited_once_with(ONLY_FOR_ADMIN, self.update, self.context)
+        self.assertEqual(roles_mask.roles, 1 << ONLY_FOR_ADMIN)
+        self.assertEqual(roles_mask.checked, 1 << ONLY_FOR_ADMIN | 1 << ONLY_FOR_MODERATORS)
+
+    def test_invalid_hider(self):
+        """Tests the case when the ID of a hider is negative, so it can't
+        stand for a bit of a bitmask.
+        """
+        with self.assertRaises(HiderIsInvalid):
+            Hider(-1)
+
+        with self.assertRaises(HiderIsInvalid):
+            TestHidersChecker({ONLY_FOR_ADMIN, -1})
+
+    @override_settings(HIDERS_CHECKER='tests.test_hiders_check_mechanism.TestLegacyHidersChecker')
+    async def test_legacy_hiders_checker(self):
+        """Tests the case when the hiders checker requires the hiders set
+        when it's initialized and overrides `run`, so it's created for every
+        button and `run` is used to check the hiders.
+        """
+        TestLegacyHidersChecker.runs = 0
+        with (
+            patch('hammett.core.hiders._hiders_checker', None),
+            self.assertWarns(DeprecationWarning),
+        ):
+            await self._test_hider()
+
+        self.assertEqual(TestLegacyHidersChecker.runs, 2)
+
+    def test_detecting_legacy_hiders_checkers(self):
+        """Tests the case when the hiders checkers written for the API where
+        every button created its own checker are told from the others.
+        """
+        class RunningHidersChecker(HidersChecker):
+            async def run(self, update, context):
+                return await super().run(update, context)
+
+        self.assertTrue(is_legacy_hiders_checker(TestLegacyHidersChecker))
+        self.assertTrue(is_legacy_hiders_checker(RunningHidersChecker))
+        self.assertFalse(is_legacy_hiders_checker(TestHidersChecker))
+        self.assertFalse(is_legacy_hiders_checker(HidersChecker))
+
+    @override_settings(HIDERS_CHECKER='tests.test_hiders_check_mechanism.TestHidersChecker')
+    def test_sharing_hiders_checker(self):
+        """Tests the case when the buttons with different hiders share
+        the same hiders checker.
+        """
+        first_button = Button(
+            _TEST_BUTTON_NAME,
+            _TEST_URL,
+            hiders=Hider(ONLY_FOR_ADMIN),
+            source_type=SourcesTypes.URL_SOURCE_TYPE,
+        )
+        second_button = Button(
+            _TEST_BUTTON_NAME,
+            _TEST_URL,
+            hiders=Hider(ONLY_FOR_MODERATORS),
+            source_type=SourcesTypes.URL_SOURCE_TYPE,
+        )
+
+        self.assertIsInstance(first_button.hiders_checker, TestHidersChecker)
+        self.assertIs(first_button.hiders_checker, second_button.hiders_checker)
+
+
+@unittest.skipUnless(importlib.util.find_spec('fakeredis'), 'fakeredis is not installed')
+class InvalidationsListenerTests(BaseTestCase):
+    """The class implements the tests for the listener of the invalidations
+    of the cached results of the hiders checks made by other processes.
+    """
+
+    def setUp(self):
+        """Enable the cache of the results of the checks, and make
+        the listener connect to the fake Redis instance.
+        """
+        overrider = override_settings(HIDERS_CHECKS_CACHE={
+            'TTL': 60,
+            'INVALIDATION_CHANNEL': _INVALIDATION_CHANNEL,
+        })
+        overrider.enable()
+        self.addCleanup(overrider.disable)
+
+        self.server = FakeServer()
+        patcher = patch(
+            'hammett.core.hiders._create_redis_client',
+            side_effect=lambda: FakeAsyncRedis(server=self.server),
+        )
+        self.create_redis_client = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def _wait_for_subscription(self):
+        """Wait until the listener subscribes to the invalidation channel."""
+        client = FakeAsyncRedis(server=self.server)
+        for _ in range(100):
+            if (await client.pubsub_numsub(_INVALIDATION_CHANNEL))[0][1]:
+                return
+
+            await asyncio.sleep(0.01)
+
+        self.fail('The listener has not subscribed to the invalidation channel')
+
+    async def test_applying_invalidations(self):
+        """Tests the case when another process publishes an invalidation,
+        and the listener removes the cached result of the check.
+        """
+        cache = _get_shared_checks_cache()
+        cache.set(1, ONLY_FOR_ADMIN, True, cache.generation)  # noqa: FBT003
+        start_invalidations_listener()
+        try:
+            await self._wait_for_subscription()
+
+            client = FakeAsyncRedis(server=self.server)
+            with self.assertLogs('hammett.core.hiders', 'WARNING'):
+                await client.publish(_INVALIDATION_CHANNEL, 'malformed')
+                await asyncio.sleep(0.01)
+
+            await client.publish(
+                _INVALIDATION_CHANNEL,
+                json.dumps({'user_id': 1, 'hider': ONLY_FOR_ADMIN}),
+            )
+            for _ in range(100):
+                if cache.get(1, ONLY_FOR_ADMIN) is None:
+                    break
+
+                await asyncio.sleep(0.01)
+        finally:
+            await stop_invalidations_listener()
+
+        self.assertIsNone(cache.get(1, ONLY_FOR_ADMIN))
+
+    async def test_publishing_invalidations(self):
+        """Tests the case when the results of the checks are invalidated,
+        and the invalidation is published to the other processes.
+        """
+        async with FakeAsyncRedis(server=self.server).pubsub() as pubsub:
+            await pubsub.subscribe(_INVALIDATION_CHANNEL)
+            await invalidate_checks(user_id=1)
+            await pubsub.get_message(timeout=1)  # the confirmation of the subscription
+            message = await pubsub.get_message(timeout=1)
+
+        self.assertEqual(json.loads(message['data']), {'user_id': 1, 'hider': None})
+
+    async def test_reconnecting_to_channel(self):
+        """Tests the case when the listener fails to connect to the channel,
+        so it closes the client and reconnects.
+        """
+        broken_client = MagicMock(aclose=AsyncMock())
+        broken_client.pubsub.side_effect = ConnectionError
+        self.create_redis_client.side_effect = [
+            broken_client,
+            FakeAsyncRedis(server=self.server),
+        ]
+        with (
+            patch('hammett.core.hiders._RECONNECT_DELAY', 0),
+            self.assertLogs('hammett.core.hiders', 'ERROR'),
+        ):
+            start_invalidations_listener()
+            try:
+                await self._wait_for_subscription()
+            finally:
+                await stop_invalidations_listener()
+
+        broken_client.aclose.assert_awaited_once_with()
+
+    @override_settings(HIDERS_CHECKS_CACHE={
+        'TTL': None,
+        'INVALIDATION_CHANNEL': _INVALIDATION_CHANNEL,
+    })
+    async def test_not_listening_without_cache(self):
+        """Tests the case when the cache of the results of the checks is
+        disabled, so the listener doesn't start.
+        """
+        start_invalidations_listener()
+
+        self.create_redis_client.assert_not_called()
@@ -0,0 +1,47 @@
+"""The module contains the tests for the metrics sinks."""
+
+# ruff: noqa: ANN201
+
+from hammett.core.metrics import Histogram, InMemoryMetricsSink
+from hammett.test.base import BaseTestCase
+
+
+class MetricsTests(BaseTestCase):
+    """The class implements the tests for the metrics sinks."""
+
+    def test_counting(self):
+        """Tests the case when the counters with the same name, but different
+        tags are incremented.
+        """
+        sink = InMemoryMetricsSink()
+        sink.increment('persistence.reads', 2, {'kind': 'user_data', 'result': 'hit'})
+        sink.increment('persistence.reads', 1, {'result': 'hit', 'kind': 'user_data'})
+        sink.increment('persistence.reads', 1, {'kind': 'chat_data', 'result': 'hit'})
+
+        reads = {
+            counter['tags']['kind']: counter['value']
+            for counter in sink.snapshot()['persistence.reads']
+        }
+        self.assertEqual(reads, {'chat_data': 1, 'user_data': 3})
+
+    def test_histogram_quantiles(self):
+        """Tests the case when the quantiles are estimated by the upper bounds
+        of the histogram buckets.
+        """
+        histogram = Histogram()
+        for value in range(1, 101):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.count, 100)
+        self.assertEqual(histogram.total, 5050)
+        self.assertEqual(histogram.quantile(0.5), 64)
+        self.assertEqual(histogram.quantile(0.99), 100)
+        self.assertEqual(Histogram().quantile(0.5), 0)
+
+    def test_resetting(self):
+        """Tests the case when the collected metrics are removed."""
+        sink = InMemoryMetricsSink()
+        sink.observe('persistence.write_bytes', 100, {'kind': 'user_data'})
+        sink.reset()
+
+        self.assertEqual(sink.snapshot(), {})
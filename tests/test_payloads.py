@@ -0,0 +1,182 @@
+"""The module contains the tests for the payload storage."""
+
+# ruff: noqa: ANN201
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from hammett.core.button import Button
+from hammett.core.constants import SourcesTypes
+from hammett.core.handlers import (
+    collect_pending_payloads,
+    delete_payloads,
+    get_payload_storage,
+    save_pending_payloads,
+)
+from hammett.core.payloads import PayloadStorage
+from hammett.test.base import BaseTestCase
+from hammett.test.utils import override_settings
+from hammett.types import PayloadStorage as LegacyPayloadStorage
+from tests.base import TestScreen
+
+# The payload doesn't fit in the callback data, so it's put in the storage.
+_LONG_PAYLOAD = 'payload' * 10
+
+_TTL = 60
+
+
+class PayloadStorageTests(BaseTestCase):
+    """The class implements the tests for the payload storage."""
+
+    def test_evicting_least_recently_stored_payloads(self):
+        """Tests the case when the number of the payloads exceeds the size
+        of the storage, and the least recently stored ones are evicted.
+        """
+        storage = PayloadStorage({}, max_size=2, ttl=None)
+        storage['first'] = '1'
+        storage['second'] = '2'
+        storage['first'] = '1'  # makes the payload the most recently stored one
+        storage['third'] = '3'
+
+        self.assertEqual(dict(storage), {'first': '1', 'third': '3'})
+
+    def test_expiring_payloads(self):
+        """Tests the case when the payloads expire, and they are neither
+        returned nor kept after another payload is stored.
+        """
+        entries: dict[str, list[object]] = {}
+        storage = PayloadStorage(entries, max_size=10, ttl=_TTL)
+        with patch('hammett.core.payloads.time.time', return_value=1000):
+            storage['first'] = '1'
+
+        with patch('hammett.core.payloads.time.time', return_value=1000 + _TTL):
+            with self.assertRaises(KeyError):
+                storage.pop('first')
+
+            storage['first'] = '1'
+            storage['second'] = '2'
+
+        with patch('hammett.core.payloads.time.time', return_value=1000 + _TTL * 2):
+            storage['third'] = '3'
+
+        self.assertEqual(list(entries), ['third'])
+
+    def test_importing_storage_from_types(self):
+        """Tests the case when the storage is imported from the module
+        it was available in before.
+        """
+        self.assertIs(LegacyPayloadStorage, PayloadStorage)
+
+    def test_reading_legacy_payloads(self):
+        """Tests the case when the payloads stored by the previous versions
+        of Hammett as plain strings are read.
+        """
+        storage = PayloadStorage({'legacy': 'payload'}, max_size=10, ttl=_TTL)
+
+        self.assertEqual(storage.pop('legacy'), 'payload')
+        self.assertNotIn('legacy', storage)
+
+    async def test_reading_payload_of_keyboard_created_outside_rendering(self):
+        """Tests the case when a keyboard is created outside of rendering,
+        so its payloads are not bound to the message, and they are read
+        anyway when its button is pressed.
+        """
+        button = Button(
+            'Test',
+            TestScreen,
+            payload=_LONG_PAYLOAD,
+            source_type=SourcesTypes.GOTO_SOURCE_TYPE,
+        )
+        user_data: dict[str, dict[str, object]] = {}
+        with (
+            patch.object(type(self.context), 'bot_data', {}),
+            patch.object(type(self.context), 'user_data', user_data),
+        ):
+            inline_button, _ = await button.create(
+                MagicMock(effective_user=MagicMock(id=1)),
+                self.context,
+            )
+            update = MagicMock(callback_query=MagicMock(
+                answer=AsyncMock(),
+                data=inline_button.callback_data,
+                message=MagicMock(message_id=1),
+            ))
+
+            self.assertEqual(await TestScreen().get_payload(update, self.context), _LONG_PAYLOAD)
+
+    def test_storing_payload_in_bot_data(self):
+        """Tests the case when a payload is stored in bot_data in
+        the serializable form.
+        """
+        bot_data: dict[str, dict[str, object]] = {}
+        with patch.object(type(self.context), 'bot_data', bot_data):
+            get_payload_storage(self.context)['data'] = 'payload'
+
+            self.assertEqual(get_payload_storage(self.context)['data'], 'payload')
+
+        self.assertIsInstance(bot_data['hammett']['data'], list)
+
+    async def test_storing_payloads_of_concurrent_renderings(self):
+        """Tests the case when the keyboards are rendered concurrently,
+        so each message gets only the payloads of its own keyboard.
+        """
+
+        async def render(message_id: int) -> None:
+            with collect_pending_payloads():
+                get_payload_storage(self.context)[str(message_id)] = 'payload'
+                await asyncio.sleep(0)  # lets the other rendering proceed
+                save_pending_payloads(self.context, message_id)
+
+        user_data: dict[str, dict[str, object]] = {}
+        with patch.object(type(self.context), 'user_data', user_data):
+            await asyncio.gather(render(1), render(2))
+
+            self.assertEqual(list(get_payload_storage(self.context, 1)), ['1'])
+            self.assertEqual(list(get_payload_storage(self.context, 2)), ['2'])
+
+        self.assertEqual(list(user_data['hammett']), ['1', '2'])
+
+    def test_storing_payloads_per_message(self):
+        """Tests the case when the payloads are stored in user_data by
+        the message the keyboard is sent with, and replacing or hiding
+        the keyboard deletes them.
+        """
+        bot_data: dict[str, object] = {}
+        user_data: dict[str, dict[str, object]] = {}
+        with (
+            patch.object(type(self.context), 'bot_data', bot_data),
+            patch.object(type(self.context), 'user_data', user_data),
+        ):
+            get_payload_storage(self.context)['first'] = '1'
+            save_pending_payloads(self.context, 1)
+            get_payload_storage(self.context)['second'] = '2'
+            save_pending_payloads(self.context, 2)
+
+            self.assertEqual(get_payload_storage(self.context, 1)['first'], '1')
+            self.assertNotIn('second', get_payload_storage(self.context, 1))
+
+            get_payload_storage(self.context)['third'] = '3'
+            save_pending_payloads(self.context, 1)
+
+            self.assertEqual(list(get_payload_storage(self.context, 1)), ['third'])
+
+            delete_payloads(self.context, 2)
+
+            self.assertEqual(len(get_payload_storage(self.context, 2)), 0)
+
+        self.assertEqual(list(user_data['hammett']), ['1'])
+        self.assertEqual(bot_data, {})
+
+    @override_settings(PAYLOAD_STORAGE_MAX_MESSAGES=2)
+    def test_evicting_payloads_of_least_recent_messages(self):
+        """Tests the case when the number of the messages with payloads
+        exceeds the limit, and the payloads of the least recently rendered
+        ones are evicted.
+        """
+        user_data: dict[str, dict[str, object]] = {}
+        with patch.object(type(self.context), 'user_data', user_data):
+            for message_id in range(1, 4):
+                get_payload_storage(self.context)['data'] = str(message_id)
+                save_pending_payloads(self.context, message_id)
+
+        self.assertEqual(list(user_data['hammett']), ['2', '3'])
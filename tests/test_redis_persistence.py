@@ -0,0 +1,607 @@
+"""The module contains the tests for the Redis persistence."""
+
+# ruff: noqa: ANN001, ANN201, ANN202, SLF001
+
+import asyncio
+import importlib.util
+import pickle
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+from telegram.ext import Application, ExtBot, PersistenceInput
+
+from hammett.conf import settings
+from hammett.core.exceptions import ImproperlyConfigured
+from hammett.core.persistences import _MAX_WRITE_ATTEMPTS, RedisPersistence, create_redis_client
+from hammett.test.base import BaseTestCase
+from hammett.test.utils import override_settings
+
+if importlib.util.find_spec('fakeredis'):
+    from fakeredis import FakeAsyncRedis, FakeServer
+
+_NODES = [
+    {'HOST': 'first', 'PORT': 6379, 'DB': 0},
+    {'HOST': 'second', 'PORT': 6379, 'DB': 0},
+    {'NAME': 'third', 'HOST': 'third', 'PORT': 6379, 'DB': 0},
+]
+
+_TTL = 100
+
+_WRITE_BEHIND_DELAY = 0.01
+
+
+@unittest.skipUnless(importlib.util.find_spec('fakeredis'), 'fakeredis is not installed')
+class RedisPersistenceTests(BaseTestCase):
+    """The class implements the tests for the Redis persistence."""
+
+    def setUp(self):
+        """Make the persistence connect to the fake Redis instances."""
+        self.servers = {}
+        patcher = patch.object(RedisPersistence, '_create_client', self._create_client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _create_client(self, config):
+        """Return the client of the fake Redis instance specified by the config.
+        The clients of the same instance share the data.
+        """
+        server = self.servers.setdefault(RedisPersistence._get_node_name(config), FakeServer())
+        return FakeAsyncRedis(server=server)
+
+    def _get_main_client(self):
+        """Return the client of the instance specified by the top-level keys
+        of the REDIS_PERSISTENCE setting.
+        """
+        return self._create_client(settings.REDIS_PERSISTENCE)
+
+    async def test_changing_different_keys_concurrently(self):
+        """Tests the case when two processes change different keys of
+        the same data concurrently in the optimistic locking mode, so
+        the changes are merged.
+        """
+        await RedisPersistence(optimistic_locking=True).update_bot_data({'a': 0, 'b': 0})
+        first = RedisPersistence(optimistic_locking=True)
+        second = RedisPersistence(optimistic_locking=True)
+        await first.get_bot_data()
+        await second.get_bot_data()
+
+        await first.update_bot_data({'a': 1, 'b': 0})
+        await second.update_bot_data({'a': 0, 'b': 2})
+
+        client = self._get_main_client()
+        self.assertEqual(await client.get('versions:bot_data'), b'3')
+        self.assertEqual(
+            await RedisPersistence(optimistic_locking=True).get_bot_data(),
+            {'a': 1, 'b': 2},
+        )
+
+        bot_data = {'a': 1, 'b': 0}
+        await first.refresh_bot_data(bot_data)
+        self.assertEqual(bot_data, {'a': 1, 'b': 2})
+
+    async def test_changing_same_key_concurrently(self):
+        """Tests the case when two processes change the same key of the same
+        data concurrently in the optimistic locking mode, so the latest
+        change wins, and the conflict is reported.
+        """
+        await RedisPersistence(optimistic_locking=True).update_user_data(1, {'a': 0})
+        first = RedisPersistence(optimistic_locking=True)
+        with override_settings(REDIS_PERSISTENCE={
+            **settings.REDIS_PERSISTENCE,
+            'METRICS_SINK': 'hammett.core.metrics.InMemoryMetricsSink',
+        }):
+            second = RedisPersistence(optimistic_locking=True)
+
+        await first.get_user_data()
+        await second.get_user_data()
+
+        await first.update_user_data(1, {'a': 1})
+        await second.update_user_data(1, {'a': 2})
+
+        conflicts = second.metrics.counters[('persistence.conflicts', (('kind', 'user_data'),))]
+        self.assertEqual(conflicts, 1)
+        self.assertEqual(
+            await RedisPersistence(optimistic_locking=True).get_user_data(),
+            {1: {'a': 2}},
+        )
+
+        user_data = {'a': 1}
+        await first.refresh_user_data(1, user_data)
+        self.assertEqual(user_data, {'a': 2})
+
+    async def test_compressing_large_values(self):
+        """Tests the case when the values exceeding the threshold are compressed,
+        the smaller ones are stored as they are, and both are read back, even
+        if the serialized value starts with the byte used by the codecs.
+        """
+        with override_settings(REDIS_PERSISTENCE={
+            **settings.REDIS_PERSISTENCE,
+            'COMPRESSOR': 'hammett.core.compressors.ZlibCompressor',
+            'COMPRESSION_THRESHOLD': 64,
+            'METRICS_SINK': 'hammett.core.metrics.InMemoryMetricsSink',
+            'SERIALIZER': 'hammett.core.serializers.MsgpackSerializer',
+        }):
+            persistence = RedisPersistence()
+            await persistence.update_conversation('conv', (1, 2), -1)
+            await persistence.update_user_data(1, {'user': 'x' * 1024})
+
+            client = self._get_main_client()
+            self.assertEqual(await client.get('conversations:conv:[1,2]'), b'n\xff')
+            self.assertEqual((await client.get('user_data:1'))[:1], b'z')
+            self.assertEqual(persistence.compression_stats.compressed_values, 1)
+            self.assertGreater(persistence.compression_stats.ratio, 1)
+
+            persistence = RedisPersistence()
+            self.assertEqual(await persistence.get_conversations('conv'), {(1, 2): -1})
+            self.assertEqual(await persistence.get_user_data(), {1: {'user': 'x' * 1024}})
+
+            metrics = persistence.metrics.snapshot()
+            self.assertEqual(metrics['persistence.decompression_time'][0]['count'], 1)
+
+    async def test_distributing_data_across_nodes(self):
+        """Tests the case when the data of the users, chats and conversations
+        is distributed across the nodes, while the bot data is stored on
+        the main instance.
+        """
+        with override_settings(REDIS_PERSISTENCE={
+            **settings.REDIS_PERSISTENCE,
+            'NODES': _NODES,
+        }):
+            persistence = RedisPersistence()
+            await persistence.update_bot_data({'bot': 1})
+            for user_id in range(100):
+                await persistence.update_user_data(user_id, {'user': user_id})
+
+            for node in _NODES:
+                client = self._create_client(node)
+                keys = [key.decode('utf8') for key in await client.keys()]
+                self.assertTrue(keys)
+                node_name = RedisPersistence._get_node_name(node)
+                for key in keys:
+                    self.assertEqual(persistence._get_node(key), node_name)
+
+            self.assertEqual(await self._get_main_client().keys(), [b'bot_data'])
+
+            persistence = RedisPersistence()
+            self.assertEqual(len(await persistence.get_user_data()), 100)
+
+    async def test_evicting_idle_entries_in_lazy_mode(self):
+        """Tests the case when the working set exceeds its size in the lazy
+        mode, so the least recently used entries are evicted and loaded again
+        on the next update.
+        """
+        await RedisPersistence().update_user_data(1, {'user': 1})
+
+        persistence = RedisPersistence(lazy=True, lazy_working_set_size=1, update_interval=0)
+        first_user_data: dict[str, int] = {}
+        await persistence.refresh_user_data(1, first_user_data)
+        await persistence.refresh_user_data(2, {})
+
+        self.assertEqual(list(persistence._loaded_users), [2])
+        self.assertEqual(first_user_data, {})
+
+        first_user_data = {}
+        await persistence.refresh_user_data(1, first_user_data)
+
+        self.assertEqual(first_user_data, {'user': 1})
+
+    async def test_evicting_expired_entries(self):
+        """Tests the case when the data of a user expires in the database,
+        so it's evicted from the memory, while the data of the other users
+        and the data not yet written in the write-behind mode is kept.
+        """
+        client = self._get_main_client()
+        with override_settings(REDIS_PERSISTENCE={
+            **settings.REDIS_PERSISTENCE,
+            'USER_DATA_TTL': _TTL,
+        }):
+            persistence = RedisPersistence()
+            await persistence.update_user_data(1, {'user': 1})
+            await persistence.update_user_data(2, {'user': 2})
+
+            persistence = RedisPersistence(write_behind=True, write_behind_delay=_TTL)
+            await persistence.get_user_data()
+            await persistence.update_user_data(3, {'user': 3})
+            await client.delete('user_data:1')
+            await persistence._evict_expired()
+
+            self.assertEqual(persistence.user_data, {2: {'user': 2}, 3: {'user': 3}})
+
+            await persistence.flush()
+
+    async def test_failing_to_load_data_in_lazy_mode(self):
+        """Tests the case when the data fails to be fetched in the lazy mode,
+        so the error is propagated, and the data is fetched on the next update.
+        """
+        await RedisPersistence().update_user_data(1, {'user': 1})
+
+        persistence = RedisPersistence(lazy=True)
+        user_data: dict[str, int] = {}
+        with (
+            patch.object(persistence.redis_cli, 'get', side_effect=RedisConnectionError),
+            self.assertRaises(RedisConnectionError),
+        ):
+            await persistence.refresh_user_data(1, user_data)
+
+        self.assertNotIn(1, persistence._loaded_users)
+        self.assertEqual(persistence._pending_loads, {})
+
+        await persistence.refresh_user_data(1, user_data)
+
+        self.assertEqual(user_data, {'user': 1})
+
+    async def test_giving_up_writing_after_conflicts(self):
+        """Tests the case when the data is changed concurrently on every
+        attempt to write it in the optimistic locking mode, so the persistence
+        gives up after the limited number of the attempts.
+        """
+        persistence = RedisPersistence(optimistic_locking=True)
+        await persistence.get_chat_data()
+        # Always retry the write with the same data.
+        resolve_write = MagicMock(side_effect=lambda _key, data, _result: data)
+        with (
+            patch.object(persistence, '_resolve_write', resolve_write),
+            self.assertLogs('hammett.core.persistences', 'ERROR') as logs,
+        ):
+            await persistence.update_chat_data(1, {'chat': 1})
+
+        self.assertEqual(resolve_write.call_count, _MAX_WRITE_ATTEMPTS)
+        self.assertIn('Gave up writing 1 keys', logs.output[0])
+
+    async def test_keeping_changes_failed_to_be_written(self):
+        """Tests the case when the changes tracked in the write-behind mode
+        fail to be written, so they are kept and written later.
+        """
+        persistence = RedisPersistence(write_behind=True, write_behind_delay=_WRITE_BEHIND_DELAY)
+        with patch.object(persistence, '_set_many', side_effect=TypeError):
+            await persistence.update_user_data(1, {'user': 1})
+            await asyncio.sleep(_WRITE_BEHIND_DELAY * 5)
+
+        self.assertIn('user_data:1', persistence._dirty)
+        self.assertFalse(persistence._write_behind_task.done())
+
+        await persistence.flush()
+
+        self.assertEqual(persistence._dirty, {})
+        self.assertTrue(await self._get_main_client().exists('user_data:1'))
+
+    async def test_loading_conversations_with_similar_names(self):
+        """Tests the case when the name of a conversation is the beginning
+        of the name of another one, and only the states of the former
+        are loaded.
+        """
+        persistence = RedisPersistence()
+        await persistence.update_conversation('conv', (1, 2), 'first')
+        await persistence.update_conversation('conv:x', (1, 2), 'second')
+
+        persistence = RedisPersistence()
+        self.assertEqual(await persistence.get_conversations('conv'), {(1, 2): 'first'})
+        self.assertEqual(await persistence.get_conversations('conv:x'), {(1, 2): 'second'})
+
+    async def test_loading_data_lazily(self):
+        """Tests the case when the data of the users is not loaded on start
+        in the lazy mode, but on the first update related to each user.
+        """
+        await RedisPersistence().update_user_data(1, {'user': 1})
+
+        persistence = RedisPersistence(lazy=True)
+        self.assertEqual(await persistence.get_user_data(), {})
+
+        user_data: dict[str, int] = {}
+        await persistence.refresh_user_data(1, user_data)
+        self.assertEqual(user_data, {'user': 1})
+
+        user_data['user'] = 2
+        await persistence.update_user_data(1, user_data)
+        self.assertEqual(await RedisPersistence().get_user_data(), {1: {'user': 2}})
+
+    async def test_migrating_legacy_data(self):
+        """Tests the case when the data stored by the previous versions of
+        Hammett as a single key per data kind is split into separate keys.
+        """
+        client = self._get_main_client()
+        await client.set('user_data', pickle.dumps({1: {'user': 1}, 2: {'user': 2}}))
+        await client.set('conversations', pickle.dumps({'conv': {(1, 2): 'state'}}))
+
+        persistence = RedisPersistence()
+        self.assertEqual(await persistence.get_user_data(), {1: {'user': 1}, 2: {'user': 2}})
+        self.assertEqual(await persistence.get_conversations('conv'), {(1, 2): 'state'})
+        self.assertFalse(await client.exists('user_data', 'conversations'))
+        self.assertTrue(await client.exists('user_data:1', 'user_data:2'))
+
+    async def test_not_sweeping_conversations_without_expiring_data(self):
+        """Tests the case when the sweep interval is specified, but no data
+        which expires is stored, so the sweeper doesn't run.
+        """
+        for ttls, store_data in (
+            ({}, None),
+            ({'USER_DATA_TTL': _TTL}, PersistenceInput(user_data=False)),
+        ):
+            with override_settings(REDIS_PERSISTENCE={
+                **settings.REDIS_PERSISTENCE,
+                **ttls,
+                'CONVERSATIONS_SWEEP_INTERVAL': _TTL,
+            }):
+                persistence = RedisPersistence(store_data=store_data)
+                await persistence.get_conversations('conv')
+
+                self.assertIsNone(persistence._sweeper_task)
+
+    async def test_prolonging_expiry_of_data(self):
+        """Tests the case when the data of a user doesn't change, but
+        the update related to the user prolongs its expiry, or stores it
+        again if it has expired.
+        """
+        client = self._get_main_client()
+        with override_settings(REDIS_PERSISTENCE={
+            **settings.REDIS_PERSISTENCE,
+            'USER_DATA_TTL': _TTL,
+        }):
+            persistence = RedisPersistence()
+            await persistence.update_user_data(1, {'user': 1})
+
+            self.assertGreater(await client.ttl('user_data:1'), _TTL - 10)
+
+            await client.expire('user_data:1', 10)
+            await persistence.update_user_data(1, {'user': 1})
+
+            self.assertGreater(await client.ttl('user_data:1'), _TTL - 10)
+
+            await client.delete('user_data:1')
+            await persistence.update_user_data(1, {'user': 1})
+
+            self.assertTrue(await client.exists('user_data:1'))
+
+    async def test_rebalancing_data_after_adding_node(self):
+        """Tests the case when a node is added, and the keys which belong to
+        the node now are moved to it, preserving their expiry.
+        """
+        with override_settings(REDIS_PERSISTENCE={
+            **settings.REDIS_PERSISTENCE,
+            'NODES': _NODES[:2],
+            'USER_DATA_TTL': _TTL,
+        }):
+            persistence = RedisPersistence()
+            for user_id in range(100):
+                await persistence.update_user_data(user_id, {'user': user_id})
+
+        with override_settings(REDIS_PERSISTENCE={
+            **settings.REDIS_PERSISTENCE,
+            'NODES': _NODES,
+            'USER_DATA_TTL': _TTL,
+        }):
+            persistence = RedisPersistence()
+            moved = await persistence.rebalance()
+
+            client = self._create_client(_NODES[2])
+            keys = await client.keys()
+            self.assertEqual(moved, len(keys))
+            self.assertGreater(moved, 0)
+            self.assertGreater(await client.ttl(keys[0]), _TTL - 10)
+            self.assertEqual(await persistence.rebalance(), 0)
+            self.assertEqual(len(await persistence.get_user_data()), 100)
+
+    async def test_reporting_metrics(self):
+        """Tests the case when the metrics sink is specified, so the reads,
+        the writes and the skipped writes are reported to it.
+        """
+        with override_settings(REDIS_PERSISTENCE={
+            **settings.REDIS_PERSISTENCE,
+            'METRICS_SINK': 'hammett.core.metrics.InMemoryMetricsSink',
+        }):
+            persistence = RedisPersistence()
+
+        await persistence.get_bot_data()
+        await persistence.update_bot_data({'bot': 1})
+        await persistence.update_bot_data({'bot': 1})
+        await persistence.update_user_data(1, {'user': 1})
+        await persistence.drop_user_data(1)
+
+        tags = (('kind', 'bot_data'), )
+        self.assertEqual(persistence.metrics.counters, {
+            ('persistence.reads', (*tags, ('result', 'miss'))): 1,
+            ('persistence.skipped_writes', tags): 1,
+            ('persistence.writes', (*tags, ('operation', 'set'))): 1,
+            ('persistence.writes', (('kind', 'user_data'), ('operation', 'delete'))): 1,
+            ('persistence.writes', (('kind', 'user_data'), ('operation', 'set'))): 1,
+        })
+
+        metrics = persistence.metrics.snapshot()
+        self.assertEqual(metrics['persistence.read_latency'][0]['count'], 1)
+        self.assertEqual(metrics['persistence.write_bytes'][0]['tags'], {'kind': 'bot_data'})
+        self.assertEqual(
+            sum(histogram['count'] for histogram in metrics['persistence.write_latency']),
+            3,
+        )
+
+    async def test_skipping_malformed_legacy_data(self):
+        """Tests the case when the legacy data is malformed, so it's kept
+        as it is, and the persistence starts anyway.
+        """
+        await RedisPersistence().update_user_data(1, {'user': 1})
+        client = self._get_main_client()
+        await client.set('user_data', b'malformed')
+
+        persistence = RedisPersistence()
+        self.assertEqual(await persistence.get_user_data(), {1: {'user': 1}})
+        self.assertEqual(await client.get('user_data'), b'malformed')
+
+    async def test_storing_changes_made_by_application(self):
+        """Tests the case when the application changes the loaded data
+        in place, and the changes are stored on updating the persistence
+        both immediately and in the write-behind mode.
+        """
+        for write_behind in (False, True):
+            with self.subTest(write_behind=write_behind):
+                await self._get_main_client().flushall()
+                persistence = RedisPersistence()
+                await persistence.update_user_data(5, {'a': 1})
+                await persistence.update_chat_data(6, {'b': 1})
+
+                persistence = RedisPersistence(
+                    write_behind=write_behind,
+                    write_behind_delay=_WRITE_BEHIND_DELAY,
+                )
+                application = Application.builder().token(
+                    'secret-token',
+                ).persistence(persistence).build()
+                with patch.object(ExtBot, 'initialize', AsyncMock()):
+                    await application.initialize()
+
+                application.user_data[5]['a'] = 2
+                application.chat_data[6]['b'] = 2
+                application.mark_data_for_update_persistence(chat_ids=6, user_ids=5)
+                await application.update_persistence()
+                await asyncio.sleep(_WRITE_BEHIND_DELAY * 5)
+
+                stored_persistence = RedisPersistence()
+                self.assertEqual(await stored_persistence.get_user_data(), {5: {'a': 2}})
+                self.assertEqual(await stored_persistence.get_chat_data(), {6: {'b': 2}})
+                await persistence.flush()
+
+    async def test_storing_data_per_key(self):
+        """Tests the case when each user, chat and conversation is stored
+        under its own key, and the data is loaded by another persistence object.
+        """
+        persistence = RedisPersistence()
+        await persistence.update_bot_data({'bot': 1})
+        await persistence.update_chat_data(1, {'chat': 1})
+        await persistence.update_conversation('conv', (1, 2), 'state')
+        await persistence.update_user_data(2, {'user': 2})
+
+        keys = {key.decode('utf8') for key in await self._get_main_client().keys()}
+        self.assertEqual(keys, {
+            'bot_data',
+            'chat_data:1',
+            'conversations:conv:[1,2]',
+            'user_data:2',
+        })
+
+        persistence = RedisPersistence()
+        self.assertEqual(await persistence.get_bot_data(), {'bot': 1})
+        self.assertEqual(await persistence.get_chat_data(), {1: {'chat': 1}})
+        self.assertEqual(await persistence.get_conversations('conv'), {(1, 2): 'state'})
+        self.assertEqual(await persistence.get_user_data(), {2: {'user': 2}})
+
+    async def test_sweeping_expired_conversations(self):
+        """Tests the case when the conversations of the users whose data has
+        expired are removed, while the conversations of the users whose data
+        is stored or not yet written in the write-behind mode are kept.
+        """
+        with override_settings(REDIS_PERSISTENCE={
+            **settings.REDIS_PERSISTENCE,
+            'USER_DATA_TTL': _TTL,
+        }):
+            persistence = RedisPersistence()
+            for conversation_key in ((1, 2), (3, 4), (5, 6)):
+                await persistence.update_conversation('conv', conversation_key, 'state')
+
+            await persistence.update_user_data(2, {'user': 2})
+
+            persistence = RedisPersistence(write_behind=True, write_behind_delay=_TTL)
+            await persistence.get_conversations('conv')
+            await persistence.update_user_data(4, {'user': 4})
+            await persistence._sweep_conversations()
+
+            self.assertEqual(await persistence.get_conversations('conv'), {
+                (1, 2): 'state',
+                (3, 4): 'state',
+            })
+
+            await persistence.flush()
+
+        keys = {key.decode('utf8') for key in await self._get_main_client().keys('conv*')}
+        self.assertEqual(keys, {'conversations:conv:[1,2]', 'conversations:conv:[3,4]'})
+
+    async def test_writing_only_changed_keys_on_flush(self):
+        """Tests the case when the persistence is flushed, and only the keys
+        changed since the start are written, so the expiry of the other ones
+        is not prolonged, and the expired ones are not stored again.
+        """
+        client = self._get_main_client()
+        with override_settings(REDIS_PERSISTENCE={
+            **settings.REDIS_PERSISTENCE,
+            'USER_DATA_TTL': _TTL,
+        }):
+            for on_flush in (False, True):
+                with self.subTest(on_flush=on_flush):
+                    await client.flushall()
+                    persistence = RedisPersistence()
+                    for user_id in (1, 2, 3):
+                        await persistence.update_user_data(user_id, {'user': user_id})
+
+                    persistence = RedisPersistence(on_flush=on_flush)
+                    await persistence.get_user_data()
+                    await persistence.update_user_data(3, {'user': 4})
+                    await client.delete('user_data:1')
+                    await client.expire('user_data:2', 10)
+                    await persistence.flush()
+
+                    self.assertFalse(await client.exists('user_data:1'))
+                    self.assertLessEqual(await client.ttl('user_data:2'), 10)
+                    self.assertGreater(await client.ttl('user_data:3'), _TTL - 10)
+
+                    persistence = RedisPersistence()
+                    self.assertEqual(await persistence.get_user_data(), {
+                        2: {'user': 2},
+                        3: {'user': 4},
+                    })
+
+    async def test_writing_changes_in_background(self):
+        """Tests the case when the changes are written in the background
+        in the write-behind mode, and the remaining ones are drained on flush.
+        """
+        client = self._get_main_client()
+        persistence = RedisPersistence(write_behind=True, write_behind_delay=_WRITE_BEHIND_DELAY)
+        await persistence.update_user_data(1, {'user': 1})
+
+        self.assertFalse(await client.exists('user_data:1'))
+
+        await asyncio.sleep(_WRITE_BEHIND_DELAY * 5)
+
+        self.assertTrue(await client.exists('user_data:1'))
+
+        await persistence.update_user_data(2, {'user': 2})
+        await persistence.drop_user_data(1)
+        await persistence.flush()
+
+        self.assertFalse(await client.exists('user_data:1'))
+        self.assertTrue(await client.exists('user_data:2'))
+        self.assertTrue(persistence._write_behind_task.done())
+
+
+class RedisClientTests(BaseTestCase):
+    """The class implements the tests for the creation of the Redis clients."""
+
+    def test_creating_client_of_first_node(self):
+        """Tests the case when the REDIS_PERSISTENCE setting specifies only
+        the nodes, so the client of the first node is created.
+        """
+        with override_settings(REDIS_PERSISTENCE={'NODES': _NODES}):
+            client = create_redis_client()
+
+        self.assertEqual(client.connection_pool.connection_kwargs['host'], 'first')
+
+    def test_requiring_connection_settings(self):
+        """Tests the case when a required key is missing in the configuration
+        of a Redis instance. HOST and PORT are not required if the instance
+        is connected to via a UNIX socket.
+        """
+        for key in ('HOST', 'PORT', 'DB'):
+            config = {'HOST': 'localhost', 'PORT': 6379, 'DB': 0}
+            del config[key]
+            with self.assertRaisesRegex(ImproperlyConfigured, key):
+                RedisPersistence._create_client(config)
+
+        with self.assertRaisesRegex(ImproperlyConfigured, 'DB'):
+            RedisPersistence._create_client({'UNIX_SOCKET_PATH': 'redis.sock'})
+
+        client = RedisPersistence._create_client({
+            'DB': 0,
+            'UNIX_SOCKET_PATH': 'redis.sock',
+        })
+        self.assertEqual(
+            client.connection_pool.connection_kwargs['path'],
+            'redis.sock',
+        )
@@ -0,0 +1,152 @@
+"""The module contains the tests for the screens."""
+
+# ruff: noqa: ANN201, S106
+
+import tempfile
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from hammett.core.button import Button
+from hammett.core.constants import LATEST_SENT_MSG_KEY, RenderConfig, SourcesTypes
+from hammett.core.screen import EDITS_STATS
+from hammett.test.base import BaseTestCase, TestBot
+from hammett.test.utils import override_settings
+from tests.base import TestScreen
+
+_CHAT_ID = 1
+
+_MESSAGE_ID = 2
+
+_URL_BUTTON = Button(
+    'URL',
+    'https://github.com/cusdeb-com/hammett',
+    source_type=SourcesTypes.URL_SOURCE_TYPE,
+)
+
+
+class ScreensTests(BaseTestCase):
+    """The class implements the tests for the screens."""
+
+    @override_settings(SAVE_LATEST_MESSAGE=True, TOKEN='secret-token')
+    async def test_editing_only_keyboard(self):
+        """Tests the case when a screen is re-rendered with another keyboard,
+        so only the keyboard of the message is edited.
+        """
+        EDITS_STATS.keyboard_only = 0
+        message = MagicMock(message_id=_MESSAGE_ID)
+        edit_message_text = AsyncMock(return_value=message)
+        edit_message_reply_markup = AsyncMock(return_value=message)
+        user_data: dict[str, object] = {}
+        with (
+            patch.object(type(self.context), 'user_data', user_data),
+            patch.object(TestBot, 'edit_message_text', edit_message_text),
+            patch.object(TestBot, 'edit_message_reply_markup', edit_message_reply_markup),
+        ):
+            screen = TestScreen()
+            for keyboard in ([], [[_URL_BUTTON]]):
+                await screen.render(None, self.context, config=RenderConfig(
+                    chat_id=_CHAT_ID,
+                    message_id=_MESSAGE_ID,
+                    keyboard=keyboard,
+                ))
+
+        self.assertEqual(edit_message_text.await_count, 1)
+        self.assertEqual(edit_message_reply_markup.await_count, 1)
+        self.assertEqual(EDITS_STATS.keyboard_only, 1)
+
+    @override_settings(SAVE_LATEST_MESSAGE=True, TOKEN='secret-token')
+    async def test_editing_message_with_changed_cover(self):
+        """Tests the case when a screen is re-rendered with the same local
+        cover whose contents have changed, so the message is edited.
+        """
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        cover = Path(tmp_dir.name) / 'cover.jpg'
+        edit_message_media = AsyncMock(return_value=MagicMock(message_id=_MESSAGE_ID))
+        user_data: dict[str, object] = {}
+        with (
+            patch.object(type(self.context), 'user_data', user_data),
+            patch.object(TestBot, 'edit_message_media', edit_message_media),
+        ):
+            screen = TestScreen()
+            for contents in (b'cover', b'cover', b'another cover'):
+                cover.write_bytes(contents)
+                await screen.render(None, self.context, config=RenderConfig(
+                    chat_id=_CHAT_ID,
+                    message_id=_MESSAGE_ID,
+                    cover=str(cover),
+                ))
+
+        self.assertEqual(edit_message_media.await_count, 2)
+
+    @override_settings(TOKEN='secret-token')
+    async def test_not_fingerprinting_without_saving_latest_message(self):
+        """Tests the case when the latest message config is not saved, so
+        the message is not fingerprinted, and the local cover is not read
+        for that.
+        """
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        cover = Path(tmp_dir.name) / 'cover.jpg'
+        cover.write_bytes(b'cover')
+        edit_message_media = AsyncMock(return_value=MagicMock(message_id=_MESSAGE_ID))
+        with (
+            patch.object(TestBot, 'edit_message_media', edit_message_media),
+            patch('hammett.core.covers.calc_cover_key') as calc_cover_key,
+        ):
+            screen = TestScreen()
+            for _ in range(2):
+                await screen.render(None, self.context, config=RenderConfig(
+                    chat_id=_CHAT_ID,
+                    message_id=_MESSAGE_ID,
+                    cover=str(cover),
+                ))
+
+        self.assertEqual(edit_message_media.await_count, 2)
+        calc_cover_key.assert_not_called()
+
+    @override_settings(SAVE_LATEST_MESSAGE=True, TOKEN='secret-token')
+    async def test_saving_config_of_unchanged_message(self):
+        """Tests the case when a screen is re-rendered without changing
+        the message, but with another config, so the config is saved anyway.
+        """
+        edit_message_text = AsyncMock(return_value=MagicMock(message_id=_MESSAGE_ID))
+        user_data: dict[str, dict[str, object]] = {}
+        with (
+            patch.object(type(self.context), 'user_data', user_data),
+            patch.object(TestBot, 'edit_message_text', edit_message_text),
+        ):
+            screen = TestScreen()
+            for hide_keyboard in (False, True):
+                await screen.render(None, self.context, config=RenderConfig(
+                    chat_id=_CHAT_ID,
+                    message_id=_MESSAGE_ID,
+                    hide_keyboard=hide_keyboard,
+                ))
+
+        self.assertEqual(edit_message_text.await_count, 1)
+        self.assertTrue(user_data[LATEST_SENT_MSG_KEY]['hide_keyboard'])
+        self.assertEqual(user_data[LATEST_SENT_MSG_KEY]['message_id'], _MESSAGE_ID)
+
+    @override_settings(SAVE_LATEST_MESSAGE=True, TOKEN='secret-token')
+    async def test_skipping_edits_not_changing_message(self):
+        """Tests the case when a screen is re-rendered without changes,
+        so the message is not edited.
+        """
+        EDITS_STATS.sent = EDITS_STATS.skipped = 0
+        edit_message_text = AsyncMock(return_value=MagicMock(message_id=_MESSAGE_ID))
+        user_data: dict[str, object] = {}
+        with (
+            patch.object(type(self.context), 'user_data', user_data),
+            patch.object(TestBot, 'edit_message_text', edit_message_text),
+        ):
+            screen = TestScreen()
+            for description in ('first', 'first', 'second'):
+                await screen.render(None, self.context, config=RenderConfig(
+                    chat_id=_CHAT_ID,
+                    message_id=_MESSAGE_ID,
+                    description=description,
+                ))
+
+        self.assertEqual(edit_message_text.await_count, 2)
+        self.assertEqual((EDITS_STATS.sent, EDITS_STATS.skipped), (2, 1))
@@ -0,0 +1,93 @@
+"""The module contains the tests for the serializers."""
+
+# ruff: noqa: ANN001, ANN201, ANN202, D401
+
+import importlib.util
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from hammett.core.constants import LATEST_SENT_MSG_KEY
+from hammett.core.exceptions import DeserializationFailed, ImproperlyConfigured
+from hammett.core.serializers import JSONSerializer, MsgpackSerializer, PickleSerializer
+from hammett.test.base import BaseTestCase
+
+_TEST_USER_DATA = {
+    'current_state': '0',
+    'TestChoiceWidget_1_2': {
+        'choices': ((True, 'code1', 'Name 1'), (False, 'code2', 'Name 2')),
+    },
+    'TestCarouselWidget_1_3': {
+        'images': [['https://example.com/1.jpg', 'Description']],
+        'position': 0,
+    },
+    'ids': {1, 2},
+    'raw': b'\x00\x01',
+    'by_int_keys': {1: 'one', (2, 3): 'tuple'},
+    '~t': 'reserved key',
+}
+
+
+class SerializersTests(BaseTestCase):
+    """The class implements the tests for the serializers."""
+
+    def _test_roundtrip(self, serializer):
+        """The method is intended to be invoked by other tests that use
+        different serializers.
+        """
+        data = serializer.dumps(_TEST_USER_DATA)
+        self.assertIsInstance(data, bytes)
+        self.assertEqual(serializer.loads(data), _TEST_USER_DATA)
+
+        with self.assertRaises(DeserializationFailed):
+            serializer.loads(b'\xc1malformed')
+
+    def _test_latest_msg_config(self, serializer):
+        """The method is intended to be invoked by other tests that use
+        different serializers.
+        """
+        config = {
+            'cover': Path('media/cover.jpg'),
+            'description': 'Test',
+            'attachments': [object()],
+            'keyboard': [[object()]],
+        }
+        data = serializer.loads(serializer.dumps({LATEST_SENT_MSG_KEY: config}))
+        self.assertEqual(data, {
+            LATEST_SENT_MSG_KEY: {
+                'cover': Path('media/cover.jpg'),
+                'description': 'Test',
+                'attachments': None,
+                'keyboard': [],
+            },
+        })
+
+    def test_json_serializer(self):
+        """Tests the case when the data is serialized using JSON."""
+        self._test_roundtrip(JSONSerializer())
+        self._test_latest_msg_config(JSONSerializer())
+
+    @unittest.skipUnless(importlib.util.find_spec('msgpack'), 'msgpack is not installed')
+    def test_msgpack_serializer(self):
+        """Tests the case when the data is serialized using msgpack."""
+        self._test_roundtrip(MsgpackSerializer())
+        self._test_latest_msg_config(MsgpackSerializer())
+
+    def test_msgpack_serializer_without_msgpack(self):
+        """Tests the case when msgpack is not installed."""
+        with (
+            patch('hammett.core.serializers.msgpack', None),
+            self.assertRaises(ImproperlyConfigured),
+        ):
+            MsgpackSerializer()
+
+    def test_pickle_serializer(self):
+        """Tests the case when the data is serialized using pickle."""
+        self._test_roundtrip(PickleSerializer())
+
+    def test_unserializable_object(self):
+        """Tests the case when the data contains an object which can't be
+        serialized without pickle.
+        """
+        with self.assertRaises(TypeError):
+            JSONSerializer().dumps({'object': object()})
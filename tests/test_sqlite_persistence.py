@@ -0,0 +1,150 @@
+"""The module contains the tests for the SQLite persistence."""
+
+# ruff: noqa: ANN001, ANN201, ANN202
+
+import asyncio
+import tempfile
+import threading
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+from telegram.ext import Application, ExtBot
+
+from hammett.conf import settings
+from hammett.core.persistences import SQLitePersistence
+from hammett.test.base import BaseTestCase
+from hammett.test.utils import override_settings
+
+_USERS_NUMBER = 100
+
+
+class SQLitePersistenceTests(BaseTestCase):
+    """The class implements the tests for the SQLite persistence."""
+
+    def setUp(self):
+        """Create the temporary directory for the database."""
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.database = str(Path(tmp_dir.name) / 'hammett.sqlite3')
+
+    def _create_persistence(self, *, on_flush=False):
+        """Return the persistence storing the data in the temporary database."""
+        with override_settings(SQLITE_PERSISTENCE={
+            **settings.SQLITE_PERSISTENCE,
+            'DATABASE': self.database,
+        }):
+            return SQLitePersistence(on_flush=on_flush)
+
+    async def test_dropping_user_data(self):
+        """Tests the case when the data of a user is dropped, and it's
+        removed from the database.
+        """
+        persistence = self._create_persistence()
+        await persistence.get_user_data()
+        await persistence.update_user_data(1, {'key': 'value'})
+        await persistence.update_user_data(2, {'key': 'value'})
+        await persistence.drop_user_data(1)
+        await persistence.flush()
+
+        persistence = self._create_persistence()
+        self.assertEqual(await persistence.get_user_data(), {2: {'key': 'value'}})
+        await persistence.flush()
+
+    async def test_releasing_resources_on_flush(self):
+        """Tests the case when the persistence is flushed, so the connection
+        is closed and the thread executing the queries is stopped, and
+        the persistence still works if it's used again.
+        """
+        persistence = self._create_persistence()
+        await persistence.update_user_data(1, {'key': 'value'})
+        await persistence.flush()
+
+        self.assertIsNone(persistence._connection)  # noqa: SLF001
+        self.assertFalse([
+            thread for thread in threading.enumerate()
+            if thread.name.startswith('hammett-sqlite')
+        ])
+
+        await persistence.update_user_data(2, {'key': 'value'})
+        await persistence.flush()
+
+        persistence = self._create_persistence()
+        self.assertEqual(len(await persistence.get_user_data()), 2)
+        await persistence.flush()
+
+    async def test_storing_changes_made_by_application(self):
+        """Tests the case when the application changes the loaded data
+        in place, and the changes are stored on updating the persistence.
+        """
+        persistence = self._create_persistence()
+        await persistence.update_user_data(5, {'a': 1})
+        await persistence.update_chat_data(6, {'b': 1})
+        await persistence.flush()
+
+        persistence = self._create_persistence()
+        application = Application.builder().token(
+            'secret-token',
+        ).persistence(persistence).build()
+        with patch.object(ExtBot, 'initialize', AsyncMock()):
+            await application.initialize()
+
+        application.user_data[5]['a'] = 2
+        application.chat_data[6]['b'] = 2
+        application.mark_data_for_update_persistence(chat_ids=6, user_ids=5)
+        await application.update_persistence()
+        await persistence.flush()
+
+        persistence = self._create_persistence()
+        self.assertEqual(await persistence.get_user_data(), {5: {'a': 2}})
+        self.assertEqual(await persistence.get_chat_data(), {6: {'b': 2}})
+        await persistence.flush()
+
+    async def test_storing_concurrent_updates(self):
+        """Tests the case when many users are updated concurrently,
+        and all their data is stored.
+        """
+        persistence = self._create_persistence()
+        await persistence.get_user_data()
+        await asyncio.gather(*[
+            persistence.update_user_data(user_id, {'id': user_id})
+            for user_id in range(_USERS_NUMBER)
+        ])
+        await persistence.flush()
+
+        persistence = self._create_persistence()
+        user_data = await persistence.get_user_data()
+        await persistence.flush()
+        self.assertEqual(len(user_data), _USERS_NUMBER)
+        self.assertEqual(user_data[42], {'id': 42})
+
+    async def test_storing_data(self):
+        """Tests the case when the data of all kinds is stored and
+        loaded by another persistence object.
+        """
+        persistence = self._create_persistence()
+        await persistence.update_bot_data({'bot': 1})
+        await persistence.update_chat_data(1, {'chat': 1})
+        await persistence.update_conversation('conversation', (1, 2), '3')
+        await persistence.update_user_data(2, {'user': 2})
+        await persistence.flush()
+
+        persistence = self._create_persistence()
+        self.assertEqual(await persistence.get_bot_data(), {'bot': 1})
+        self.assertEqual(await persistence.get_chat_data(), {1: {'chat': 1}})
+        self.assertEqual(await persistence.get_conversations('conversation'), {(1, 2): '3'})
+        self.assertEqual(await persistence.get_user_data(), {2: {'user': 2}})
+        await persistence.flush()
+
+    async def test_storing_data_on_flush(self):
+        """Tests the case when the data is stored on flush only."""
+        persistence = self._create_persistence(on_flush=True)
+        await persistence.update_user_data(1, {'key': 'value'})
+
+        other_persistence = self._create_persistence()
+        self.assertEqual(await other_persistence.get_user_data(), {})
+        await other_persistence.flush()
+
+        await persistence.flush()
+        other_persistence = self._create_persistence()
+        self.assertEqual(await other_persistence.get_user_data(), {1: {'key': 'value'}})
+        await other_persistence.flush()